@@ -1,10 +1,14 @@
 from ._distance import levenshtein
 from ._distance import jamo_levenshtein
+from ._distance import LevenshteinIndex
 from ._distance import cosine_distance
 from ._distance import jaccard_distance
+from ._distance import StringDistanceIndex
 from ._hangle import normalize
 from ._hangle import decompose
 from ._hangle import compose
+from ._hangle import decompose_str
+from ._hangle import compose_str
 from ._hangle import character_is_korean
 from ._hangle import character_is_complete_korean
 from ._hangle import character_is_jaum
@@ -1,8 +1,13 @@
 # -*- encoding:utf8 -*-
 
 from collections import Counter
+from functools import lru_cache
 import numpy as np
+from scipy.sparse import csc_matrix
+from scipy.sparse import csr_matrix
+from zlib import crc32
 from ._hangle import decompose
+from ._hangle import decompose_str
 
 def levenshtein(s1, s2, cost={}):
     # based on Wikipedia/Levenshtein_distance#Python
@@ -11,7 +16,10 @@ def levenshtein(s1, s2, cost={}):
 
     if len(s2) == 0:
         return len(s1)
-    
+
+    if not cost:
+        return _bitparallel_levenshtein(s1, s2)
+
     def get_cost(c1, c2, cost):
         return 0 if (c1 == c2) else cost.get((c1, c2), 1)
     
@@ -27,21 +35,51 @@ def levenshtein(s1, s2, cost={}):
     
     return previous_row[-1]
 
+def _bitparallel_levenshtein(s1, s2):
+    """Myers (1999) bit-vector algorithm with Hyyro's modification for unit cost.
+    A column of the DP table is encoded as bits of python int, so it
+    processes a character of s1 with constant number of bit operations.
+    s2 should not be empty"""
+
+    m = len(s2)
+    peq = {}
+    for i, c in enumerate(s2):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for c in s1:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+@lru_cache(maxsize=200000)
+def _jamo_cost(c1, c2):
+    if c1 == c2:
+        return 0
+    jamo1 = decompose(c1)
+    jamo2 = decompose(c2)
+    if jamo1 is None or jamo2 is None:
+        return 1
+    return levenshtein(jamo1, jamo2) / 3
+
 def jamo_levenshtein(s1, s2):
     if len(s1) < len(s2):
         return jamo_levenshtein(s2, s1)
 
     if len(s2) == 0:
         return len(s1)
-    
-    def get_jamo_cost(c1, c2):
-        if c1 == c2:
-            return 0
-        jamo1 = decompose(c1)
-        jamo2 = decompose(c2)
-        if jamo1 is None or jamo2 is None:
-            return 1
-        return levenshtein(decompose(c1), decompose(c2)) / 3
 
     previous_row = range(len(s2) + 1)
     for i, c1 in enumerate(s1):
@@ -49,12 +87,151 @@ def jamo_levenshtein(s1, s2):
         for j, c2 in enumerate(s2):
             insertions = previous_row[j + 1] + 1 # j+1 instead of j since previous_row and current_row are one character longer
             deletions = current_row[j] + 1       # than s2
-            substitutions = previous_row[j] + get_jamo_cost(c1, c2)
+            substitutions = previous_row[j] + _jamo_cost(c1, c2)
             current_row.append(min(insertions, deletions, substitutions))
         previous_row = current_row
     
     return previous_row[-1]
 
+def _bounded_jamo_levenshtein(s1, s2, max_dist):
+    """It returns jamo_levenshtein(s1, s2) if it is equal or smaller than
+    max_dist, else None. Insertion and deletion cost 1, so only the cells
+    in the band |i - j| <= max_dist are computed, and it stops when every
+    cell of a row exceeds max_dist"""
+
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    n, m = len(s1), len(s2)
+    if n - m > max_dist:
+        return None
+    if m == 0:
+        return n
+
+    inf = float('inf')
+    band = int(max_dist)
+    previous_row = [j if j <= band else inf for j in range(m + 1)]
+    for i in range(1, n + 1):
+        c1 = s1[i-1]
+        begin = max(1, i - band)
+        end = min(m, i + band)
+        current_row = [inf] * (m + 1)
+        if i <= band:
+            current_row[0] = i
+        row_min = current_row[0]
+        for j in range(begin, end + 1):
+            d = min(previous_row[j] + 1,
+                    current_row[j-1] + 1,
+                    previous_row[j-1] + _jamo_cost(c1, s2[j-1]))
+            current_row[j] = d
+            if d < row_min:
+                row_min = d
+        if row_min > max_dist:
+            return None
+        previous_row = current_row
+    dist = previous_row[m]
+    return dist if dist <= max_dist else None
+
+class LevenshteinIndex:
+    """Index for fuzzy lookup of a large dictionary
+
+    Each entry is represented as bag of characters (or jamo when jamo=True).
+    Bag distance is a lower bound of (jamo) levenshtein distance, so the
+    index computes it for all entries at once with NumPy and verifies only
+    the remained candidates with bounded dynamic programming.
+
+    :param words: list of str
+        Dictionary entries
+    :param jamo: Boolean
+        If True, it uses jamo_levenshtein, else levenshtein
+
+    Usage
+    -----
+        >>> index = LevenshteinIndex(nouns, jamo=True)
+        >>> index.nearest('아이오아아', k=5, max_dist=1)
+        $ [('아이오아이', 0.3333333333333333), ...]
+    """
+
+    def __init__(self, words, jamo=True):
+        self.words = list(words)
+        self.jamo = jamo
+        # scale = number of symbols of a character
+        self._scale = 3 if jamo else 1
+        self._symbol_index = {}
+
+        rows, cols, data = [], [], []
+        lengths = []
+        for i, word in enumerate(self.words):
+            bag = self._as_bag(word)
+            for symbol, count in bag.items():
+                j = self._symbol_index.setdefault(symbol, len(self._symbol_index))
+                rows.append(i)
+                cols.append(j)
+                data.append(count)
+            lengths.append(len(word) * self._scale)
+        self._lengths = np.asarray(lengths, dtype=np.int32)
+        self._bags = csc_matrix(
+            (np.asarray(data, dtype=np.int32), (rows, cols)),
+            shape=(len(self.words), len(self._symbol_index)))
+
+    def __len__(self):
+        return len(self.words)
+
+    def _as_bag(self, word):
+        if not self.jamo:
+            return Counter(word)
+        symbols = []
+        for c, jamo in zip(word, decompose_str(word)):
+            if jamo is None:
+                symbols += [c] * 3
+            else:
+                symbols += jamo
+        return Counter(symbols)
+
+    def _distance(self, s1, s2, max_dist):
+        if self.jamo:
+            return _bounded_jamo_levenshtein(s1, s2, max_dist)
+        dist = levenshtein(s1, s2)
+        return dist if dist <= max_dist else None
+
+    def candidates(self, query, max_dist=1):
+        """It returns indices of entries of which bag distance lower bound
+        is equal or smaller than max_dist"""
+        common = np.zeros(len(self.words), dtype=np.int32)
+        indptr, indices, data = self._bags.indptr, self._bags.indices, self._bags.data
+        for symbol, count in self._as_bag(query).items():
+            j = self._symbol_index.get(symbol, -1)
+            if j < 0:
+                continue
+            b, e = indptr[j], indptr[j+1]
+            common[indices[b:e]] += np.minimum(data[b:e], count)
+        lower_bound = np.maximum(self._lengths, len(query) * self._scale) - common
+        return np.where(lower_bound <= max_dist * self._scale + 1e-9)[0]
+
+    def nearest(self, query, k=10, max_dist=1):
+        """
+        :param query: str
+            Query word
+        :param k: int
+            Maximum number of returned entries. If k <= 0, it returns all
+        :param max_dist: float
+            Maximum distance
+
+        Returns
+        -------
+        similars : list of tuple
+            (word, distance) list sorted by distance
+        """
+        similars = []
+        for i in self.candidates(query, max_dist):
+            word = self.words[i]
+            dist = self._distance(query, word, max_dist)
+            if dist is not None:
+                similars.append((word, dist))
+        similars = sorted(similars, key=lambda x:x[1])
+        if k > 0:
+            similars = similars[:k]
+        return similars
+
 def cosine_distance(s1, s2, unitfy=lambda x:Counter(x)):
     '''distance = 1 - cosine similarity; [0, 2] '''
     if (not s1) or (not s2):
@@ -74,3 +251,243 @@ def jaccard_distance(s1, s2, unitfy=lambda x:set(x)):
     s1_set = unitfy(s1)
     s2_set = unitfy(s2)
     return 1 - len(s1_set.intersection(s2_set)) / len(s1_set.union(s2_set))
+
+class StringDistanceIndex:
+    """Batch cosine / jaccard distance engine
+
+    Strings are encoded once as sparse character (n-gram) matrix, and top-k
+    neighbors are computed block by block with sparse matrix product. With
+    ngram_range=(1, 1), the distances are same with cosine_distance and
+    jaccard_distance. Only the strings sharing at least one n-gram with a
+    query are returned as its neighbors.
+
+    If num_perm > 0, MinHash signatures of n-gram sets are grouped by LSH
+    bands, and only the strings sharing a band bucket with a query are
+    compared. It is approximate, but useful for near-duplicate detection
+    of large collection.
+
+    :param strings: list of str
+        Indexed strings
+    :param metric: str
+        'cosine' or 'jaccard'
+    :param ngram_range: tuple of int
+        (min n, max n) of character n-gram
+    :param block_size: int
+        Number of query strings computed at once
+    :param num_perm: int
+        Number of MinHash permutations. If 0, LSH is not used
+    :param bands: int
+        Number of LSH bands. num_perm should be divisible by bands
+    :param random_state: int or None
+        Seed of MinHash permutations
+
+    Usage
+    -----
+        >>> index = StringDistanceIndex(comments, metric='cosine', ngram_range=(1, 2))
+        >>> index.query(['ㅋㅋ 존잼'], k=5)
+        $ [[(3, 0.0), (25, 0.1835), ...]]
+        >>> index.pairwise(k=5, max_distance=0.1) # near-duplicates of indexed strings
+        >>> index.pairwise(new_comments, k=5) # all pairs of other strings
+    """
+
+    _prime = (1 << 61) - 1
+
+    def __init__(self, strings, metric='cosine', ngram_range=(1, 1),
+        block_size=1000, num_perm=0, bands=16, random_state=None):
+
+        if not (metric == 'cosine' or metric == 'jaccard'):
+            raise ValueError('metric should be cosine or jaccard, not {}'.format(metric))
+        if ngram_range[0] < 1 or ngram_range[0] > ngram_range[1]:
+            raise ValueError('Wrong ngram_range {}'.format(ngram_range))
+        if num_perm > 0 and (bands <= 0 or num_perm % bands != 0):
+            raise ValueError('num_perm should be divisible by bands')
+
+        self.strings = list(strings)
+        self.metric = metric
+        self.ngram_range = ngram_range
+        self.block_size = block_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.random_state = random_state
+
+        self._vocabulary = {}
+        self.x, self._norms = self._encode(self.strings, fit=True)
+
+        if num_perm > 0:
+            generator = np.random.RandomState(random_state)
+            self._perm_a = generator.randint(1, 2**31 - 1, size=num_perm).astype(np.uint64)
+            self._perm_b = generator.randint(0, 2**31 - 1, size=num_perm).astype(np.uint64)
+            self._buckets = self._build_buckets(self._minhash(self.strings))
+
+    def __len__(self):
+        return len(self.strings)
+
+    def _ngrams(self, s):
+        min_n, max_n = self.ngram_range
+        return [s[b:b+n] for n in range(min_n, max_n + 1) for b in range(len(s) - n + 1)]
+
+    def _encode(self, strings, fit=False):
+        """It returns (sparse matrix, squared norms). For cosine, squared norm
+        is sum of squared n-gram frequencies, and for jaccard, it is number of
+        distinct n-grams. The n-grams not in vocabulary are counted in the
+        norms, so the distances of queries are exact"""
+
+        rows, cols, data = [], [], []
+        norms = np.zeros(len(strings), dtype=np.float64)
+        for i, s in enumerate(strings):
+            counter = Counter(self._ngrams(s))
+            if self.metric == 'jaccard':
+                counter = {ngram:1 for ngram in counter}
+            norms[i] = sum(v ** 2 for v in counter.values())
+            for ngram, v in counter.items():
+                if fit:
+                    j = self._vocabulary.setdefault(ngram, len(self._vocabulary))
+                else:
+                    j = self._vocabulary.get(ngram, -1)
+                    if j < 0:
+                        continue
+                rows.append(i)
+                cols.append(j)
+                data.append(v)
+        x = csr_matrix((data, (rows, cols)),
+            shape=(len(strings), len(self._vocabulary)), dtype=np.float64)
+        return x, norms
+
+    def _as_distance(self, prod, norm, norms):
+        if self.metric == 'cosine':
+            return 1 - prod / np.sqrt(norm * norms)
+        return 1 - prod / (norm + norms - prod)
+
+    def _minhash(self, strings):
+        signatures = np.full((len(strings), self.num_perm), self._prime, dtype=np.uint64)
+        for b in range(0, len(strings), self.block_size):
+            hashes, offsets, rows = [], [], []
+            for i, s in enumerate(strings[b:b+self.block_size]):
+                ngrams = set(self._ngrams(s))
+                if not ngrams:
+                    continue
+                offsets.append(len(hashes))
+                rows.append(b + i)
+                hashes += [crc32(ngram.encode('utf-8')) for ngram in ngrams]
+            if not rows:
+                continue
+            hashes = np.asarray(hashes, dtype=np.uint64)[:,None]
+            permuted = (hashes * self._perm_a + self._perm_b) % np.uint64(self._prime)
+            signatures[rows] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return signatures
+
+    def _build_buckets(self, signatures):
+        # strings without n-gram are not bucketed
+        valid = np.where(signatures[:,0] != self._prime)[0]
+        rows = self.num_perm // self.bands
+        buckets = []
+        for band in range(self.bands):
+            keys = np.ascontiguousarray(signatures[valid, band*rows:(band+1)*rows])
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.searchsorted(inverse[order], np.arange(1, len(unique)))
+            members = np.split(valid[order], bounds)
+            buckets.append({key.tobytes():member for key, member in zip(unique, members)})
+        return buckets
+
+    def _lsh_candidates(self, signature):
+        if signature[0] == self._prime:
+            return np.zeros(0, dtype=np.int64)
+        rows = self.num_perm // self.bands
+        candidates = []
+        for band, bucket in enumerate(self._buckets):
+            key = np.ascontiguousarray(signature[band*rows:(band+1)*rows]).tobytes()
+            if key in bucket:
+                candidates.append(bucket[key])
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(candidates))
+
+    def query(self, strings, k=10, max_distance=None):
+        """
+        :param strings: list of str
+            Query strings
+        :param k: int
+            Number of neighbors. If k <= 0, it returns all neighbors
+        :param max_distance: float or None
+            If not None, neighbors of which distance is larger than it are removed
+
+        Returns
+        -------
+        neighbors : list of list of tuple
+            neighbors[i] is (index of indexed string, distance) list of strings[i],
+            sorted by distance
+        """
+        q, norms = self._encode(strings)
+        signatures = self._minhash(strings) if self.num_perm > 0 else None
+        return self._topk(q, norms, signatures, k, max_distance, exclude_self=False)
+
+    def pairwise(self, strings=None, k=10, max_distance=None):
+        """Top-k neighbors of each string among the strings, except itself.
+
+        :param strings: list of str or None
+            If None, all pairs of the indexed strings are computed. Else,
+            a temporal index of the strings is built with same metric,
+            ngram_range and LSH parameters, and indices refer to the strings
+        :param k: int
+            Number of neighbors. If k <= 0, all neighbors are returned
+        :param max_distance: float or None
+            If not None, only the neighbors not farther than it are returned
+
+        Returns
+        -------
+        neighbors : list of list of tuple
+            neighbors[i] is (index, distance) list of i-th string
+        """
+        if strings is not None:
+            index = StringDistanceIndex(strings, self.metric, self.ngram_range,
+                self.block_size, self.num_perm, self.bands, self.random_state)
+            return index.pairwise(k=k, max_distance=max_distance)
+        signatures = self._minhash(self.strings) if self.num_perm > 0 else None
+        return self._topk(self.x, self._norms, signatures, k, max_distance, exclude_self=True)
+
+    def _topk(self, q, norms, signatures, k, max_distance, exclude_self):
+        neighbors = []
+        xt = None if self.num_perm > 0 else self.x.T.tocsr()
+        for b in range(0, q.shape[0], self.block_size):
+            block = q[b:b+self.block_size]
+            if xt is not None:
+                prod = (block * xt).tocsr()
+                indptr, indices, data = prod.indptr, prod.indices, prod.data
+            else:
+                indptr, indices, data = self._candidate_products(
+                    block, signatures[b:b+self.block_size])
+            for r in range(block.shape[0]):
+                i = b + r
+                if norms[i] == 0:
+                    neighbors.append([])
+                    continue
+                idx = indices[indptr[r]:indptr[r+1]]
+                val = data[indptr[r]:indptr[r+1]]
+                if exclude_self:
+                    not_self = idx != i
+                    idx, val = idx[not_self], val[not_self]
+                dist = self._as_distance(val, norms[i], self._norms[idx])
+                if max_distance is not None:
+                    close = dist <= max_distance
+                    idx, dist = idx[close], dist[close]
+                if 0 < k < len(idx):
+                    part = np.argpartition(dist, k - 1)[:k]
+                    idx, dist = idx[part], dist[part]
+                order = np.lexsort((idx, dist))
+                neighbors.append([(int(idx[j]), float(dist[j])) for j in order])
+        return neighbors
+
+    def _candidate_products(self, block, signatures):
+        """It computes the products of LSH candidate pairs of a block at once.
+        Returns (indptr, indices, data) of the pairs which share n-grams"""
+        candidates = [self._lsh_candidates(signature) for signature in signatures]
+        lengths = np.asarray([len(c) for c in candidates], dtype=np.int64)
+        rows = np.repeat(np.arange(len(candidates)), lengths)
+        indices = np.concatenate(candidates) if candidates else np.zeros(0, dtype=np.int64)
+        data = np.asarray(block[rows].multiply(self.x[indices]).sum(axis=1)).ravel()
+        shared = data > 0
+        rows, indices, data = rows[shared], indices[shared], data[shared]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(candidates)))])
+        return indptr, indices, data
@@ -38,8 +38,28 @@ jaum_list = ['ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄸ', 'ㄹ',
 moum_list = ['ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅘ', 
               'ㅙ', 'ㅚ', 'ㅛ', 'ㅜ', 'ㅝ', 'ㅞ', 'ㅟ', 'ㅠ', 'ㅡ', 'ㅢ', 'ㅣ']
 
+# lookup tables: character -> (cho, jung, jong) and (cho, jung, jong) -> character
+_decompose_table = {}
+_compose_table = {}
+for _cho in chosung_list:
+    for _jung in jungsung_list:
+        for _jong in jongsung_list:
+            _c = chr(kor_begin + len(_compose_table))
+            _decompose_table[_c] = (_cho, _jung, _jong)
+            _compose_table[(_cho, _jung, _jong)] = _c
+# compatibility jamo: decompose(ㅋ) = (ㅋ, ' ', ' '), decompose(ㅗ) = (' ', ㅗ, ' ')
+_compose_str_table = dict(_compose_table)
+for _i in range(jaum_begin, jaum_end + 1):
+    _decompose_table[chr(_i)] = (chr(_i), ' ', ' ')
+    _compose_str_table[(chr(_i), ' ', ' ')] = chr(_i)
+for _i in range(moum_begin, moum_end + 1):
+    _decompose_table[chr(_i)] = (' ', chr(_i), ' ')
+    _compose_str_table[(' ', chr(_i), ' ')] = chr(_i)
+del _cho, _jung, _jong, _c, _i
+
 doublespace_pattern = re.compile('\s+')
 repeatchars_pattern = re.compile('(\w)\\1{3,}')
+encoder_filter = re.compile('[^ㄱ-ㅎㅏ-ㅣ가-힣 0-9]')
 
 def normalize(doc, english=False, number=False, punctuation=False, remove_repeat = 0, remains={}):
     message = 'normalize func will be moved soynlp.normalizer at ver 0.1\nargument remains will be removed at ver 0.1'
@@ -74,23 +94,50 @@ def normalize(doc, english=False, number=False, punctuation=False, remove_repeat
     return doublespace_pattern.sub(' ', ''.join(f)).strip()
 
 def compose(chosung, jungsung, jongsung):
-    return chr(kor_begin + chosung_base * chosung_list.index(chosung) + jungsung_base * jungsung_list.index(jungsung) + jongsung_list.index(jongsung))
+    try:
+        return _compose_table[(chosung, jungsung, jongsung)]
+    except KeyError:
+        # raise ValueError of list.index same with arithmetic composition
+        return chr(kor_begin + chosung_base * chosung_list.index(chosung) + jungsung_base * jungsung_list.index(jungsung) + jongsung_list.index(jongsung))
 
 def decompose(c):
-    if not character_is_korean(c):
+    try:
+        return _decompose_table[c]
+    except KeyError:
+        # raise TypeError if c is not a character
+        character_is_korean(c)
         return None
-    i = to_base(c)
-    if (jaum_begin <= i <= jaum_end):
-        return (c, ' ', ' ')
-    if (moum_begin <= i <= moum_end):
-        return (' ', c, ' ')    
-    i -= kor_begin
-    cho  = i // chosung_base
-    jung = ( i - cho * chosung_base ) // jungsung_base 
-    jong = ( i - cho * chosung_base - jung * jungsung_base )    
-    return (chosung_list[cho], jungsung_list[jung], jongsung_list[jong])
+
+def compose_str(jamos):
+    """
+    :param jamos: iterable of tuple
+        (cho, jung, jong) tuples such as the returns of decompose_str.
+        Single jaum or moum is represented as (ㅋ, ' ', ' ') or (' ', ㅗ, ' ')
+
+    Usage
+    -----
+        >>> compose_str([('ㄱ', 'ㅏ', 'ㄴ'), ('ㅋ', ' ', ' ')])
+        $ '간ㅋ'
+    """
+    try:
+        return ''.join([_compose_str_table[tuple(jamo)] for jamo in jamos])
+    except KeyError as e:
+        raise ValueError('{} is not composable'.format(e))
+
+def decompose_str(s):
+    """It returns list of (cho, jung, jong) tuples.
+    For not Korean characters, it returns None at the position
+
+    Usage
+    -----
+        >>> decompose_str('간ㅋa')
+        $ [('ㄱ', 'ㅏ', 'ㄴ'), ('ㅋ', ' ', ' '), None]
+    """
+    return list(map(_decompose_table.get, s))
 
 def character_is_korean(c):
+    if c in _decompose_table:
+        return True
     i = to_base(c)
     return (kor_begin <= i <= kor_end) or (jaum_begin <= i <= jaum_end) or (moum_begin <= i <= moum_end)
 
@@ -103,14 +150,15 @@ def character_is_jaum(c):
 def character_is_moum(c):
     return (moum_begin <= to_base(c) <= moum_end)
 
-def to_base(c):
-    if sys.version_info.major == 2:
+if sys.version_info.major == 2:
+    def to_base(c):
         if type(c) == str or type(c) == unicode:
             return ord(c)
         else:
             raise TypeError
-    else:
-        if type(c) == str or type(c) == int:
+else:
+    def to_base(c):
+        if type(c) is str or type(c) is int:
             return ord(c)
         else:
             raise TypeError
@@ -152,14 +200,104 @@ class ConvolutionHangleEncoder:
             ' ': 40, 'ㄳ': 43, 'ㄵ': 45, 'ㄶ': 46, 'ㄺ': 49, 'ㄻ': 50, 'ㄼ': 51, 'ㄽ': 52,
             'ㄾ': 53, 'ㄿ': 54, 'ㅀ': 55, 'ㅄ': 58
         }
-    
+        self._index_table = self._build_index_table()
+        self._buffers = {}
+
+    def _build_index_table(self):
+        # code point -> (cho, jung, jong) indices. -1 means empty slot
+        # The last row is used for the code points out of table
+        table = np.full((kor_end + 2, 3), -1, dtype=np.int16)
+        table[:, 0] = self.unk
+        i = np.arange(kor_end - kor_begin + 1)
+        table[kor_begin:kor_end+1, 0] = i // chosung_base
+        table[kor_begin:kor_end+1, 1] = self.jung_begin + (i % chosung_base) // jungsung_base
+        table[kor_begin:kor_end+1, 2] = self.jong_begin + i % jungsung_base
+        for char, idx in self.jamo_to_idx.items():
+            table[ord(char), 0] = idx
+        for number in range(10):
+            table[48 + number, 0] = self.number_begin + number
+        table[32, 0] = self.space
+        return table
+
     def encode(self, sent):
-        onehot = self.sent_to_onehot(sent)
-        x = np.zeros((len(onehot), self.dim))
-        for i, xi in enumerate(onehot):
-            for j in xi:
-                x[i,j] = 1
+        chars = self._normalize(sent)
+        idxs = self._index_table[self._to_codes(chars)]
+        x = np.zeros((len(chars), self.dim))
+        rows, cols = np.nonzero(idxs >= 0)
+        x[rows, idxs[rows, cols]] = 1
         return x
+
+    def encode_batch(self, sents, max_len, output='index', dtype=np.int8, copy=False):
+        """
+        :param sents: list of str
+            Input sentences. They are normalized and truncated to max_len
+        :param max_len: int
+            Maximum length of sentence
+        :param output: str
+            'index' : (batch, max_len, 3) (cho, jung, jong) index tensor.
+                Characters of which index is single such as number,
+                space and jamo have index at [:,:,0] and -1 at [:,:,1:].
+                Padding is -1
+            'onehot' : (batch, max_len, dim) int8 dense one-hot tensor
+            'sparse' : scipy.sparse.csr_matrix of which shape is
+                (batch * max_len, dim). Row b * max_len + i is i-th character
+                of b-th sentence
+        :param dtype: numpy.dtype
+            Type of index tensor. Default is numpy.int8
+        :param copy: Boolean
+            The dense outputs are views of buffers reused in next calls.
+            If True, it returns a copy
+
+        Returns
+        -------
+        x : numpy.ndarray or scipy.sparse.csr_matrix
+        """
+
+        if not (output in {'index', 'onehot', 'sparse'}):
+            raise ValueError("output must be one of ['index', 'onehot', 'sparse']")
+
+        chars = [self._normalize(sent)[:max_len] for sent in sents]
+        n_sents = len(chars)
+        lengths = np.fromiter((len(c) for c in chars), dtype=np.int64, count=n_sents)
+        idxs = self._index_table[self._to_codes(''.join(chars))]
+        rows = np.repeat(np.arange(n_sents), lengths)
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cols = np.arange(rows.shape[0]) - offsets
+
+        if output == 'sparse':
+            from scipy.sparse import csr_matrix
+            positions = rows * max_len + cols
+            valid = idxs >= 0
+            sparse_rows = np.repeat(positions, valid.sum(axis=1))
+            sparse_cols = idxs[valid]
+            data = np.ones(sparse_cols.shape[0], dtype=np.int8)
+            return csr_matrix((data, (sparse_rows, sparse_cols)),
+                shape=(n_sents * max_len, self.dim))
+
+        if output == 'index':
+            x = self._get_buffer('index', (n_sents, max_len, 3), dtype)
+            x.fill(-1)
+            x[rows, cols] = idxs
+        else:
+            x = self._get_buffer('onehot', (n_sents, max_len, self.dim), np.int8)
+            x.fill(0)
+            for j in range(3):
+                valid = idxs[:,j] >= 0
+                x[rows[valid], cols[valid], idxs[valid,j]] = 1
+        return x.copy() if copy else x
+
+    def _get_buffer(self, name, shape, dtype):
+        # reuse buffer if it has enough rows
+        buffer = self._buffers.get(name)
+        if (buffer is None or buffer.dtype != dtype or
+            buffer.shape[1:] != shape[1:] or buffer.shape[0] < shape[0]):
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer[:shape[0]]
+
+    def _to_codes(self, chars):
+        codes = np.frombuffer(chars.encode('utf-32-le'), dtype=np.uint32)
+        return np.minimum(codes, kor_end + 1)
     
     def sent_to_onehot(self, sent):
         chars = self._normalize(sent)
@@ -199,9 +337,7 @@ class ConvolutionHangleEncoder:
         return ''.join(chars)
         
     def _normalize(self, sent):
-        import re
-        regex = re.compile('[^ㄱ-ㅎㅏ-ㅣ가-힣 0-9]')
-        sent = regex.sub(' ', sent)
+        sent = encoder_filter.sub(' ', sent)
         sent = doublespace_pattern.sub(' ', sent).strip()
         return sent
         
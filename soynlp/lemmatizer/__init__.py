@@ -1,6 +1,9 @@
 from ._lemmatizer import Lemmatizer
 from ._lemmatizer import lemma_candidate
 from ._lemmatizer import lemma_candidate_chat
+from ._lemmatizer import build_surface_index
 from ._conjugation import conjugate
 from ._conjugation import conjugate_chat
-from ._conjugation import _conjugate_stem
\ No newline at end of file
+from ._conjugation import _conjugate_stem
+from ._conjugation import clear_conjugation_cache
+from ._conjugation import set_conjugation_cache_size
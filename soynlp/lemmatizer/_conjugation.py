@@ -1,7 +1,12 @@
 # -*- encoding:utf8 -*-
 
+from functools import lru_cache
 from soynlp.hangle import compose, decompose
 
+# default maximum number of memoized (stem, ending) and stem conjugations.
+# Use set_conjugation_cache_size to change it
+conjugation_cache_size = 2**16
+
 positive_moum = set('ㅏㅑㅗㅛ') # 4 개의 양성모음만 기록
 negative_moum = set('ㅓㅕㅜㅠ') # 4 개의 음성모음만 기록
 neuter_moum = set('ㅡㅣ')
@@ -44,6 +49,21 @@ def conjugate_chat(stem, ending, enforce_moum_harmoney=False, debug=False):
     return candidates
 
 def conjugate(stem, ending, enforce_moum_harmoney=False, debug=False):
+    """It returns set of surfaces of (stem, ending).
+    The results are memoized. Debug mode skips the cache."""
+    if debug:
+        return _conjugate(stem, ending, enforce_moum_harmoney, debug)
+    return set(_cached_conjugate(stem, ending, enforce_moum_harmoney))
+
+def _frozen_conjugate(stem, ending, enforce_moum_harmoney):
+    return frozenset(_conjugate(stem, ending, enforce_moum_harmoney))
+
+_conjugate_cache = lru_cache(maxsize=conjugation_cache_size)(_frozen_conjugate)
+
+def _cached_conjugate(stem, ending, enforce_moum_harmoney):
+    return _conjugate_cache(stem, ending, enforce_moum_harmoney)
+
+def _conjugate(stem, ending, enforce_moum_harmoney=False, debug=False):
 
     assert ending # ending must be inserted
 
@@ -299,6 +319,20 @@ def conjugate(stem, ending, enforce_moum_harmoney=False, debug=False):
     return candidates
 
 def _conjugate_stem(stem, debug=False):
+    """It returns set of surfaces of stem. The results are memoized."""
+    if debug:
+        return _conjugate_stem_(stem, debug)
+    return set(_cached_conjugate_stem(stem))
+
+def _frozen_conjugate_stem(stem):
+    return frozenset(_conjugate_stem_(stem))
+
+_conjugate_stem_cache = lru_cache(maxsize=conjugation_cache_size)(_frozen_conjugate_stem)
+
+def _cached_conjugate_stem(stem):
+    return _conjugate_stem_cache(stem)
+
+def _conjugate_stem_(stem, debug=False):
 
     l_len = len(stem)
     l_last = decompose(stem[-1])
@@ -415,4 +449,26 @@ def _conjugate_stem(stem, debug=False):
         if debug:
             print('이었 -> 였 규칙')
 
-    return candidates
\ No newline at end of file
+    return candidates
+
+def clear_conjugation_cache():
+    _conjugate_cache.cache_clear()
+    _conjugate_stem_cache.cache_clear()
+
+def set_conjugation_cache_size(maxsize):
+    """It replaces the memoization caches of conjugate and stem conjugation
+    with new ones of which maximum number of entries is maxsize. Memoized
+    conjugations are cleared.
+
+    :param maxsize: int or None
+        Maximum number of entries of each cache. 0 disables memoization,
+        and None means unbounded
+
+    Usage
+    -----
+        >>> set_conjugation_cache_size(2**20) # before build_surface_index of large dictionary
+    """
+    global _conjugate_cache, _conjugate_stem_cache
+    clear_conjugation_cache()
+    _conjugate_cache = lru_cache(maxsize=maxsize)(_frozen_conjugate)
+    _conjugate_stem_cache = lru_cache(maxsize=maxsize)(_frozen_conjugate_stem)
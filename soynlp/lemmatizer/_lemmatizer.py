@@ -1,25 +1,76 @@
 # -*- encoding:utf8 -*-
 
+import time
 from soynlp.hangle import compose, decompose
 from ._conjugation import conjugate, conjugate_chat
+from ._conjugation import _cached_conjugate
 
 class Lemmatizer:
-    def __init__(self, stems, endings, predefined=None):
+    def __init__(self, stems, endings, predefined=None, surface_index=None,
+        index_splits=False):
+        """
+        :param surface_index: None, True or dict
+            If True, it materializes {surface: {(stem, ending), ...}} index
+            from stems and endings, and lemmatize looks up the index
+            instead of running conjugation rules.
+            Prebuilt index from build_surface_index is also available.
+        :param index_splits: Boolean
+            If True, it indexes the prefixes of stems and the suffixes of endings,
+            and only the (l, r) splits that can be canonicalized to a known
+            (stem, ending) are passed to the conjugation rules.
+            The results are same with the default mode.
+            Call index_splits() again if stems or endings are modified.
+        """
         self._stems = stems
         self._endings = endings
         self._initialize()
         if predefined:
             self._predefined.update(predefined)
+        if surface_index is True:
+            surface_index = build_surface_index(stems, endings, self._predefined)
+        self._surface_index = surface_index
+        self._stem_prefixes = None
+        self._ending_suffixes = None
+        if index_splits:
+            self.index_splits()
 
     def _initialize(self):
         self._predefined = {'불어':('붇다', '불다'),
                             '그래':('그렇다',)
                            }
 
+    def index_splits(self):
+        """Every rule of lemma_candidate keeps l[:-1] in the stem
+        (stem = l[:-1] + c, l[:-1] + c + '르' or l + '으'), and keeps
+        r or r[1:] in the ending (ending = r, c + r[1:], or c + r).
+        These indices are the sets of the kept parts."""
+
+        stem_prefixes = {stem[:-1] for stem in self._stems}
+        stem_prefixes.update({stem[:-2] for stem in self._stems
+                              if stem[-1:] == '으' or stem[-1:] == '르'})
+        self._stem_prefixes = stem_prefixes
+        self._ending_suffixes = {ending[1:] for ending in self._endings if ending}
+
+    def _is_feasible_split(self, l, r, check_only_stem=False):
+        if (self._predefined) and ((l, r) in self._predefined):
+            return True
+        if not (l[:-1] in self._stem_prefixes):
+            return False
+        if check_only_stem:
+            return True
+        return ((r in self._endings) or
+                (r in self._ending_suffixes) or
+                (r[1:] in self._ending_suffixes))
+
     def lemmatize(self, word, check_only_stem=False):
+        if (self._surface_index is not None) and (not check_only_stem):
+            return set(self._surface_index.get(word, ()))
+        use_index = self._stem_prefixes is not None
         candidates = set()
         for i in range(1, len(word)+1):
             l, r = word[:i], word[i:]
+            if use_index and not self._is_feasible_split(l, r, check_only_stem):
+                continue
             for stem, ending in lemma_candidate(l, r, self._predefined):
                 if stem in self._stems:
                     if check_only_stem:
@@ -28,14 +79,114 @@ class Lemmatizer:
                         candidates.add((stem, ending))
         return candidates
 
+    def lemmatize_batch(self, words, check_only_stem=False):
+        """
+        :param words: iterable of str
+            Eojeols. Repeated eojeols are lemmatized only once.
+        :param check_only_stem: Boolean
+            See lemmatize
+
+        Returns
+        -------
+        lemmas : list of set
+            Each set consists of (stem, ending) tuples
+        """
+        cache = {}
+        lemmas = []
+        for word in words:
+            if not (word in cache):
+                cache[word] = self.lemmatize(word, check_only_stem)
+            lemmas.append(set(cache[word]))
+        return lemmas
+
     def candidates(self, word):
         candidates = set()
         for i in range(1, len(word) + 1):
             l = word[:i]
             r = word[i:]
-            candidates.update(self.lemma_candidate(l, r, self._predefined))
+            candidates.update(lemma_candidate(l, r, self._predefined))
         return candidates
 
+def build_surface_index(stems, endings, predefined=None, verbose=False):
+    """Materialize reverse index of conjugation, surface -> {(stem, ending), ...}
+
+    Every surface that conjugate generates from (stem, ending) pairs is
+    verified once with lemma_candidate, so looking up the index returns
+    the same candidates with Lemmatizer.lemmatize(surface).
+    (stem, ending) pairs which conjugation rules cannot handle, such as
+    endings of bare vowel ('ㅑ', 'ㅔ요'), are skipped.
+
+    It conjugates all of len(stems) x len(endings) pairs. With the default
+    dictionaries of PredicatorExtractor (about 5k stems and 1k endings),
+    it takes about 13 seconds per 50 stems. Build it once and reuse the
+    index (ex. pickle) rather than building it at every startup.
+
+    :param stems: collection of str
+        Stems of Adjectives and Verbs
+    :param endings: collection of str
+        Endings (Eomis)
+    :param predefined: dict or None
+        Predefined lemmas. See lemma_candidate
+    :param verbose: Boolean
+        If True, verbose mode on
+
+    Returns
+    -------
+    index : dict
+        {surface: {(stem, ending), ...}}
+
+    Usage
+    -----
+        >>> index = build_surface_index({'깨닫'}, {'았어'})
+        >>> index['깨달았어']
+        $ {('깨닫', '았어')}
+    """
+
+    # same filter with lemma_candidate
+    endings_ = []
+    for ending in endings:
+        if not ending:
+            continue
+        first = decompose(ending[0])
+        if first is None or first[2] == 'ㅎ':
+            continue
+        endings_.append(ending)
+
+    # generate all surfaces
+    surfaces = set()
+    n_stems = len(stems)
+    n_failures = 0
+    begin_time = time.time()
+    for i, stem in enumerate(stems):
+        if verbose and i % 100 == 0:
+            print('\r[Lemmatizer] conjugating {} / {} stems'.format(i, n_stems), end='', flush=True)
+        if not stem or decompose(stem[-1]) is None:
+            continue
+        for ending in endings_:
+            try:
+                surfaces.update(_cached_conjugate(stem, ending, False))
+            except Exception:
+                n_failures += 1
+
+    # verify surfaces with lemmatization rules
+    index = {}
+    n_surfaces = len(surfaces)
+    for i, surface in enumerate(surfaces):
+        if verbose and i % 10000 == 0:
+            print('\r[Lemmatizer] verifying {} / {} surfaces'.format(i, n_surfaces), end='', flush=True)
+        lemmas = set()
+        for e in range(1, len(surface) + 1):
+            l, r = surface[:e], surface[e:]
+            for stem, ending in lemma_candidate(l, r, predefined):
+                if (stem in stems) and (ending in endings):
+                    lemmas.add((stem, ending))
+        if lemmas:
+            index[surface] = lemmas
+    if verbose:
+        print('\r[Lemmatizer] indexed {} surfaces from {} stems, {} pairs skipped ({:.1f} sec){}'.format(
+            len(index), n_stems, n_failures, time.time() - begin_time, ' '*20), flush=True)
+    return index
+
 def debug_message(message, l, r):
     print('{}: {} + {}'.format(message, l, r))
 
@@ -1,16 +1,20 @@
 from ._normalizer import emoticon_normalize
+from ._normalizer import emoticon_normalize_batch
 from ._normalizer import remove_doublespace
 from ._normalizer import repeat_normalize
 from ._normalizer import only_hangle
 from ._normalizer import only_hangle_number
 from ._normalizer import only_text
 from ._normalizer import normalize
+from ._normalizer import Normalizer
 from ._normalizer import remain_hangle_on_last
 from ._normalizer import normalize_sent_for_lrgraph
 
 __all__ = [
     'normalize',
+    'Normalizer',
     'emoticon_normalize',
+    'emoticon_normalize_batch',
     'remove_doublespace',
     'repeat_normalize',
     'only_hangle',
@@ -5,7 +5,8 @@ if sys.version_info <= (2,7):
     reload(sys)
     sys.setdefaultencoding('utf-8')
 import re
-from soynlp.hangle import compose, decompose
+from functools import lru_cache
+from soynlp.hangle._hangle import _compose_table, _decompose_table
 
 doublespace_pattern = re.compile('\s+')
 repeatchars_pattern = re.compile('(\w)\\1{2,}')
@@ -19,22 +20,83 @@ hangle_filter = re.compile('[^ㄱ-ㅎㅏ-ㅣ가-힣]')
 hangle_number_filter = re.compile('[^ㄱ-ㅎㅏ-ㅣ가-힣0-9]')
 text_filter = re.compile('[^ㄱ-ㅎㅏ-ㅣ가-힣a-zA-Z0-9,\.\?\!\"\'-()\[\]\{\}]')
 
+class _TranslateTable(dict):
+    """str.translate table which maps the characters matched by any of the
+    single character patterns to space. Each code point is classified once
+    when it first appears, and then the table is a plain dict lookup."""
+
+    def __init__(self, patterns):
+        super().__init__()
+        self.patterns = patterns
+
+    def __missing__(self, key):
+        c = chr(key)
+        value = 32 if any(pattern.match(c) for pattern in self.patterns) else key
+        self[key] = value
+        return value
+
+class Normalizer:
+    """Compiled version of normalize.
+
+    The filtering steps (text_filter, alphabet, number, punctuation, symbol)
+    are merged into a translation table, so a document is normalized with
+    one str.translate, at most one regex pass for repeats, and whitespace
+    split. The result is same with normalize.
+
+    :param alphabet: Boolean
+        If True, it remains alphabet
+    :param number: Boolean
+        If True, it remains number
+    :param punctuation: Boolean
+        If True, it remains punctuation (,.?!)
+    :param symbol: Boolean
+        If True, it remains symbol ()[]{}`
+    :param remove_repeat: int
+        If positive, repeated characters are shorten to remove_repeat
+
+    Usage
+    -----
+        >>> normalizer = Normalizer(number=True, remove_repeat=2)
+        >>> normalizer('ㅋㅋㅋㅋㅋ 123 abc')
+        $ 'ㅋㅋ 123'
+        >>> normalizer.normalize_batch(docs)
+    """
+
+    def __init__(self, alphabet=False, number=False,
+        punctuation=False, symbol=False, remove_repeat=0):
+
+        patterns = [text_filter]
+        if not alphabet:
+            patterns.append(alphabet_pattern)
+        if not number:
+            patterns.append(number_pattern)
+        if not punctuation:
+            patterns.append(punctuation_pattern)
+        if not symbol:
+            patterns.append(symbol_pattern)
+        self._table = _TranslateTable(patterns)
+        self.remove_repeat = remove_repeat
+        self._repeat = '\\1' * remove_repeat
+
+    def __call__(self, doc):
+        doc = doc.translate(self._table)
+        if self.remove_repeat > 0:
+            doc = repeatchars_pattern.sub(self._repeat, doc)
+        return ' '.join(doc.split())
+
+    def normalize_batch(self, docs):
+        """It returns list of normalized docs"""
+        return [self(doc) for doc in docs]
+
+@lru_cache(maxsize=64)
+def _get_normalizer(alphabet, number, punctuation, symbol, remove_repeat):
+    return Normalizer(alphabet, number, punctuation, symbol, remove_repeat)
+
 def normalize(doc, alphabet=False, number=False,
     punctuation=False, symbol=False, remove_repeat=0):
 
-    doc = text_filter.sub(' ', doc)
-    if not alphabet:
-        doc = alphabet_pattern.sub(' ', doc)
-    if not number:
-        doc = number_pattern.sub(' ', doc)
-    if not punctuation:
-        doc = punctuation_pattern.sub(' ', doc)
-    if not symbol:
-        doc = symbol_pattern.sub(' ', doc)
-    if remove_repeat > 0:
-        doc = repeatchars_pattern.sub('\\1' * remove_repeat, doc)
-
-    return doublespace_pattern.sub(' ', doc).strip()
+    normalizer = _get_normalizer(alphabet, number, punctuation, symbol, remove_repeat)
+    return normalizer(doc)
 
 def remove_doublespace(sent):
     return doublespace_pattern.sub(' ', sent)
@@ -45,55 +107,59 @@ def repeat_normalize(sent, num_repeats=2):
     sent = doublespace_pattern.sub(' ', sent)
     return sent.strip()
 
+# complete syllables next to jaum; only these can be changed by emoticon_normalize
+emoticon_candidate_pattern = re.compile('(?<=[ㄱ-ㅎ])[가-힣]|[가-힣](?=[ㄱ-ㅎ])')
+
+def _is_jaum(c):
+    return 'ㄱ' <= c <= 'ㅎ'
+
+def _is_moum(c):
+    return 'ㅏ' <= c <= 'ㅣ'
+
+def _emoticon_replace(match):
+    sent, i, c = match.string, match.start(), match.group()
+    cho, jung, jong = _decompose_table[c]
+    prev_ = sent[i-1] if i > 0 else ''
+    next_ = sent[i+1] if i + 1 < len(sent) else ''
+    # ㅋ쿠ㅜ -> ㅋㅋㅜㅜ
+    if _is_jaum(prev_) and _is_moum(next_):
+        if (cho == prev_) and (jung == next_) and (jong == ' '):
+            return cho + jung
+        return c
+    # 앜ㅋ -> 아ㅋㅋ. The character is removed if jongsung is different
+    if _is_jaum(next_):
+        if jong == next_:
+            return _compose_table[(cho, jung, ' ')] + jong
+        return ''
+    # ㅋ쿠 -> ㅋㅋㅜ. The character is removed if chosung is different
+    if cho == prev_:
+        return cho + jung
+    return ''
+
 def emoticon_normalize(sent, num_repeats=2):
     if not sent:
         return sent
+    sent = emoticon_candidate_pattern.sub(_emoticon_replace, sent)
+    return repeat_normalize(sent, num_repeats)
 
-    # Pattern matching ㅋ쿠ㅜ
-    def pattern(idx):
-        # Jaum: 0, Moum: 1, Complete: 2, else -1
-        if 12593 <= idx <= 12622:
-            return 0
-        elif 12623 <= idx <= 12643:
-            return 1
-        elif 44032 <= idx <= 55203:
-            return 2
-        else:
-            return -1
-
-    idxs = [pattern(ord(c)) for c in sent]
-    sent_ = []
-    last_idx = len(idxs) - 1
-    for i, (idx, c) in enumerate(zip(idxs, sent)):
-        if (i > 0 and i < last_idx) and (idxs[i-1] == 0 and idx == 2 and idxs[i+1] == 1):
-            cho, jung, jong = decompose(c)
-            if (cho == sent[i-1]) and (jung == sent[i+1]) and (jong == ' '):
-                sent_.append(cho)
-                sent_.append(jung)
-            else:
-                sent_.append(c)
-        elif (i < last_idx) and (idx == 2) and (idxs[i+1] == 0):
-            cho, jung, jong = decompose(c)
-            if (jong == sent[i+1]):
-                sent_.append(compose(cho, jung, ' '))
-                sent_.append(jong)
-        elif (i > 0) and (idx == 2 and idxs[i-1] == 0):
-            cho, jung, jong = decompose(c)
-            if (cho == sent[i-1]):
-                sent_.append(cho)
-                sent_.append(jung)
-        else:
-            sent_.append(c)
-    return repeat_normalize(''.join(sent_), num_repeats)
+def emoticon_normalize_batch(sents, num_repeats=2):
+    """It returns list of emoticon_normalize(sent, num_repeats)"""
+    return [emoticon_normalize(sent, num_repeats) for sent in sents]
+
+_only_hangle_table = _TranslateTable([hangle_filter])
+_only_hangle_number_table = _TranslateTable([hangle_number_filter])
+_only_text_table = _TranslateTable([text_filter])
+_lrgraph_table = _TranslateTable([text_filter, symbol_pattern])
+_last_hangle_pattern = re.compile('.*[ㄱ-ㅎㅏ-ㅣ가-힣]')
 
 def only_hangle(sent):
-    return doublespace_pattern.sub(' ',hangle_filter.sub(' ', sent)).strip()
+    return ' '.join(sent.translate(_only_hangle_table).split())
 
 def only_hangle_number(sent):
-    return doublespace_pattern.sub(' ',hangle_number_filter.sub(' ', sent)).strip()
+    return ' '.join(sent.translate(_only_hangle_number_table).split())
 
 def only_text(sent):
-    return doublespace_pattern.sub(' ',text_filter.sub(' ', sent)).strip()
+    return ' '.join(sent.translate(_only_text_table).split())
 
 def remain_hangle_on_last(eojeol):
     matchs = list(hangle_pattern.finditer(eojeol))
@@ -103,10 +169,10 @@ def remain_hangle_on_last(eojeol):
     return eojeol[:last_index].strip()
 
 def normalize_sent_for_lrgraph(sent):
-    sent = text_filter.sub(' ', sent)
-    sent = symbol_pattern.sub(' ', sent)
-    sent_ = [remain_hangle_on_last(eojeol) for eojeol in sent.split()]
-    sent_ = [eojeol for eojeol in sent_ if eojeol]
-    if not sent_:
-        return ''
+    sent_ = []
+    for eojeol in sent.translate(_lrgraph_table).split():
+        # same with remain_hangle_on_last; eojeol has no whitespace
+        match = _last_hangle_pattern.match(eojeol)
+        if match:
+            sent_.append(match.group())
     return ' '.join(sent_)
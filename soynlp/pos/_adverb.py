@@ -1,7 +1,11 @@
+from soynlp.utils.bundle import load_dictionary_bundle
 from soynlp.utils.utils import installpath
 
 def load_default_adverbs(path=None):
     if path is None:
+        bundle = load_dictionary_bundle()
+        if bundle is not None:
+            return bundle.words('adverbs')
         path = '%s/postagger/dictionary/default/Adverb/adverb.txt' % installpath
     with open(path, encoding='utf-8') as f:
         words = {word.strip().split()[0] for word in f}
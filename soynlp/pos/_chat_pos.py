@@ -11,6 +11,7 @@ from soynlp.predicator import Predicator
 from soynlp.predicator import PredicatorExtractor
 from soynlp.tokenizer import MaxScoreTokenizer
 from soynlp.utils import LRGraph
+from soynlp.utils.bundle import load_dictionary_bundle
 from soynlp.utils.utils import installpath
 from ._news_pos import NewsPOSExtractor
 
@@ -24,9 +25,13 @@ class ChatPOSExtractor(NewsPOSExtractor):
         eojeols = self.eojeols
         total_frequency = sum(eojeols.values())
 
-        path = '%s/postagger/dictionary/default/Josa/josa_chat.txt' % installpath
-        with open(path, encoding='utf-8') as f:
-            self.josas = {word.strip() for word in f}
+        bundle = load_dictionary_bundle()
+        if bundle is not None:
+            self.josas = bundle.words('josa_chat')
+        else:
+            path = '%s/postagger/dictionary/default/Josa/josa_chat.txt' % installpath
+            with open(path, encoding='utf-8') as f:
+                self.josas = {word.strip() for word in f}
 
         eojeols, nouns, adjectives, verbs, adverbs = self._match_word(eojeols)
 
@@ -17,8 +17,12 @@ from collections import defaultdict
 from collections import namedtuple
 from soynlp.hangle import character_is_complete_korean
 from soynlp.utils import EojeolCounter
+from soynlp.utils import check_n_jobs
 from soynlp.utils import get_process_memory
+from soynlp.utils import iter_chunks
 from soynlp.utils import LRGraph
+from soynlp.utils import parallel_imap
+from soynlp.utils.bundle import load_dictionary_bundle
 from soynlp.utils.utils import installpath
 from soynlp.lemmatizer import conjugate
 from soynlp.lemmatizer import lemma_candidate
@@ -33,11 +37,96 @@ from ._adjective_vs_verb import rule_classify
 
 Predicator = namedtuple('Predicator', 'frequency lemma')
 
+# number of eojeols in a partition of lemma candidating
+chunk_size = 5000
+
+def _build_trie(words, reverse=False):
+    """It returns character trie of nested dict. Key '' marks the end of word.
+    If reverse is True, words are inserted from the last character (suffix trie)"""
+    root = {}
+    for word in words:
+        node = root
+        for char in (word[::-1] if reverse else word):
+            node = node.setdefault(char, {})
+        node[''] = None
+    return root
+
+def _has_prefix(trie, s, min_length=1):
+    """It returns True if a prefix of s, not shorter than min_length, is in trie"""
+    node = trie
+    for i, char in enumerate(s, 1):
+        node = node.get(char)
+        if node is None:
+            return False
+        if i >= min_length and '' in node:
+            return True
+    return False
+
+def _is_noun_josa(eojeol, nouns, josa_trie):
+    """It returns True if eojeol = noun + josa. Josa suffix trie is walked
+    from the last character, and only the L parts of josa suffixes are
+    checked with noun set"""
+    node = josa_trie
+    i = len(eojeol)
+    while i > 1:
+        i -= 1
+        node = node.get(eojeol[i])
+        if node is None:
+            return False
+        if '' in node and eojeol[:i] in nouns:
+            return True
+    return False
+
+def _lemmatize(eojeol_counts, stems, eomis, nouns, josa_trie):
+    """It returns (number of eojeols, lemmas, eomi_to_word_count) of
+    (eojeol, count) pairs"""
+    lemmas = {}
+    eomi_to_word_count = defaultdict(list)
+    n_eojeols = 0
+
+    for eojeol, count in eojeol_counts:
+        n_eojeols += 1
+        if _is_noun_josa(eojeol, nouns, josa_trie):
+            continue
+
+        n = len(eojeol)
+        lemma_candidates = set()
+
+        for i in range(1, n+1):
+            l, r = eojeol[:i], eojeol[i:]
+            for stem, eomi in lemma_candidate(l, r):
+                if (stem in stems) and (eomi in eomis):
+                    lemma_candidates.add((stem, eomi))
+
+        lemma_candidates_ = set()
+        for stem, eomi in lemma_candidates:
+            if eojeol in conjugate(stem, eomi):
+                lemma_candidates_.add((stem, eomi))
+
+        if lemma_candidates_:
+            lemmas[eojeol] = Predicator(count, lemma_candidates_)
+            for stem, eomi in lemma_candidates_:
+                eomi_to_word_count[eomi].append((eojeol, count))
+
+    return n_eojeols, lemmas, eomi_to_word_count
+
+_worker_state = {}
+
+def _initialize_worker(stems, eomis, nouns, josa_trie):
+    _worker_state['stems'] = stems
+    _worker_state['eomis'] = eomis
+    _worker_state['nouns'] = nouns
+    _worker_state['josa_trie'] = josa_trie
+
+def _lemmatize_in_worker(eojeol_counts):
+    return _lemmatize(eojeol_counts, _worker_state['stems'], _worker_state['eomis'],
+        _worker_state['nouns'], _worker_state['josa_trie'])
+
 class PredicatorExtractor:
 
     def __init__(self, nouns, josas=None, adjectives=None,
         verbs=None, eomis=None, extract_eomi=False, extract_stem=False,
-        verbose=True, ensure_normalized=False):
+        verbose=True, ensure_normalized=False, n_jobs=1):
 
         if not josas:
             josas = self._load_default_josa()
@@ -58,6 +147,7 @@ class PredicatorExtractor:
         self.extract_eomi = extract_eomi
         self.extract_stem = extract_stem
         self.ensure_normalized = ensure_normalized
+        self.n_jobs = n_jobs
 
         self._stem_surfaces = self._transform_stem_as_surfaces()
         self.eojeol_counter = None
@@ -66,7 +156,14 @@ class PredicatorExtractor:
         self._nouns = nouns
         self._eomis_ = {eomi for eomi in self._eomis} # original eomis
 
+        # prefix trie of nouns and suffix trie of josas
+        self._noun_trie = _build_trie(self._nouns)
+        self._josa_trie = _build_trie(self._josas, reverse=True)
+
     def _load_default_josa(self):
+        bundle = load_dictionary_bundle()
+        if bundle is not None:
+            return bundle.words('josa_chat')
         path = '%s/postagger/dictionary/default/Josa/josa_chat.txt' % installpath
         with open(path, encoding='utf-8') as f:
             josas = {word.strip() for word in f}
@@ -83,12 +180,21 @@ class PredicatorExtractor:
                     stems.add(word)
             return stems
 
+        bundle = load_dictionary_bundle()
+        if bundle is not None:
+            adjectives = bundle.counts('adjective_stems', min_frequency)
+            verbs = bundle.counts('verb_stems', min_frequency)
+            return adjectives, verbs
+
         dirs = '%s/lemmatizer/dictionary/default/Stem' % installpath
         adjectives = load('%s/Adjective.txt' % dirs)
         verbs = load('%s/Verb.txt' % dirs)
         return adjectives, verbs
 
     def _load_default_eomis(self, min_frequency=20):
+        bundle = load_dictionary_bundle()
+        if bundle is not None:
+            return bundle.counts('eomis', min_frequency)
         path = '%s/lemmatizer/dictionary/default/Eomi/Eomi.txt' % installpath
         eomis = set()
         with open(path, encoding='utf-8') as f:
@@ -112,8 +218,16 @@ class PredicatorExtractor:
         return {noun for noun in nouns if not (noun in removals)}
 
     def _transform_stem_as_surfaces(self):
-        surfaces = set()
+        bundle = load_dictionary_bundle()
+        if bundle is not None:
+            default_stems, default_surfaces = bundle.default_stem_surfaces()
+            if self._stems == default_stems:
+                return set(default_surfaces)
+        precomputed = bundle.stem_surfaces() if bundle is not None else {}
+        surfaces = set().union(*[precomputed[stem] for stem in self._stems if stem in precomputed])
         for stem in self._stems:
+            if stem in precomputed:
+                continue
             try:
                 for l in _conjugate_stem(stem):
                     surfaces.add(l)
@@ -247,17 +361,9 @@ class PredicatorExtractor:
         return adjectives, verbs
 
     def _prepare_predicator_lrgraph(self):
-
-        def contains_noun(eojeol):
-            n = len(eojeol)
-            for e in range(2, n + 1):
-                if eojeol[:e] in self._nouns:
-                    return True
-            return False
-
-        eojeols = {k:v for k, v in self.eojeol_counter._counter.items()}
-        eojeols = {eojeol:count for eojeol, count in eojeols.items()
-                   if len(eojeol) > 1 and not contains_noun(eojeol)}
+        noun_trie = self._noun_trie
+        eojeols = {eojeol:count for eojeol, count in self.eojeol_counter._counter.items()
+                   if len(eojeol) > 1 and not _has_prefix(noun_trie, eojeol, 2)}
         lrgraph = EojeolCounter()._to_lrgraph(eojeols)
         return lrgraph
 
@@ -344,14 +450,6 @@ class PredicatorExtractor:
         return lemmas
 
     def _as_lemma_candidates(self, eojeol_counter=None):
-
-        def is_noun_josa(eojeol):
-            for i in range(1, len(eojeol)):
-                if ((eojeol[:i] in self._nouns) and
-                    (eojeol[i:] in self._josas)):
-                    return True
-            return False
-
         self._num_of_covered_eojeols = 0
         self._count_of_covered_eojeols = 0
 
@@ -359,33 +457,30 @@ class PredicatorExtractor:
         eomi_to_word_count = defaultdict(lambda: [])
         num_eojeol = len(eojeol_counter)
 
-        for i, (eojeol, count) in enumerate(eojeol_counter.items()):
-            if self.verbose and i % 5000 == 4999:
-                message = 'lemmatizing {} / {} words'.format(i+1, num_eojeol)
+        # eojeols are independent until _remove_wrong_eomis. The partitions
+        # are merged in order, so the result is same with n_jobs=1
+        n_jobs = check_n_jobs(self.n_jobs)
+        partitions = iter_chunks(eojeol_counter.items(), chunk_size)
+        if n_jobs == 1:
+            results = (_lemmatize(partition, self._stems, self._eomis, self._nouns, self._josa_trie)
+                       for partition in partitions)
+        else:
+            initargs = (self._stems, self._eomis, self._nouns, self._josa_trie)
+            results = parallel_imap(_lemmatize_in_worker, partitions, n_jobs,
+                _initialize_worker, initargs)
+
+        n_eojeols = 0
+        for n_eojeols_, lemmas_, eomi_to_word_count_ in results:
+            lemmas.update(lemmas_)
+            for eomi, word_count in eomi_to_word_count_.items():
+                eomi_to_word_count[eomi] += word_count
+            self._num_of_covered_eojeols += len(lemmas_)
+            self._count_of_covered_eojeols += sum(
+                predicator.frequency for predicator in lemmas_.values())
+            n_eojeols += n_eojeols_
+            if self.verbose:
+                message = 'lemmatizing {} / {} words'.format(n_eojeols, num_eojeol)
                 self._print(message, replace=True, newline=False)
-            if is_noun_josa(eojeol):
-                continue
-
-            n = len(eojeol)
-            lemma_candidates = set()
-
-            for i in range(1, n+1):
-                l, r = eojeol[:i], eojeol[i:]
-                for stem, eomi in lemma_candidate(l, r):
-                    if (stem in self._stems) and (eomi in self._eomis):
-                        lemma_candidates.add((stem, eomi))
-
-            lemma_candidates_ = set()
-            for stem, eomi in lemma_candidates:
-                if eojeol in conjugate(stem, eomi):
-                    lemma_candidates_.add((stem, eomi))
-
-            if lemma_candidates_:
-                lemmas[eojeol] = Predicator(count, lemma_candidates_)
-                for stem, eomi in lemma_candidates_:
-                    eomi_to_word_count[eomi].append((eojeol, count))
-                self._num_of_covered_eojeols += 1
-                self._count_of_covered_eojeols += count
 
         lemmas = self._remove_wrong_eomis(lemmas, eomi_to_word_count)
         if self.verbose:
@@ -3,5 +3,6 @@ from ._tokenizer import MaxScoreTokenizer
 from ._tokenizer import MaxLRScoreTokenizer
 from ._tokenizer import RegexTokenizer
 from ._normalizer import normalize
+from ._normalizer import normalize_batch
 from ._noun_tokenizer import NounLMatchTokenizer
 from ._noun_tokenizer import NounMatchTokenizer
\ No newline at end of file
@@ -1,7 +1,7 @@
 # -*- encoding:utf8 -*-
 
 import re
-from soynlp.hangle import decompose, compose
+from soynlp.hangle._hangle import _compose_table, _decompose_table
 
 repeatchars_patterns = [
     re.compile('(\w\w\w\w)\\1{3,}'),
@@ -10,36 +10,66 @@ repeatchars_patterns = [
     re.compile('(\w)\\1{3,}')
 ]
 
+# a token is changed by repeatchars_patterns only if it has a match of this pattern
+repeat_detector = re.compile('(\w{1,4})\\1{3,}')
+
 def normalize(sentence, num_repeat=2):
-    tokens = sentence.split()
-    return ' '.join(_normalize_korean_token(token, num_repeat) for token in tokens)
+    sentence = _normalize_emoji(' '.join(sentence.split()))
+    if num_repeat > 0:
+        sentence = _remove_repeat_in_sentence(sentence, num_repeat)
+    return sentence
+
+def normalize_batch(sentences, num_repeat=2):
+    """It returns list of normalize(sentence, num_repeat)"""
+    return [normalize(sentence, num_repeat) for sentence in sentences]
 
 def _normalize_korean_token(token, num_repeat=2):
     token = _normalize_emoji(token)
     token = _remove_repeat(token, num_repeat)
     return token
 
+def _remove_repeat_in_sentence(sentence, num_repeat=2):
+    """Tokens are separated by single space. It finds the tokens which have
+    repeats with one scan of repeat_detector, and applies _remove_repeat only
+    to those tokens"""
+    chunks = []
+    end = 0
+    for match in repeat_detector.finditer(sentence):
+        # the token has already been normalized
+        if match.start() < end:
+            continue
+        begin = sentence.rfind(' ', 0, match.start()) + 1
+        stop = sentence.find(' ', match.end())
+        if stop < 0:
+            stop = len(sentence)
+        chunks.append(sentence[end:begin])
+        chunks.append(_remove_repeat(sentence[begin:stop], num_repeat))
+        end = stop
+    if end == 0:
+        return sentence
+    chunks.append(sentence[end:])
+    return ''.join(chunks)
+
 def _remove_repeat(token, num_repeat=2):
     if num_repeat > 0:
         for pattern in repeatchars_patterns:
             token = pattern.sub('\\1' * num_repeat, token)
     return token
 
+# complete syllables followed by jamo; only these can be changed by _normalize_emoji
+emoji_candidate_pattern = re.compile('[가-힣](?=[ㄱ-ㅎㅏ-ㅣ])')
+
+def _emoji_replace(match):
+    c = match.group()
+    n = match.string[match.end()]
+    cho, jung, jong = _decompose_table[c]
+    # 앜ㅋㅋㅋㅋ -> 아ㅋㅋㅋㅋㅋ
+    if jong == n:
+        return _compose_table[(cho, jung, ' ')] + n
+    # ㅋ쿠ㅜㅜ -> ㅋㅋㅜㅜㅜ
+    if (jong == ' ') and (jung == n):
+        return cho + jung
+    return c
+
 def _normalize_emoji(token):
-    if len(token) <= 1:
-        return token
-    token_ = []
-    decomposeds = [decompose(c) for c in token]
-    for char, cd, nd in zip(token, decomposeds, decomposeds[1:]):
-        if cd == None or nd == None:
-            token_.append(char)
-            continue
-        # 앜ㅋㅋㅋㅋ -> 아ㅋㅋㅋㅋㅋ
-        if (nd[1] == ' ') and (cd[2] == nd[0]):
-            token_.append(compose(cd[0], cd[1], ' ') + nd[0])
-        # ㅋ쿠ㅜㅜ -> ㅋㅋㅜㅜㅜ
-        elif (cd[2] == ' ') and (nd[0] == ' ') and (cd[1] == nd[1]):
-            token_.append((cd[0] + cd[1]) if cd [0] != ' ' else cd[1])
-        else:
-            token_.append(char)
-    return ''.join(token_) + token[-1]
\ No newline at end of file
+    return emoji_candidate_pattern.sub(_emoji_replace, token)
@@ -3,17 +3,27 @@ from .utils import get_process_memory
 from .utils import sort_by_alphabet
 from .utils import check_dirs
 from .utils import most_similar
+from .utils import SimilarityIndex
 from .utils import check_corpus
+from .utils import check_n_jobs
+from .utils import iter_chunks
+from .utils import parallel_imap
 from .utils import DoublespaceLineCorpus
 from .utils import EojeolCounter
 from .utils import LRGraph
 from .math import svd
+from .math import svd_update
+from .math import svd_update_rows
+from .bundle import build_dictionary_bundle
+from .bundle import load_dictionary_bundle
 
 __all__ = [
     # utils
     'get_available_memory', 'get_process_memory', 'check_dirs'
-    'sort_by_alphabet', 'most_similar', 'DoublespaceLineCorpus',
-    'EojeolCounter', 'LRGraph',
+    'sort_by_alphabet', 'most_similar', 'SimilarityIndex', 'DoublespaceLineCorpus',
+    'EojeolCounter', 'LRGraph', 'check_n_jobs', 'iter_chunks', 'parallel_imap',
     # math
-    'svd'
+    'svd', 'svd_update', 'svd_update_rows',
+    # dictionary bundle
+    'build_dictionary_bundle', 'load_dictionary_bundle'
 ]
\ No newline at end of file
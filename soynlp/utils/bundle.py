@@ -0,0 +1,309 @@
+"""Compiled dictionary bundle
+
+All default dictionaries used by PredicatorExtractor and NewsPOSExtractor,
+together with the precomputed surfaces of each stem, are compiled into one
+binary file. The file is memory-mapped and each section is decoded only when
+it is requested.
+
+File layout
+-----------
+    magic (8 bytes) | version (uint32) | header length (uint32) | header (json)
+    | section 0 | section 1 | ...
+
+Each section is utf-8 encoded text, one entry per line.
+The header records size, mtime and sha1 of each source text dictionary.
+If the size or mtime of a source file has been changed after the bundle was
+built, the bundle is regarded as stale and load_dictionary_bundle returns
+None, so callers read the text files. Loading only stats the sources; the
+sha1 is compared when check_sources=True is given.
+Parsed sections are cached in the bundle object, and the default bundle is
+opened once per process.
+
+Usage
+-----
+    >>> from soynlp.utils.bundle import build_dictionary_bundle
+    >>> build_dictionary_bundle() # once, at build time
+
+    $ python -m soynlp.utils.bundle
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from .utils import installpath
+
+
+BUNDLE_MAGIC = b'SOYNLPDB'
+BUNDLE_VERSION = 3
+default_bundle_path = '%s/trained_models/dictionary.bundle' % installpath
+
+# PredicatorExtractor loads stems of which frequency >= 2 by default
+default_stem_min_frequency = 2
+
+_default_bundle = None
+_default_bundle_loaded = False
+
+
+def _default_sources():
+    return {
+        'josa_chat': '%s/postagger/dictionary/default/Josa/josa_chat.txt' % installpath,
+        'adverbs': '%s/postagger/dictionary/default/Adverb/adverb.txt' % installpath,
+        'adjective_stems': '%s/lemmatizer/dictionary/default/Stem/Adjective.txt' % installpath,
+        'verb_stems': '%s/lemmatizer/dictionary/default/Stem/Verb.txt' % installpath,
+        'eomis': '%s/lemmatizer/dictionary/default/Eomi/Eomi.txt' % installpath
+    }
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _file_state(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _relative_path(path):
+    """Paths in the package are stored relative to installpath, so the
+    bundle remains valid when the package is moved"""
+    path = os.path.abspath(path)
+    root = os.path.abspath(installpath) + os.path.sep
+    return path[len(root):] if path.startswith(root) else path
+
+def _absolute_path(path):
+    return path if os.path.isabs(path) else os.path.join(installpath, path)
+
+def _read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line]
+
+def build_dictionary_bundle(path=None, verbose=True, sources=None):
+    """
+    :param path: str
+        Bundle file path. Default is soynlp/trained_models/dictionary.bundle
+    :param verbose: Boolean
+        If True, verbose mode on
+    :param sources: dict or None
+        {section name: text dictionary path}. Default is the default
+        dictionaries of soynlp. It must have josa_chat, adverbs,
+        adjective_stems, verb_stems and eomis
+
+    Returns
+    -------
+    path : str
+        Path of the compiled bundle
+    """
+
+    # import here to avoid circular import (lemmatizer -> hangle -> ...)
+    from soynlp.lemmatizer import _conjugate_stem
+
+    if path is None:
+        path = default_bundle_path
+
+    if sources is None:
+        sources = _default_sources()
+
+    sections = {name:_read_lines(source) for name, source in sources.items()}
+
+    # precompute surfaces of all default stems
+    stems = {line.split()[0] for name in ['adjective_stems', 'verb_stems']
+             for line in sections[name]}
+    stem_surfaces = []
+    for stem in sorted(stems):
+        try:
+            surfaces = _conjugate_stem(stem)
+        except Exception as e:
+            if verbose:
+                print('Exception stem = {}, {}'.format(stem, e))
+            continue
+        stem_surfaces.append('{}\t{}'.format(stem, ' '.join(sorted(surfaces))))
+    sections['stem_surfaces'] = stem_surfaces
+
+    # union of surfaces of the stems which PredicatorExtractor loads by default.
+    # It is used as it is when the stems of extractor are same with them
+    default_stems = {line.split()[0] for name in ['adjective_stems', 'verb_stems']
+                     for line in sections[name]
+                     if int(line.split()[1]) >= default_stem_min_frequency}
+    default_surfaces = set()
+    for line in stem_surfaces:
+        stem, forms = line.split('\t')
+        if stem in default_stems:
+            default_surfaces.update(forms.split())
+    sections['default_stem_surfaces'] = sorted(default_surfaces)
+
+    # encode sections
+    header = {'sections': {}, 'sources': {}}
+    for name, source in sources.items():
+        size, mtime_ns = _file_state(source)
+        header['sources'][name] = {'path': _relative_path(source),
+            'sha1': _file_hash(source), 'size': size, 'mtime_ns': mtime_ns}
+    bodies = []
+    offset = 0
+    for name, lines in sections.items():
+        body = '\n'.join(lines).encode('utf-8')
+        header['sections'][name] = [offset, len(body)]
+        bodies.append(body)
+        offset += len(body)
+    header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    with open(path, 'wb') as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack('<II', BUNDLE_VERSION, len(header)))
+        f.write(header)
+        for body in bodies:
+            f.write(body)
+
+    if verbose:
+        print('[Dictionary Bundle] {} sections, {} stem surfaces were compiled to {}'.format(
+            len(sections), len(stem_surfaces), path))
+
+    return path
+
+class DictionaryBundle:
+    """Memory-mapped dictionary bundle. Use load_dictionary_bundle to open it."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        n_magic = len(BUNDLE_MAGIC)
+        if self._buffer[:n_magic] != BUNDLE_MAGIC:
+            raise ValueError('{} is not a soynlp dictionary bundle'.format(path))
+        version, header_length = struct.unpack('<II', self._buffer[n_magic:n_magic+8])
+        if version != BUNDLE_VERSION:
+            raise ValueError('Bundle version {} is not supported. Rebuild {}'.format(
+                version, path))
+        begin = n_magic + 8
+        header = json.loads(self._buffer[begin:begin+header_length].decode('utf-8'))
+        self._sections = header['sections']
+        self._sources = header['sources']
+        self._base = begin + header_length
+        self._cache = {}
+        self._parsed = {}
+
+    def stale_sources(self, check_hash=False):
+        """It returns list of section names of which source text dictionary
+        has been modified after the bundle was built. Sources which do not
+        exist any more are not checked.
+
+        :param check_hash: Boolean
+            If False, only size and mtime of sources are compared, and no
+            source file is read. If True, sha1 of source contents is also
+            compared, so edits which keep size and mtime are detected
+        """
+        stales = []
+        for name, source in self._sources.items():
+            path = _absolute_path(source['path'])
+            if not os.path.exists(path):
+                continue
+            if (_file_state(path) != (source['size'], source['mtime_ns']) or
+                (check_hash and _file_hash(path) != source['sha1'])):
+                stales.append(name)
+        return stales
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def lines(self, name):
+        if name not in self._cache:
+            offset, length = self._sections[name]
+            begin = self._base + offset
+            body = self._buffer[begin:begin+length].decode('utf-8')
+            self._cache[name] = body.split('\n') if body else []
+        return self._cache[name]
+
+    def words(self, name):
+        """It returns set of first column of the section"""
+        key = ('words', name)
+        if key not in self._parsed:
+            self._parsed[key] = frozenset(line.split()[0] for line in self.lines(name))
+        return set(self._parsed[key])
+
+    def counts(self, name, min_count=0):
+        """It returns set of words of which count is equal or larger than min_count"""
+        key = ('counts', name)
+        if key not in self._parsed:
+            pairs = [line.split() for line in self.lines(name)]
+            self._parsed[key] = [(word, int(count)) for word, count in pairs]
+        return {word for word, count in self._parsed[key] if count >= min_count}
+
+    def stem_surfaces(self):
+        """It returns {stem: frozenset of surfaces} dict. The dict is shared by
+        all callers, so do not modify it"""
+        key = ('stem_surfaces',)
+        if key not in self._parsed:
+            surfaces = {}
+            for line in self.lines('stem_surfaces'):
+                stem, forms = line.split('\t')
+                surfaces[stem] = frozenset(forms.split())
+            self._parsed[key] = surfaces
+        return self._parsed[key]
+
+    def default_stem_surfaces(self):
+        """It returns (default stems, union of their surfaces) as frozensets.
+        Default stems are adjective and verb stems of which frequency is
+        equal or larger than default_stem_min_frequency"""
+        key = ('default_stem_surfaces',)
+        if key not in self._parsed:
+            stems = frozenset(self.counts('adjective_stems', default_stem_min_frequency)
+                | self.counts('verb_stems', default_stem_min_frequency))
+            self._parsed[key] = (stems, frozenset(self.lines('default_stem_surfaces')))
+        return self._parsed[key]
+
+def load_dictionary_bundle(path=None, check_sources=False):
+    """
+    :param path: str
+        Bundle file path. If None, it loads the default bundle once and
+        reuses it.
+    :param check_sources: Boolean
+        If True, sha1 of source text dictionaries is compared with the
+        bundle. It reads all source files. Default is False, which compares
+        only size and mtime of the sources
+
+    Returns
+    -------
+    bundle : DictionaryBundle or None
+        It returns None when the bundle does not exist, is not compatible,
+        or is stale (a source text dictionary was edited after building).
+        Callers should fall back to the text dictionaries.
+    """
+
+    global _default_bundle, _default_bundle_loaded
+
+    if path is not None:
+        return _open_bundle(path, check_sources)
+
+    if check_sources:
+        _default_bundle_loaded = False
+    if not _default_bundle_loaded:
+        _default_bundle = _open_bundle(default_bundle_path, check_sources)
+        _default_bundle_loaded = True
+    return _default_bundle
+
+def _open_bundle(path, check_sources=False):
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = DictionaryBundle(path)
+    except Exception as e:
+        print('[Dictionary Bundle] failed to load {}, {}'.format(path, e))
+        return None
+    stales = bundle.stale_sources(check_sources)
+    if stales:
+        print('[Dictionary Bundle] {} is older than {}. Text dictionaries are used. '
+              'Rebuild it with python -m soynlp.utils.bundle'.format(path, ', '.join(stales)))
+        return None
+    return bundle
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', type=str, default=None, help='bundle file path')
+    args = parser.parse_args()
+    build_dictionary_bundle(args.path)
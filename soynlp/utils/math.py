@@ -1,16 +1,41 @@
+from contextlib import contextmanager
+import numpy as np
+import scipy.sparse as sp
 from sklearn.utils import check_random_state
 from sklearn.utils.extmath import randomized_svd
+from sklearn.utils.extmath import svd_flip
 
-def svd(X, n_components, n_iter=5, random_state=None):
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+def svd(X, n_components, n_iter=5, random_state=None,
+    block_size=None, dtype=None, n_oversamples=10, n_threads=None):
     """
-    :param X: scipy.sparse.csr_matrix
-        Input matrix
+    :param X: scipy.sparse.csr_matrix, numpy.ndarray or callable
+        Input matrix. It may be memory-mapped csr matrix (ex. soynlp.word.load_pmi).
+        If X is callable, X() must return new iterator of row blocks at each
+        call (ex. lambda: pmi_blocks(C)). Then rows are streamed 2 * n_iter + 2 times
+        and X is never in memory at once
     :param n_components: int
         Size of embedding dimension
     :param n_iter: int
         Maximum number of iteration. Default is 5
     :param random_state: random state
         Default is None
+    :param block_size: int or None
+        Number of rows multiplied at once. If None and X is matrix,
+        X is decomposed by sklearn.utils.extmath.randomized_svd at once
+    :param dtype: numpy.dtype or None
+        Data type of computation in block streaming mode. Use numpy.float32
+        to halve memory of projection. Default is dtype of X
+    :param n_oversamples: int
+        Number of additional random vectors of block streaming mode. Default is 10
+    :param n_threads: int or None
+        Maximum number of BLAS threads. It needs threadpoolctl.
+        If None, it uses the default of BLAS library
 
     Returns
     ----------
@@ -25,20 +50,196 @@ def svd(X, n_components, n_iter=5, random_state=None):
     Usage
     -----
         >>> U, Sigma, VT = svd(X, n_components=100)
+
+    Streaming PMI row blocks without building PMI matrix
+
+        >>> from soynlp.word import pmi_blocks
+        >>> U, Sigma, VT = svd(lambda: pmi_blocks(X, block_size=10000),
+        >>>     n_components=100, dtype=np.float32)
     """
 
     if (random_state == None) or isinstance(random_state, int):
         random_state = check_random_state(random_state)
 
-    n_features = X.shape[1]
+    with _limit_threads(n_threads):
+        if callable(X) or block_size is not None:
+            return _streaming_svd(X, n_components, n_iter, random_state,
+                block_size, dtype, n_oversamples)
+
+        n_features = X.shape[1]
+
+        if n_components >= n_features:
+            raise ValueError("n_components must be < n_features;"
+                             " got %d >= %d" % (n_components, n_features))
+
+        U, Sigma, VT = randomized_svd(
+            X, n_components,
+            n_iter = n_iter,
+            random_state = random_state)
+
+    return U, Sigma, VT
 
+@contextmanager
+def _limit_threads(n_threads):
+    if n_threads is None:
+        yield
+    elif threadpool_limits is None:
+        raise ValueError('n_threads needs threadpoolctl. Install it with pip install threadpoolctl')
+    else:
+        with threadpool_limits(limits=n_threads, user_api='blas'):
+            yield
+
+def _iter_row_blocks(X, block_size):
+    """It yields (begin, block) of row blocks"""
+    if callable(X):
+        begin = 0
+        for block in X():
+            yield begin, block
+            begin += block.shape[0]
+    else:
+        if block_size is None:
+            block_size = X.shape[0]
+        for begin in range(0, X.shape[0], block_size):
+            yield begin, X[begin:begin+block_size]
+
+def _dot(X, Y, dtype):
+    if sp.issparse(X):
+        if X.dtype != dtype:
+            X = X.astype(dtype)
+        return np.asarray(X @ Y)
+    return np.asarray(X, dtype=dtype) @ Y
+
+def _streaming_products(X, Omega, Q, block_size, dtype):
+    """It returns (X @ Omega, X.T @ Q) with one pass of row blocks.
+    Omega or Q can be None"""
+    Y, Z = [], None
+    for begin, block in _iter_row_blocks(X, block_size):
+        if Omega is not None:
+            Y.append(_dot(block, Omega, dtype))
+        if Q is not None:
+            Q_block = Q[begin:begin+block.shape[0]]
+            Z_block = _dot(block.T, Q_block, dtype)
+            Z = Z_block if Z is None else Z + Z_block
+    Y = np.vstack(Y) if Y else None
+    return Y, Z
+
+def _n_cols(X):
+    if callable(X):
+        for block in X():
+            return block.shape[1]
+        raise ValueError('Input X() yields no row block')
+    return X.shape[1]
+
+def _streaming_svd(X, n_components, n_iter, random_state, block_size, dtype, n_oversamples):
+    """Randomized SVD (Halko et al., 2011) which touches only row blocks of X"""
+    n_features = _n_cols(X)
     if n_components >= n_features:
         raise ValueError("n_components must be < n_features;"
                          " got %d >= %d" % (n_components, n_features))
+    if dtype is None:
+        dtype = np.float64 if callable(X) else X.dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        dtype = np.dtype(np.float64)
+
+    n_random = min(n_components + n_oversamples, n_features)
+    Omega = random_state.normal(size=(n_features, n_random)).astype(dtype)
+    Q, _ = _streaming_products(X, Omega, None, block_size, dtype)
+    Q, _ = np.linalg.qr(Q)
+
+    # power iteration normalized by QR decomposition
+    for _ in range(n_iter):
+        _, Z = _streaming_products(X, None, Q, block_size, dtype)
+        Z, _ = np.linalg.qr(Z)
+        Q, _ = _streaming_products(X, Z, None, block_size, dtype)
+        Q, _ = np.linalg.qr(Q)
+
+    # B = Q.T @ X
+    _, BT = _streaming_products(X, None, Q, block_size, dtype)
+    U_hat, Sigma, VT = np.linalg.svd(BT.T, full_matrices=False)
+    U = Q @ U_hat
+    U, VT = svd_flip(U, VT)
+    return U[:, :n_components], Sigma[:n_components], VT[:n_components]
 
-    U, Sigma, VT = randomized_svd(
-        X, n_components,
-        n_iter = n_iter,
-        random_state = random_state)
+def svd_update(U, Sigma, VT, A, B, n_components=None):
+    """Rank-c update of truncated SVD (Brand, 2006)
 
-    return U, Sigma, VT
\ No newline at end of file
+    It returns truncated SVD of U @ diag(Sigma) @ VT + A @ B.T without
+    decomposing the updated matrix again. The cost is O((n_rows + n_cols) (k + c)^2)
+    where k = len(Sigma) and c is rank of update.
+
+    :param U: numpy.ndarray
+        shape = (n_rows, k)
+    :param Sigma: numpy.ndarray
+        shape = (k,)
+    :param VT: numpy.ndarray
+        shape = (k, n_cols)
+    :param A: numpy.ndarray or scipy.sparse.matrix
+        shape = (n_rows, c)
+    :param B: numpy.ndarray or scipy.sparse.matrix
+        shape = (n_cols, c)
+    :param n_components: int or None
+        Size of embedding dimension after update. Default is k
+
+    Returns
+    -------
+    U, Sigma, VT : updated SVD
+    """
+    if n_components is None:
+        n_components = len(Sigma)
+    A = A.toarray() if sp.issparse(A) else np.asarray(A)
+    B = B.toarray() if sp.issparse(B) else np.asarray(B)
+    A = A.reshape(A.shape[0], -1)
+    B = B.reshape(B.shape[0], -1)
+    if A.shape[0] != U.shape[0] or B.shape[0] != VT.shape[1]:
+        raise ValueError('A must be (n_rows, c) and B must be (n_cols, c) shape')
+    V = VT.T
+    k, c = len(Sigma), A.shape[1]
+
+    # components of A and B orthogonal to current singular vectors
+    UA = U.T @ A
+    P, RA = np.linalg.qr(A - U @ UA)
+    VB = V.T @ B
+    Q, RB = np.linalg.qr(B - V @ VB)
+
+    K = np.zeros((k + c, k + c), dtype=np.result_type(Sigma, A, B))
+    K[:k, :k] = np.diag(Sigma)
+    K += np.vstack([UA, RA]) @ np.vstack([VB, RB]).T
+    U_k, Sigma, VT_k = np.linalg.svd(K, full_matrices=False)
+
+    U = np.hstack([U, P]) @ U_k[:, :n_components]
+    VT = VT_k[:n_components] @ np.vstack([VT, Q.T])
+    U, VT = svd_flip(U, VT)
+    return U, Sigma[:n_components], VT
+
+def svd_update_rows(U, Sigma, VT, rows, delta, n_components=None):
+    """It updates truncated SVD when some rows of matrix are changed or appended.
+    It is useful for daily refresh of PMI matrix, where changed rows are few.
+
+    :param U, Sigma, VT: truncated SVD of old matrix
+    :param rows: list of int
+        Row indices of changed rows. Indices equal or larger than n_rows
+        append new rows, and U is padded with zero rows up to max(rows) + 1
+    :param delta: numpy.ndarray or scipy.sparse.matrix
+        Difference of changed rows (new row - old row). New rows are their values.
+        shape = (len(rows), n_cols)
+
+    Returns
+    -------
+    U, Sigma, VT : updated SVD
+
+    Usage
+    -----
+        >>> changed = np.unique((X_new - X_old).nonzero()[0])
+        >>> U, Sigma, VT = svd_update_rows(U, Sigma, VT, changed, (X_new - X_old)[changed])
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if rows.size == 0:
+        return U, Sigma, VT
+    n_rows = max(U.shape[0], rows.max() + 1)
+    if n_rows > U.shape[0]:
+        U = np.vstack([U, np.zeros((n_rows - U.shape[0], U.shape[1]), dtype=U.dtype)])
+    A = np.zeros((n_rows, len(rows)), dtype=U.dtype)
+    A[rows, np.arange(len(rows))] = 1
+    B = delta.T
+    return svd_update(U, Sigma, VT, A, B, n_components)
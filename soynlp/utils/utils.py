@@ -1,10 +1,13 @@
 # -*- encoding:utf8 -*-
 
+import multiprocessing
 import os
 import psutil
 import sys
 from collections import defaultdict
-from sklearn.metrics import pairwise_distances
+from collections import deque
+import numpy as np
+import scipy.sparse as sp
 
 
 installpath = os.path.sep.join(
@@ -50,7 +53,7 @@ def most_similar(query, vector, item_to_idx, idx_to_item, topk=10):
     """
     :param query: str
         String type query word
-    :param vector: numpy.ndarray or scipy.sparse.matrix
+    :param vector: numpy.ndarray, scipy.sparse.matrix or SimilarityIndex
         Vector representation of row
     :param item_to_idx: dict
         Mapper from str type item to int type index
@@ -65,19 +68,215 @@ def most_similar(query, vector, item_to_idx, idx_to_item, topk=10):
     similars : list of tuple
         List contains tuples (item, cosine similarity)
         Its length is topk
+
+    When vector is a matrix, it is copied and L2-normalized to SimilarityIndex
+    at every call, which costs O(n_items x dim). For repeated queries, build
+    SimilarityIndex once and pass it as vector.
     """
 
     q = item_to_idx.get(query, -1)
     if q == -1:
         return []
-    qvec = vector[q].reshape(1,-1)
-    dist = pairwise_distances(qvec, vector, metric='cosine')[0]
-    sim_idxs = dist.argsort()
-    if topk > 0:
-        sim_idxs = sim_idxs[:topk+1]
-    similars = [(idx_to_item[idx], 1 - dist[idx]) for idx in sim_idxs if idx != q]
+    if not isinstance(vector, SimilarityIndex):
+        vector = SimilarityIndex(vector, dtype=np.float64)
+    sim_idxs, sims = vector.search_idx([q], topk + 1 if topk > 0 else -1)
+    similars = [(idx_to_item[idx], sim) for idx, sim in zip(sim_idxs[0], sims[0]) if idx != q]
     return similars
 
+class SimilarityIndex:
+    """Cosine similarity index of row vectors
+
+    Rows are L2-normalized once and stored as float32, so a batch of queries
+    is answered with one matrix multiplication and argpartition.
+    With n_bits > 0 it works as approximate index. Rows are hashed with
+    random hyperplanes into n_tables tables of n_bits bits (random projection
+    LSH), and only the rows in the same buckets with query are scored.
+
+    :param vector: numpy.ndarray or scipy.sparse.matrix
+        Vector representation of row. shape = (n_items, dim)
+    :param idx_to_item: list or None
+        Mapper from int type index to str type item
+    :param dtype: numpy.dtype
+        Data type of stored vectors. Default is numpy.float32
+    :param n_bits: int
+        Number of hyperplanes of each LSH table. If 0, it searches exactly
+    :param n_tables: int
+        Number of LSH tables. It is used only when n_bits > 0
+    :param batch_size: int
+        Number of queries scored at once. Score matrix of batch_size x n_items
+        is in memory at a time
+    :param random_state: int or None
+        Random seed of hyperplanes
+
+    Usage
+    -----
+        >>> index = SimilarityIndex(wv, idx_to_item)
+        >>> index.most_similar('영화', topk=5)
+        $ [('애니메이션', 0.83), ('드라마', 0.79), ...]
+        >>> index.most_similar(['영화', '배우'], topk=5)
+        $ [[('애니메이션', 0.83), ...], [('감독', 0.81), ...]]
+    """
+
+    def __init__(self, vector, idx_to_item=None, dtype=np.float32,
+        n_bits=0, n_tables=8, batch_size=256, random_state=None):
+
+        if n_bits < 0 or n_bits > 62:
+            raise ValueError('n_bits must be in [0, 62]')
+        if n_bits > 0 and n_tables <= 0:
+            raise ValueError('n_tables must be positive')
+
+        self.vector = self._normalize(vector, dtype)
+        self.idx_to_item = idx_to_item
+        self.item_to_idx = None if idx_to_item is None else {
+            item:idx for idx, item in enumerate(idx_to_item)}
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        self.batch_size = batch_size
+
+        if n_bits > 0:
+            self._build_tables(random_state)
+
+    def __len__(self):
+        return self.vector.shape[0]
+
+    def _normalize(self, vector, dtype):
+        if sp.issparse(vector):
+            vector = sp.csr_matrix(vector, dtype=dtype, copy=True)
+            norms = np.sqrt(np.asarray(vector.multiply(vector).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            vector.data /= np.repeat(norms, np.diff(vector.indptr)).astype(dtype)
+        else:
+            vector = np.array(vector, dtype=dtype, ndmin=2)
+            norms = np.linalg.norm(vector, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            vector /= norms
+        return vector
+
+    def _signature(self, vector):
+        projected = vector @ self._hyperplanes
+        bits = (np.asarray(projected) > 0).astype(np.int64)
+        bits = bits.reshape(bits.shape[0], self.n_tables, self.n_bits)
+        return bits @ (np.int64(1) << np.arange(self.n_bits, dtype=np.int64))
+
+    def _build_tables(self, random_state):
+        random = np.random.RandomState(random_state)
+        dim = self.vector.shape[1]
+        self._hyperplanes = random.randn(
+            dim, self.n_tables * self.n_bits).astype(self.vector.dtype)
+        signatures = self._signature(self.vector)
+        # each table is (sorted bucket keys, bucket offsets, rows sorted by key)
+        self._tables = []
+        for t in range(self.n_tables):
+            order = np.argsort(signatures[:, t], kind='mergesort')
+            keys, counts = np.unique(signatures[order, t], return_counts=True)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            self._tables.append((keys, offsets, order))
+
+    def _candidates(self, signatures):
+        # bucket ranges of all queries are found at once for each table
+        ranges = []
+        for t, (keys, offsets, order) in enumerate(self._tables):
+            b = np.searchsorted(keys, signatures[:, t])
+            b = np.minimum(b, len(keys) - 1)
+            found = keys[b] == signatures[:, t]
+            begin = np.where(found, offsets[b], 0)
+            end = np.where(found, offsets[b+1], 0)
+            ranges.append((order, begin, end))
+        for q in range(signatures.shape[0]):
+            candidates = [order[begin[q]:end[q]] for order, begin, end in ranges]
+            yield np.unique(np.concatenate(candidates))
+
+    def search(self, queries, topk=10):
+        """
+        :param queries: numpy.ndarray or scipy.sparse.matrix
+            Query vectors. shape = (n_queries, dim)
+        :param topk: int
+            Maximum number of similar items of each query.
+            If set top as negative value, it returns all items
+
+        Returns
+        -------
+        idxs : list of numpy.ndarray
+            Indices of similar rows, sorted by similarity in descending order
+        sims : list of numpy.ndarray
+            Cosine similarities of the rows
+        """
+        return self._search(self._normalize(queries, self.vector.dtype), topk)
+
+    def search_idx(self, rows, topk=10):
+        """It searches with the stored rows as queries. See search"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return self._search(self.vector[rows], topk)
+
+    def _search(self, queries, topk):
+        idxs, sims = [], []
+        for b in range(0, queries.shape[0], self.batch_size):
+            batch = queries[b:b+self.batch_size]
+            if self.n_bits > 0:
+                batch_idxs, batch_sims = self._search_approximately(batch, topk)
+            else:
+                batch_idxs, batch_sims = self._search_exactly(batch, topk)
+            idxs += batch_idxs
+            sims += batch_sims
+        return idxs, sims
+
+    def _scores(self, vector, queries):
+        scores = vector @ queries.T
+        if sp.issparse(scores):
+            scores = scores.toarray()
+        return np.asarray(scores).T
+
+    def _search_exactly(self, queries, topk):
+        scores = self._scores(self.vector, queries)
+        top = self._topk(scores, topk)
+        return list(top), [s[idx] for s, idx in zip(scores, top)]
+
+    def _search_approximately(self, queries, topk):
+        signatures = self._signature(queries)
+        idxs, sims = [], []
+        for query, candidates in zip(queries, self._candidates(signatures)):
+            scores = self._scores(self.vector[candidates], query.reshape(1, -1))
+            top = self._topk(scores, topk)[0]
+            idxs.append(candidates[top])
+            sims.append(scores[0, top])
+        return idxs, sims
+
+    def _topk(self, scores, topk):
+        n = scores.shape[1]
+        if 0 < topk < n:
+            top = np.argpartition(-scores, topk - 1, axis=1)[:, :topk]
+        else:
+            top = np.tile(np.arange(n), (scores.shape[0], 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='mergesort')
+        return np.take_along_axis(top, order, axis=1)
+
+    def most_similar(self, query, topk=10):
+        """
+        :param query: str or list of str
+            Query item(s). idx_to_item must be given at initialization
+        :param topk: int
+            Maximum number of similar items. Query itself is excluded
+
+        Returns
+        -------
+        similars : list of tuple or list of list of tuple
+            List contains tuples (item, cosine similarity)
+            If query is list, it returns the list for each query
+        """
+        if self.item_to_idx is None:
+            raise ValueError('SimilarityIndex needs idx_to_item to find similar items')
+        queries = [query] if isinstance(query, str) else list(query)
+        rows = [self.item_to_idx.get(q, -1) for q in queries]
+        known = [row for row in rows if row >= 0]
+        idxs, sims = self.search_idx(known, topk + 1 if topk > 0 else -1)
+        results = {}
+        for row, idx, sim in zip(known, idxs, sims):
+            similars = [(self.idx_to_item[i], float(s)) for i, s in zip(idx, sim) if i != row]
+            results[row] = similars[:topk] if topk > 0 else similars
+        similars = [results.get(row, []) for row in rows]
+        return similars[0] if isinstance(query, str) else similars
+
 def check_corpus(corpus):
     """
     Argument
@@ -97,6 +296,60 @@ def check_corpus(corpus):
         raise ValueError('Input corpus must be longer than 0')
     return True
 
+def check_n_jobs(n_jobs):
+    """It returns number of worker processes. If n_jobs is negative,
+    it uses (number of cpus + 1 + n_jobs) processes as joblib does"""
+    if not n_jobs:
+        return 1
+    if n_jobs < 0:
+        n_jobs = multiprocessing.cpu_count() + 1 + n_jobs
+    return max(1, n_jobs)
+
+def iter_chunks(iterable, chunk_size):
+    """It yields lists of chunk_size items. The last chunk may be smaller"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parallel_imap(func, chunks, n_jobs, initializer=None, initargs=()):
+    """It applies func to each chunk in n_jobs worker processes, and yields
+    the results in the order of chunks.
+
+    The states shared by all chunks (ex. tokenizer, vocabulary) should be
+    sent once by initializer, which stores them as module globals of worker.
+    func must be a module level function. Workers are forked when the
+    platform supports it, so initargs do not need to be picklable there.
+
+    :param func: callable
+        Module level function which takes a chunk
+    :param chunks: iterable
+        Input chunks. They are read lazily
+    :param n_jobs: int
+        Number of worker processes
+    :param initializer: callable or None
+        Module level function called once in each worker
+    :param initargs: tuple
+        Arguments of initializer
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(n_jobs, initializer, initargs) as pool:
+        # at most 2 * n_jobs chunks are in memory at a time
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(func, (chunk,)))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
 class DoublespaceLineCorpus:    
     def __init__(self, corpus_fname, num_doc = -1, num_sent = -1, iter_sent = False, skip_header = 0):
         if not os.path.exists(corpus_fname):
@@ -1,2 +1,3 @@
 from ._vectorizer import BaseVectorizer
+from ._vocabulary import Vocabulary
 from ._word_context import sent_to_word_contexts_matrix
\ No newline at end of file
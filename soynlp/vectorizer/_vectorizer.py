@@ -1,16 +1,56 @@
 import os
+import shutil
+import tempfile
+from array import array
 from collections import Counter
+from zlib import crc32
+import numpy as np
 from scipy.sparse import csr_matrix
+from scipy.sparse import save_npz
+from scipy.sparse import vstack
+from soynlp.utils import check_n_jobs
+from soynlp.utils import iter_chunks
+from soynlp.utils import parallel_imap
+from ._vocabulary import Vocabulary
 
 
 class BaseVectorizer:
+    """
+    :param tokenizer: callable
+        Tokenizer which returns list of str
+    :param min_tf: int
+        Minimum term frequency
+    :param max_tf: int
+        Maximum term frequency
+    :param min_df: float
+        Minimum document frequency ratio, [0, 1)
+    :param max_df: float
+        Maximum document frequency ratio, (0, 1]
+    :param n_features: int or None
+        If not None, feature hashing mode. A term is mapped to
+        crc32(term) % n_features without scanning vocabulary, and
+        tf / df filtering is not applied
+    :param n_jobs: int
+        Number of worker processes of fit, transform and to_file.
+        If negative, (number of cpus + 1 + n_jobs) processes are used
+    :param verbose: Boolean
+        If True, verbose mode on
+
+    Usage
+    -----
+        >>> vectorizer = BaseVectorizer(tokenizer=tokenizer, min_tf=5)
+        >>> x = vectorizer.fit_transform(docs)
+        >>> for block in vectorizer.transform_blocks(docs, block_size=10000):
+        >>>     # do something
+    """
 
     def __init__(self, tokenizer=lambda x:x.split(), min_tf=0,
         max_tf=99999999, min_df=0, max_df=1.0, stopwords=None,
-        lowercase=True, verbose=True):
+        lowercase=True, n_features=None, n_jobs=1, verbose=True):
 
         assert 0 <= min_df < 1
         assert 0 < max_df <= 1
+        assert n_features is None or n_features > 0
 
         self.tokenizer = tokenizer
         self.min_tf = min_tf
@@ -19,133 +59,331 @@ class BaseVectorizer:
         self.max_df = max_df
         self.stopwords = stopwords if stopwords else {}
         self.lowercase = lowercase
+        self.n_features = n_features
+        self.n_jobs = n_jobs
         self.verbose = verbose
 
         self._check_points = 500
+        self._chunk_size = 5000
 
+        # vocabulary_ and idx2vocab are the dict and the string table of vocabulary
+        self.vocabulary = None
         self.vocabulary_ = {}
         self.idx2vocab = []
-        self.n_vocabs = 0
+        self.n_vocabs = n_features if n_features else 0
 
     def fit_transform(self, docs):
-        self.fit(docs)
-        return self.transform(docs)
+        """It tokenizes each doc only once. Terms are indexed temporarily
+        while counting, and the columns are remapped after the vocabulary
+        is built. The result is same with fit(docs).transform(docs)"""
+
+        if self.n_features:
+            return self.transform(docs)
+
+        df = {}
+        n_docs = 0
+        chunks = []
+        for terms, dfs, n_docs_, bow in self._scan_chunks(docs, return_bow=True):
+            for term, df_t in zip(terms, dfs):
+                df[term] = df.get(term, 0) + df_t
+            n_docs += n_docs_
+            chunks.append((terms, bow))
+
+        # tf has been counted as document frequency
+        self._build_vocabulary(df, df, n_docs)
+
+        blocks = []
+        for terms, (indptr, indices, data) in chunks:
+            # remap temporal index to vocabulary index. -1 is removed term
+            remap = np.asarray([self.vocabulary_.get(term, -1) for term in terms], dtype=np.int64)
+            cols = remap[np.frombuffer(indices, dtype=np.int64)]
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(np.frombuffer(indptr, dtype=np.int64)))
+            data = np.frombuffer(data, dtype=np.int64)
+            remained = cols >= 0
+            blocks.append(csr_matrix((data[remained], (rows[remained], cols[remained])),
+                shape=(len(indptr) - 1, self.n_vocabs)))
+
+        if self.verbose:
+            print('\rtransforming docs to term frequency marix was done', flush=True)
+
+        return self._stack(blocks)
 
     def fit(self, docs):
-        # counting
+        if self.n_features:
+            # feature hashing mode does not need vocabulary
+            return self
+
         df = {}
-        tf = {}
+        n_docs = 0
+        for terms, dfs, n_docs_, _ in self._scan_chunks(docs, return_bow=False):
+            for term, df_t in zip(terms, dfs):
+                df[term] = df.get(term, 0) + df_t
+            n_docs += n_docs_
+
+        # tf has been counted as document frequency
+        self._build_vocabulary(df, df, n_docs)
+        return self
+
+    def _scan_chunks(self, docs, return_bow):
+        """It yields results of _scan. If n_jobs > 1, the docs are split into
+        chunks and scanned in worker processes"""
+        n_jobs = check_n_jobs(self.n_jobs)
+        if n_jobs == 1:
+            yield self._scan(docs, return_bow, self.verbose)
+        else:
+            func = _scan_chunk_with_bow if return_bow else _scan_chunk
+            chunks = iter_chunks(docs, self._chunk_size)
+            n_docs = 0
+            for result in parallel_imap(func, chunks, n_jobs, _initialize_worker, (self,)):
+                n_docs += result[2]
+                if self.verbose:
+                    print('\rscanned {} docs'.format(n_docs), flush=True, end='')
+                yield result
+
+        if self.verbose:
+            print('\rscanning was done{}'.format(' '*40), flush=True)
+
+    def _scan(self, docs, return_bow=False, verbose=False):
+        """
+        Returns
+        -------
+        terms : list of str
+            Terms in order of first appearance. The position is temporal term index
+        dfs : array.array
+            Document frequency of terms
+        n_docs : int
+            Number of scanned docs
+        bow : tuple or None
+            (indptr, indices, data) of term frequency matrix with temporal term index
+        """
+
+        temporal_index = {}
+        dfs = array('q')
+        indptr = array('q', [0])
+        indices = array('q')
+        data = array('q')
+        n_docs = 0
 
         for i_doc, doc in enumerate(docs):
-            if self.verbose and i_doc % self._check_points == 0:
+            if verbose and i_doc % self._check_points == 0:
                 print('\rscanned {} docs'.format(i_doc), flush=True, end='')
 
             counter = Counter((token for token in self.tokenizer(doc)))
             for term, freq in counter.items():
-                df[term] = df.get(term, 0) + 1
-                tf[term] = tf.get(term, 0) + 1
+                idx = temporal_index.setdefault(term, len(dfs))
+                if idx == len(dfs):
+                    dfs.append(1)
+                else:
+                    dfs[idx] += 1
+                if return_bow:
+                    indices.append(idx)
+                    data.append(freq)
+            indptr.append(len(indices))
+            n_docs += 1
 
-        if self.verbose:
-            print('\rscanning was done{}'.format(' '*40), flush=True)
+        bow = (indptr, indices, data) if return_bow else None
+        return list(temporal_index), dfs, n_docs, bow
 
+    def _build_vocabulary(self, df, tf, n_docs):
         # filtering
-        n_docs = i_doc + 1
         min_df = int(n_docs * self.min_df)
         max_df = int(n_docs * self.max_df)
         df = {term:df_t for term, df_t in df.items() if min_df <= df_t <= max_df}
         tf = {term:tf_t for term, tf_t in tf.items() if self.min_tf <= tf_t <= self.max_tf}
 
         # build vocabulary_
-        vocabs = {term:tf_t for term, tf_t in tf.items() if term in df}
-        self.vocabulary_ = {term:idx for idx, (term, _) in enumerate(
-            sorted(vocabs.items(), key=lambda x:-x[1]))}
-        self.idx2vocab = [term for term, _ in sorted(
-            self.vocabulary_.items(), key=lambda x:x[1])]
-        self.n_vocabs = len(self.idx2vocab)
-        
+        vocabs = sorted(((term, tf_t) for term, tf_t in tf.items() if term in df), key=lambda x:-x[1])
+        self._set_vocabulary([term for term, _ in vocabs],
+            df=[df[term] for term, _ in vocabs], tf=[tf_t for _, tf_t in vocabs])
+
         if self.verbose:
             print('{} terms are recognized'.format(self.n_vocabs), flush=True)
 
-        return self
-
     def transform(self, docs):
-        rows = []
-        cols = []
-        data = []
-        for i_doc, doc in enumerate(docs):
-            if self.verbose and i_doc % self._check_points == 0:
-                print('\rtransformed {} docs'.format(i_doc), flush=True, end='')
-
-            bow = self.encode_a_doc_to_bow(doc)
-            for term, count in bow.items():
-                rows.append(i_doc)
-                cols.append(term)
-                data.append(count)
+        blocks = list(self.transform_blocks(docs))
 
         if self.verbose:
             print('\rtransforming docs to term frequency marix was done', flush=True)
 
-        return csr_matrix((data, (rows, cols)), shape=(i_doc+1, self.n_vocabs))
+        return self._stack(blocks)
+
+    def _stack(self, blocks):
+        if not blocks:
+            return csr_matrix((0, self.n_vocabs), dtype=np.int64)
+        if len(blocks) == 1:
+            return blocks[0]
+        return vstack(blocks, format='csr')
+
+    def transform_blocks(self, docs, block_size=10000):
+        """Generator of term frequency matrix blocks. Only a few blocks are
+        built in memory at a time. If n_jobs > 1, the blocks are built in
+        worker processes and yielded in order.
+
+        :param docs: iterable of str
+            Documents
+        :param block_size: int
+            Number of docs in a block. The last block may be smaller
+
+        It yields
+        ---------
+        block : scipy.sparse.csr_matrix
+            Shape = (block_size, n_vocabs)
+        """
+
+        n_jobs = check_n_jobs(self.n_jobs)
+        chunks = iter_chunks(docs, block_size)
+        if n_jobs == 1:
+            blocks = (self._encode_block(chunk) for chunk in chunks)
+        else:
+            blocks = parallel_imap(_transform_chunk, chunks, n_jobs, _initialize_worker, (self,))
+
+        n_docs = 0
+        for block in blocks:
+            n_docs += block.shape[0]
+            if self.verbose:
+                print('\rtransformed {} docs'.format(n_docs), flush=True, end='')
+            yield block
+
+    def _encode_block(self, docs):
+        if self.n_features:
+            return self._encode_hashed_block(docs)
+        rows, cols = self.vocabulary.encode_batch_flat([self.tokenizer(doc) for doc in docs])
+        # duplicated (row, col) pairs are summed
+        return csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+            shape=(len(docs), self.n_vocabs))
+
+    def _encode_hashed_block(self, docs):
+        indptr = array('q', [0])
+        indices = array('q')
+        data = array('q')
+        for doc in docs:
+            bow = self.encode_a_doc_to_bow(doc)
+            indices.extend(bow.keys())
+            data.extend(bow.values())
+            indptr.append(len(indices))
+
+        block = csr_matrix((
+            np.frombuffer(data, dtype=np.int64),
+            np.frombuffer(indices, dtype=np.int64),
+            np.frombuffer(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, self.n_vocabs))
+        block.sort_indices()
+        return block
+
+    def save_blocks(self, docs, directory, block_size=10000):
+        """It writes term frequency matrix blocks as directory/block_00000.npz, ...
+
+        Returns
+        -------
+        paths : list of str
+            Paths of the saved blocks
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        paths = []
+        for i, block in enumerate(self.transform_blocks(docs, block_size)):
+            path = os.path.join(directory, 'block_{:05d}.npz'.format(i))
+            save_npz(path, block)
+            paths.append(path)
+        return paths
 
     def fit_to_file(self, docs, file_path, encoding='utf-8'):
         self.fit(docs)
         self.to_file(docs, file_path, encoding)
 
     def to_file(self, docs, file_path, encoding='utf-8'):
+        """It writes term frequency matrix with one pass of docs.
+
+        :param docs: iterable of str
+            Documents
+        :param file_path: str
+            If it ends with '.npz', the matrix is saved as scipy.sparse csr
+            format. Else, it is written as MatrixMarket format. The body is
+            written to a temporal file first, and the header is prepended
+            after the number of elements is known.
+        :param encoding: str
+            Encoding of MatrixMarket file
+        """
+
         file_path = os.path.abspath(file_path)
-        # check n_elements
-        n_elements = 0
-        for i, doc in enumerate(docs):
-            if self.verbose and i % self._check_points == 0:
-                print('\rscanning number of elements from {} docs'.format(
-                    i), flush=True, end='')
-            words = self.tokenizer(doc)
-            n_elements += len({word for word in words if word in self.vocabulary_})
-        n_docs = i + 1
-        if self.verbose:
-            print('\rscanning number of elements was done. from {} docs'.format(
-                n_docs), flush=True, end='')
 
         # directory check
         directory = os.path.dirname(file_path)
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-        # to file
-        with open(file_path, 'w', encoding=encoding) as f:
-            # header
-            f.write('%%MatrixMarket matrix coordinate integer general\n')
-            f.write('%\n')
-            f.write('{} {} {}\n'.format(n_docs, self.n_vocabs, n_elements))
-            # doc term frequency
-            for i, doc in enumerate(docs):
-                if self.verbose and i % self._check_points == 0:
-                    print('\rwriting to file {} % {}'.format(
-                        100 * i / n_docs, ' '*30), flush=True, end='')
-                words = self.tokenizer(doc)
-                words = Counter([self.vocabulary_[word]
-                    for word in words if word in self.vocabulary_])
-                for j, count in words.items():
-                    f.write('{} {} {}\n'.format(i+1, j+1, count))
+        if file_path[-4:] == '.npz':
+            save_npz(file_path, self.transform(docs))
+            return
+
+        n_docs = 0
+        n_elements = 0
+        body = tempfile.NamedTemporaryFile('w', encoding=encoding, dir=directory,
+            suffix='.body', delete=False)
+        try:
+            with body:
+                for block in self.transform_blocks(docs):
+                    if block.nnz > 0:
+                        rows = np.repeat(np.arange(n_docs + 1, n_docs + 1 + block.shape[0]),
+                            np.diff(block.indptr))
+                        elements = np.column_stack([rows, block.indices + 1, block.data])
+                        body.write(('%d %d %d\n' * block.nnz) % tuple(elements.ravel().tolist()))
+                    n_docs += block.shape[0]
+                    n_elements += block.nnz
+                    if self.verbose:
+                        print('\rwriting to file {} docs {}'.format(n_docs, ' '*30), flush=True, end='')
+
+            with open(file_path, 'w', encoding=encoding) as f:
+                # header
+                f.write('%%MatrixMarket matrix coordinate integer general\n')
+                f.write('%\n')
+                f.write('{} {} {}\n'.format(n_docs, self.n_vocabs, n_elements))
+                # doc term frequency
+                with open(body.name, encoding=encoding) as fb:
+                    shutil.copyfileobj(fb, f, 1 << 20)
+        finally:
+            os.remove(body.name)
+
         if self.verbose:
             print('\rwriting to file was done. {} docs'.format(n_docs), flush=True)
 
     def __len__(self):
         return self.n_vocabs
 
+    def _hash(self, term):
+        return crc32(term.encode('utf-8')) % self.n_features
+
     def encode_a_doc_to_list(self, doc):
-        return [self.vocabulary_[term] for term in self.tokenizer(doc) if term in self.vocabulary_]
+        if self.n_features:
+            return [self._hash(term) for term in self.tokenizer(doc)]
+        get = self.vocabulary_.get
+        return [idx for idx in (get(term, -1) for term in self.tokenizer(doc)) if idx >= 0]
+
+    def encode_batch(self, docs):
+        """It returns list of int32 term index arrays of docs"""
+        if self.n_features:
+            return [np.asarray(self.encode_a_doc_to_list(doc), dtype=np.int32) for doc in docs]
+        return self.vocabulary.encode_batch([self.tokenizer(doc) for doc in docs])
 
     def decode_from_list(self, doc):
-        return [self.idx2vocab[idx] for idx in doc if 0 <= idx < self.n_vocabs]
+        if self.vocabulary is None:
+            return []
+        return self.vocabulary.decode(doc)
 
     def encode_a_doc_to_bow(self, doc):
-        bow = Counter(self.tokenizer(doc))
-        bow = {self.vocabulary_[term]:count for term, count in bow.items() if term in self.vocabulary_}
-        return bow
+        if self.n_features:
+            hashed = {}
+            for term, count in Counter(self.tokenizer(doc)).items():
+                idx = self._hash(term)
+                hashed[idx] = hashed.get(idx, 0) + count
+            return hashed
+        get = self.vocabulary_.get
+        bow = Counter(get(term, -1) for term in self.tokenizer(doc))
+        bow.pop(-1, None)
+        return dict(bow)
 
     def decode_from_bow(self, bow):
-        bow = {self.idx2vocab[idx]:count for idx, count in bow.items() if 0 <= idx < self.n_vocabs}
+        bow = {self.idx2vocab[idx]:count for idx, count in bow.items() if 0 <= idx < len(self.idx2vocab)}
         return bow
 
     def save(self, fname):
@@ -159,14 +397,29 @@ class BaseVectorizer:
         if fname[-6:] != '.vocab':
             fname += '.vocab'
         with open(fname, encoding='utf-8') as f:
-            self.idx2vocab = [term.strip() for term in f]
-        self.vocabulary_ = {term:idx for idx, term in enumerate(self.idx2vocab)}
-        self.n_vocabs = len(self.idx2vocab)
+            self._set_vocabulary([term.strip() for term in f])
 
     def vocabs(self):
-        return [term for term in sorted(self.vocabulary_, key=lambda x:self.vocabulary_[x])]
-    
-    def _set_vocabulary(self, vocabulary_list):
-        self.idx2vocab = vocabulary_list
-        self.vocabulary_ = {v:i for i,v in enumerate(self.idx2vocab)}
+        return list(self.idx2vocab)
+
+    def _set_vocabulary(self, vocabulary_list, df=None, tf=None):
+        self.vocabulary = Vocabulary(vocabulary_list, df, tf)
+        self.idx2vocab = self.vocabulary.idx2vocab
+        self.vocabulary_ = self.vocabulary.vocab2idx
         self.n_vocabs = len(self.idx2vocab)
+
+# worker state of parallel BaseVectorizer
+_worker_vectorizer = None
+
+def _initialize_worker(vectorizer):
+    global _worker_vectorizer
+    _worker_vectorizer = vectorizer
+
+def _scan_chunk(docs):
+    return _worker_vectorizer._scan(docs, return_bow=False)
+
+def _scan_chunk_with_bow(docs):
+    return _worker_vectorizer._scan(docs, return_bow=True)
+
+def _transform_chunk(docs):
+    return _worker_vectorizer._encode_block(docs)
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+class Vocabulary:
+    """Frozen vocabulary of BaseVectorizer
+
+    It holds string table (idx2vocab), term to index dict (vocab2idx) and
+    NumPy arrays of document / term frequency. Terms are encoded to int32
+    index arrays and index arrays are decoded with the string table at once.
+
+    :param idx2vocab: list of str
+        Terms sorted by index
+    :param df: array-like or None
+        Document frequency of terms
+    :param tf: array-like or None
+        Term frequency of terms
+
+    Usage
+    -----
+        >>> vocabulary = Vocabulary(['이', '영화', '재밌다'])
+        >>> vocabulary.encode_batch([['영화', '이', '영화'], ['재밌다', 'unk']])
+        $ [array([1, 0, 1], dtype=int32), array([2], dtype=int32)]
+        >>> vocabulary.decode([1, 0, 1])
+        $ ['영화', '이', '영화']
+    """
+
+    def __init__(self, idx2vocab, df=None, tf=None):
+        self.idx2vocab = list(idx2vocab)
+        self.vocab2idx = {term:idx for idx, term in enumerate(self.idx2vocab)}
+        self._table = np.empty(len(self.idx2vocab), dtype=object)
+        self._table[:] = self.idx2vocab
+        self.df = None if df is None else np.asarray(df, dtype=np.int64)
+        self.tf = None if tf is None else np.asarray(tf, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.idx2vocab)
+
+    def __contains__(self, term):
+        return term in self.vocab2idx
+
+    def __getitem__(self, term):
+        return self.vocab2idx[term]
+
+    def get(self, term, default=-1):
+        return self.vocab2idx.get(term, default)
+
+    def encode(self, tokens):
+        """It returns int32 index array of tokens. Unknown tokens are removed"""
+        get = self.vocab2idx.get
+        ids = np.fromiter((get(token, -1) for token in tokens), dtype=np.int32)
+        return ids[ids >= 0]
+
+    def encode_batch_flat(self, token_lists):
+        """
+        :param token_lists: list of list of str
+            Tokenized docs
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            int64 doc index of each known token
+        ids : numpy.ndarray
+            int32 term index of each known token
+        """
+        get = self.vocab2idx.get
+        ids = []
+        lengths = []
+        for tokens in token_lists:
+            n_before = len(ids)
+            ids.extend([get(token, -1) for token in tokens])
+            lengths.append(len(ids) - n_before)
+        ids = np.asarray(ids, dtype=np.int32)
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        known = ids >= 0
+        return rows[known], ids[known]
+
+    def encode_batch(self, token_lists):
+        """It returns list of int32 index arrays. Unknown tokens are removed"""
+        rows, ids = self.encode_batch_flat(token_lists)
+        n_docs = len(token_lists)
+        if n_docs == 0:
+            return []
+        offsets = np.cumsum(np.bincount(rows, minlength=n_docs))[:-1]
+        return np.split(ids, offsets)
+
+    def decode(self, ids):
+        """It returns list of terms. Out of range indices are removed"""
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        ids = ids[(ids >= 0) & (ids < len(self.idx2vocab))]
+        return self._table[ids].tolist()
+
+    def decode_batch(self, id_lists):
+        """It returns list of decoded term lists"""
+        return [self.decode(ids) for ids in id_lists]
@@ -1,33 +1,82 @@
 from soynlp.utils import get_process_memory
+from soynlp.utils import check_n_jobs
+from soynlp.utils import iter_chunks
+from soynlp.utils import parallel_imap
 from collections import defaultdict
+import numpy as np
 from scipy.sparse import csr_matrix
 
+# number of token ids accumulated before a chunk is reduced to sparse matrix
+buffer_size = 1000000
+# number of sents in a shard of parallel mode
+chunk_size = 10000
+
 def sent_to_word_contexts_matrix(sents, windows=3, min_tf=10,
-        tokenizer=lambda x:x.split(), dynamic_weight=False, verbose=True):
+        tokenizer=lambda x:x.split(), dynamic_weight=False, verbose=True, n_jobs=1):
 
     """
     :param dynamic_weight : Use dynamic weight if True.
         co-occurrence weight = [1, (w-1)/w, (w-2)/w, ... 1/w]
+    :param n_jobs : Number of worker processes. If n_jobs > 1, sents are split
+        into shards of chunk_size sents, and vocabulary scanning and
+        co-occurrence counting run in workers. The result is same with n_jobs=1
+
+    Returns
+    -------
+    x : scipy.sparse.csr_matrix
+        (word, context) co-occurrence matrix. Shape = (n_vocabs, n_vocabs)
+    idx2vocab : list of str
+        Vocabulary list
     """
 
     if verbose:
         print('Create (word, contexts) matrix')
 
-    vocab2idx, idx2vocab = _scanning_vocabulary(
-        sents, min_tf, tokenizer, verbose)
+    n_jobs = check_n_jobs(n_jobs)
 
-    word2contexts = _word_context(
-        sents, windows, tokenizer, dynamic_weight, verbose, vocab2idx)
+    vocab2idx, idx2vocab = _scanning_vocabulary(
+        sents, min_tf, tokenizer, verbose, n_jobs)
 
-    x = _encode_as_matrix(word2contexts, vocab2idx, verbose)
+    x = _word_context(
+        sents, windows, tokenizer, dynamic_weight, verbose, vocab2idx, n_jobs)
 
     if verbose:
+        print('  - (word, context) matrix was constructed. shape = {}{}'.format(
+            x.shape, ' '*20))
         print('  - done')
     return x, idx2vocab
 
-def _scanning_vocabulary(sents, min_tf, tokenizer, verbose):
+def _scanning_vocabulary(sents, min_tf, tokenizer, verbose, n_jobs=1):
 
     # counting word frequency, first
+    if n_jobs == 1:
+        word_counter = _count_words(sents, tokenizer, verbose)
+    else:
+        # partial counters are merged in the order of shards, so the order of
+        # words is same with serial counting
+        word_counter = defaultdict(int)
+        n_sents = 0
+        initargs = (tokenizer, None, 0, False)
+        for n_sents_, counter in parallel_imap(_count_words_in_worker,
+            iter_chunks(sents, chunk_size), n_jobs, _initialize_worker, initargs):
+            for word, count in counter.items():
+                word_counter[word] += count
+            n_sents += n_sents_
+            if verbose:
+                _print_status('  - counting word frequency', n_sents)
+        if verbose:
+            _print_status('  - counting word frequency', n_sents, new_line=True)
+
+    # filtering with min_tf    
+    vocab2idx = {word for word, count in word_counter.items() if count >= min_tf}
+    vocab2idx = {word:idx for idx, word in enumerate(
+        sorted(vocab2idx, key=lambda w:-word_counter[w]))}
+    idx2vocab = [word for word, _ in sorted(vocab2idx.items(), key=lambda w:w[1])]
+    del word_counter
+
+    return vocab2idx, idx2vocab
+
+def _count_words(sents, tokenizer, verbose):
     word_counter = defaultdict(int)
 
     for i_sent, sent in enumerate(sents):
@@ -42,14 +91,7 @@ def _scanning_vocabulary(sents, min_tf, tokenizer, verbose):
     if verbose:
         _print_status('  - counting word frequency', i_sent, new_line=True)
 
-    # filtering with min_tf    
-    vocab2idx = {word for word, count in word_counter.items() if count >= min_tf}
-    vocab2idx = {word:idx for idx, word in enumerate(
-        sorted(vocab2idx, key=lambda w:-word_counter[w]))}
-    idx2vocab = [word for word, _ in sorted(vocab2idx.items(), key=lambda w:w[1])]
-    del word_counter
-
-    return vocab2idx, idx2vocab
+    return word_counter
 
 def _print_status(message, i_sent, new_line=False):
     print('\r{} from {} sents, mem={} Gb'.format(
@@ -57,15 +99,41 @@ def _print_status(message, i_sent, new_line=False):
         flush=True, end='\n' if new_line else ''
     )
 
-def _word_context(sents, windows, tokenizer, dynamic_weight, verbose, vocab2idx):
+def _word_context(sents, windows, tokenizer, dynamic_weight, verbose, vocab2idx, n_jobs=1):
 
-    # scanning (word, context) pairs
-    word2contexts = defaultdict(lambda: defaultdict(int))
-
-    if dynamic_weight:
-        weight = [(windows-i)/windows for i in range(windows)]
+    if n_jobs == 1:
+        x = _sents_to_cooccurrence(sents, windows, tokenizer, dynamic_weight, vocab2idx, verbose)
     else:
-        weight = [1] * windows
+        # X = sum(X_i) of shards. Values are integer, so it is same with serial counting
+        n_vocabs = len(vocab2idx)
+        x = csr_matrix((n_vocabs, n_vocabs), dtype=np.int64)
+        n_sents = 0
+        initargs = (tokenizer, vocab2idx, windows, dynamic_weight)
+        for n_sents_, x_i in parallel_imap(_count_cooccurrence_in_worker,
+            iter_chunks(sents, chunk_size), n_jobs, _initialize_worker, initargs):
+            x = x + x_i
+            n_sents += n_sents_
+            if verbose:
+                _print_status('  - scanning (word, context) pairs', n_sents)
+        if verbose:
+            _print_status('  - scanning (word, context) pairs', n_sents, new_line=True)
+
+    # dynamic weights are accumulated as integer numerators (windows - w)
+    if dynamic_weight:
+        x = x / windows
+
+    return x
+
+def _sents_to_cooccurrence(sents, windows, tokenizer, dynamic_weight, vocab2idx, verbose):
+
+    # Words are encoded to ids (-1 for out of vocabulary) and concatenated
+    # to buffer. Sentences are separated by `windows` -1 pads, so no pair
+    # crosses sentence boundary. When the buffer is full, it is reduced to
+    # sparse matrix and summed.
+    n_vocabs = len(vocab2idx)
+    pads = [-1] * windows
+    x = csr_matrix((n_vocabs, n_vocabs), dtype=np.int64)
+    buffer = []
 
     for i_sent, sent in enumerate(sents):
 
@@ -76,47 +144,52 @@ def _word_context(sents, windows, tokenizer, dynamic_weight, verbose, vocab2idx)
         if not words:
             continue
 
-        n = len(words)
-
-        for i, word in enumerate(words):
-            if not (word in vocab2idx):
-                continue
+        buffer += [vocab2idx.get(word, -1) for word in words]
+        buffer += pads
 
-            # left_contexts
-            for w in range(windows):
-                j = i - (w + 1)
-                if j < 0 or not (words[j] in vocab2idx):
-                    continue
-                word2contexts[word][words[j]] += weight[w]
+        if len(buffer) >= buffer_size:
+            x = x + _count_cooccurrence(buffer, windows, dynamic_weight, n_vocabs)
+            buffer = []
 
-            # right_contexts
-            for w in range(windows):
-                j = i + w + 1
-                if j >= n or not (words[j] in vocab2idx):
-                    continue
-                word2contexts[word][words[j]] += weight[w]
+    if buffer:
+        x = x + _count_cooccurrence(buffer, windows, dynamic_weight, n_vocabs)
 
     if verbose:
         _print_status('  - scanning (word, context) pairs', i_sent, new_line=True)
 
-    return word2contexts
-
-def _encode_as_matrix(word2contexts, vocab2idx, verbose):
-
-    rows = []
-    cols = []
-    data = []
-    for word, contexts in word2contexts.items():
-        word_idx = vocab2idx[word]
-        for context, cooccurrence in contexts.items():
-            context_idx = vocab2idx[context]
-            rows.append(word_idx)
-            cols.append(context_idx)
-            data.append(cooccurrence)
-    x = csr_matrix((data, (rows, cols)))
-
-    if verbose:
-        print('  - (word, context) matrix was constructed. shape = {}{}'.format(
-            x.shape, ' '*20))
-
-    return x
\ No newline at end of file
+    return x
+
+def _count_cooccurrence(buffer, windows, dynamic_weight, n_vocabs):
+    ids = np.asarray(buffer, dtype=np.int32)
+    rows, cols, data = [], [], []
+    for w in range(1, windows + 1):
+        # (word, right context) and (word, left context) pairs of distance w
+        left, right = ids[:-w], ids[w:]
+        valid = (left >= 0) & (right >= 0)
+        left, right = left[valid], right[valid]
+        weight = (windows - w + 1) if dynamic_weight else 1
+        rows += [left, right]
+        cols += [right, left]
+        data.append(np.full(2 * len(left), weight, dtype=np.int64))
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    data = np.concatenate(data)
+    # duplicated (row, col) pairs are summed
+    return csr_matrix((data, (rows, cols)), shape=(n_vocabs, n_vocabs))
+
+# worker state of parallel sent_to_word_contexts_matrix
+_worker_state = {}
+
+def _initialize_worker(tokenizer, vocab2idx, windows, dynamic_weight):
+    _worker_state['tokenizer'] = tokenizer
+    _worker_state['vocab2idx'] = vocab2idx
+    _worker_state['windows'] = windows
+    _worker_state['dynamic_weight'] = dynamic_weight
+
+def _count_words_in_worker(sents):
+    return len(sents), _count_words(sents, _worker_state['tokenizer'], verbose=False)
+
+def _count_cooccurrence_in_worker(sents):
+    x = _sents_to_cooccurrence(sents, _worker_state['windows'], _worker_state['tokenizer'],
+        _worker_state['dynamic_weight'], _worker_state['vocab2idx'], verbose=False)
+    return len(sents), x
@@ -1,3 +1,8 @@
 from ._word import WordExtractor
 from ._pmi import pmi
-from ._phrase import Bigram
\ No newline at end of file
+from ._pmi import pmi_memory_friendly
+from ._pmi import pmi_blocks
+from ._pmi import pmi_to_file
+from ._pmi import load_pmi
+from ._phrase import Bigram
+from ._phrase import Ngram
\ No newline at end of file
@@ -1,11 +1,128 @@
+from collections import defaultdict
 from collections import namedtuple
-from math import log
+from heapq import heappush
+from heapq import heapreplace
+from itertools import count
+import numpy as np
+
+from soynlp.utils import check_n_jobs
+from soynlp.utils import parallel_imap
 
 NgramScore = namedtuple('NgramScore', 'frequency score')
+FrequencyEstimate = namedtuple('FrequencyEstimate', 'frequency error')
+
+# number of token ids accumulated before they are counted as a chunk
+buffer_size = 1000000
+# number of sents in a shard of Ngram counting
+chunk_size = 10000
+
+
+def _merge_counts(keys, counts, new_keys, new_counts):
+    """It merges two (sorted unique keys, counts) pairs"""
+    if len(keys) == 0:
+        return new_keys, new_counts
+    positions = np.searchsorted(keys, new_keys)
+    found = np.zeros(len(new_keys), dtype=np.bool_)
+    inside = positions < len(keys)
+    found[inside] = keys[positions[inside]] == new_keys[inside]
+    counts = counts.copy()
+    counts[positions[found]] += new_counts[found]
+    unseen = ~found
+    keys = np.insert(keys, positions[unseen], new_keys[unseen])
+    counts = np.insert(counts, positions[unseen], new_counts[unseen])
+    return keys, counts
+
+class _SpaceSaving:
+    """Space-Saving counter (Metwally et al., 2005) of int keys
+
+    It keeps at most max_counters keys. When a new key comes to full table,
+    the key of minimum count c_min is evicted and the new key starts from
+    c_min + weight with error c_min. Estimated count of a key overestimates
+    its true frequency at most error, and every key of true frequency
+    larger than (sum of weights) / max_counters remains in the table.
+    Minimum count is found with lazy min-heap. Counts only increase, so stale
+    heap entries are refreshed only when they reach the top.
+    """
+
+    def __init__(self, max_counters):
+        if max_counters <= 0:
+            raise ValueError('max_counters must be positive')
+        self.max_counters = max_counters
+        self.n = 0
+        self._table = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self._table)
+
+    def update(self, keys, weights):
+        table, heap = self._table, self._heap
+        for key, weight in zip(keys.tolist(), weights.tolist()):
+            self.n += weight
+            counter = table.get(key)
+            if counter is not None:
+                counter[0] += weight
+            elif len(table) < self.max_counters:
+                table[key] = [weight, 0]
+                heappush(heap, (weight, key))
+            else:
+                while True:
+                    c_min, evicted = heap[0]
+                    current = table[evicted][0]
+                    if current == c_min:
+                        break
+                    heapreplace(heap, (current, evicted))
+                del table[evicted]
+                table[key] = [c_min + weight, c_min]
+                heapreplace(heap, (c_min + weight, key))
+
+    def to_arrays(self):
+        """It returns (keys, counts, errors) sorted by key"""
+        keys = np.fromiter(self._table.keys(), dtype=np.int64, count=len(self._table))
+        counters = np.array(list(self._table.values()), dtype=np.int64).reshape(-1, 2)
+        order = keys.argsort()
+        return keys[order], counters[order, 0], counters[order, 1]
 
 class Bigram:
+    """
+    Bigram (phrase) extractor
+
+    Tokens are encoded to int ids and each bigram is packed into one int64 key
+    (left id << 32 | right id). Token ids are buffered up to the next
+    filtering_checkpoint (or buffer_size ids), counted with numpy.unique and
+    merged into sorted key / count arrays. Scores are computed on the arrays.
+
+    Checkpoint pruning may drop bigrams which are frequent in total but
+    spread over checkpoints. With max_counters > 0, bigrams are counted with
+    Space-Saving algorithm in at most max_counters counters instead, and
+    every bigram of frequency larger than (number of bigrams) / max_counters
+    is guaranteed to be kept. The frequencies become estimations, and
+    estimated_frequencies() reports the maximum overestimation of each bigram.
+
+    :param sentences: list of str or None
+        If not None, it trains with the sentences
+    :param min_frequency: int
+        Minimum frequency of bigram. Bigrams less than min_frequency are
+        removed at every filtering_checkpoint sentences and at the end of training
+    :param score: str
+        Scoring method. choice in ['frequency', 'pmi', 'mikolov']
+    :param filtering_checkpoint: int
+        Period of pruning infrequent bigrams. If 0, it prunes only at the end.
+        It is ignored when max_counters > 0
+    :param max_counters: int
+        Memory budget as number of bigram counters. If 0, it counts exactly.
+        To keep bigrams of relative frequency larger than support,
+        set max_counters = ceil(1 / support)
+
+    Usage
+    -----
+        >>> bigram = Bigram(sents, min_frequency=5, score='pmi')
+        >>> bigram.extract(threshold=1)
+        $ {('이', '영화'): NgramScore(frequency=24, score=1.87), ...}
+    """
+
     def __init__(self, sentences=None, min_frequency=5, verbose=True, score='frequency',
-        filtering_checkpoint=100000, tokenizer=None, ngram_selector=None):
+        filtering_checkpoint=100000, tokenizer=None, ngram_selector=None, max_counters=0):
 
         """
         Attribute:
@@ -26,50 +143,114 @@ class Bigram:
         self.filtering_checkpoint = filtering_checkpoint
         self.tokenizer = tokenizer
         self.ngram_selector = ngram_selector
+        self.max_counters = max_counters
+        self.guaranteed_frequency = None
         self._counter = None
 
+        if sentences is not None:
+            self.train(sentences)
+
     @property
     def is_trained(self):
         return self._counter
 
     def train(self, sentences):
+        # unseen word gets next id in C level without python function call
+        vocab2idx = defaultdict(count().__next__)
+        encode = vocab2idx.__getitem__
+        keys = np.zeros(0, dtype=np.int64)
+        counts = np.zeros(0, dtype=np.int64)
+        # token ids and lengths of buffered sents
+        ids, lengths = [], []
+        i_sent = -1
+        space_saving = _SpaceSaving(self.max_counters) if self.max_counters > 0 else None
+        checkpoint = 0 if space_saving is not None else self.filtering_checkpoint
 
-        def to_bigram(words):
-            bigrams = [(w0, w1) for w0, w1 in zip(words, words[1:])]
-            return bigrams
-
-        self._counter = {}
+        def count_buffer(keys, counts, prune):
+            if len(ids) > 1:
+                ids_ = np.asarray(ids, dtype=np.int64)
+                # remove the pairs crossing two sents
+                valid = np.ones(len(ids_) - 1, dtype=np.bool_)
+                valid[np.cumsum(lengths)[:-1] - 1] = False
+                chunk = ((ids_[:-1] << 32) | ids_[1:])[valid]
+                if space_saving is not None:
+                    space_saving.update(*np.unique(chunk, return_counts=True))
+                else:
+                    keys, counts = _merge_counts(keys, counts, *np.unique(chunk, return_counts=True))
+            del ids[:]
+            del lengths[:]
+            if prune:
+                frequents = counts >= self.min_frequency
+                keys, counts = keys[frequents], counts[frequents]
+            return keys, counts
 
         for i_sent, sent in enumerate(sentences):
 
-            if self.filtering_checkpoint > 0 and i_sent % self.filtering_checkpoint == 0:
-                self._counter = {bigram:freq for bigram, freq
-                    in self._counter.items() if freq >= self.min_frequency}
+            if checkpoint > 0 and i_sent % checkpoint == 0:
+                keys, counts = count_buffer(keys, counts, prune=True)
+            elif len(ids) >= buffer_size:
+                keys, counts = count_buffer(keys, counts, prune=False)
 
             if self.verbose and i_sent % 3000 == 0:
                 print('\r[Bigram Extractor] scanning {} bigrams from {} sents'.format(
-                    len(self._counter), i_sent), end='', flush=True)
+                    len(space_saving) if space_saving is not None else len(keys), i_sent), end='', flush=True)
 
             words = self.tokenizer(sent)
             if len(words) <= 1:
                 continue
 
-            bigrams = to_bigram(words)
-            for bigram in bigrams:
-                self._counter[bigram] = self._counter.get(bigram, 0) + 1
+            ids += map(encode, words)
+            lengths.append(len(words))
 
-        self._counter = {bigram:freq for bigram, freq
-            in self._counter.items() if freq >= self.min_frequency}
-
-        self._unigram = {}
-        for bigram, freq in self._counter.items():
-            for unigram in bigram:
-                self._unigram[unigram] = self._unigram.get(unigram, 0) + 1
+        if space_saving is not None:
+            count_buffer(keys, counts, prune=False)
+            keys, counts, errors = space_saving.to_arrays()
+            frequents = counts >= self.min_frequency
+            keys, counts, errors = keys[frequents], counts[frequents], errors[frequents]
+            self.guaranteed_frequency = space_saving.n / self.max_counters
+        else:
+            keys, counts = count_buffer(keys, counts, prune=True)
+            errors = np.zeros(len(keys), dtype=np.int64)
+            self.guaranteed_frequency = None
+        self._errors = errors
+        self._set_counts(keys, counts, vocab2idx)
 
         if self.verbose:
             print('\r[Bigram Extractor] scanning {} unigrams, {} bigrams from {} sents'.format(
                 len(self._unigram), len(self._counter), i_sent), flush=True)
 
+    def _set_counts(self, keys, counts, vocab2idx):
+        self._idx2vocab = [None] * len(vocab2idx)
+        for word, idx in vocab2idx.items():
+            self._idx2vocab[idx] = word
+        self._keys = keys
+        self._counts = counts
+        # unigram count is number of distinct bigrams which contain the word
+        left, right = keys >> 32, keys & 0xffffffff
+        unigram = np.bincount(np.concatenate([left, right]), minlength=len(self._idx2vocab))
+        self._unigram_counts = unigram
+        self._unigram = {self._idx2vocab[idx]:count for idx, count
+            in zip(np.where(unigram > 0)[0].tolist(), unigram[unigram > 0].tolist())}
+        self._counter = {bigram:freq for bigram, freq
+            in zip(self._decode(keys), counts.tolist())}
+
+    def _decode(self, keys):
+        idx2vocab = self._idx2vocab
+        left, right = (keys >> 32).tolist(), (keys & 0xffffffff).tolist()
+        return [(idx2vocab[l], idx2vocab[r]) for l, r in zip(left, right)]
+
+    def estimated_frequencies(self):
+        """
+        Returns
+        -------
+        frequencies : dict
+            {bigram: FrequencyEstimate(frequency, error)}
+            True frequency is in [frequency - error, frequency].
+            Error is 0 when max_counters = 0
+        """
+        return {bigram:FrequencyEstimate(freq, error) for bigram, freq, error
+                in zip(self._decode(self._keys), self._counts.tolist(), self._errors.tolist())}
+
     def extract(self, topk=-1, threshold=0):
         if self.score == 'frequency':
             return self._extract_by_frequency(topk, threshold)
@@ -79,43 +260,286 @@ class Bigram:
             return self._extract_by_mikolov(topk, threshold)
         raise NotImplemented
 
-    def _extract_by_pmi(self, topk=-1, threshold=0):
-
-        def score(bigram, freq, N):
-            base = self._unigram[bigram[0]] * self._unigram[bigram[1]]
-            return 0 if base == 0 else log(N * freq / base)
+    def _unigram_base(self):
+        unigram = self._unigram_counts
+        return unigram[self._keys >> 32] * unigram[self._keys & 0xffffffff]
 
-        N = 2 * sum(self._counter.values())
-        pmis = {}
-        for bigram, freq in self._counter.items():
-            pmi = score(bigram, freq, N)
-            if pmi >= threshold:
-                pmis[bigram] = pmi
+    def _as_ngram_scores(self, selected, scores):
+        bigrams = self._decode(self._keys[selected])
+        return {word:NgramScore(freq, score) for word, freq, score
+                in zip(bigrams, self._counts[selected].tolist(), scores[selected].tolist())}
 
-        bigrams = {word:NgramScore(freq, pmis[word]) for word, freq
-                   in self._counter.items() if word in pmis}
-        return bigrams
+    def _extract_by_pmi(self, topk=-1, threshold=0):
+        N = 2 * self._counts.sum()
+        pmis = np.log(N * self._counts / self._unigram_base())
+        return self._as_ngram_scores(pmis >= threshold, pmis)
 
     def _extract_by_frequency(self, topk=-1, threshold=10):
-        bigrams = filter(lambda x:x[1] >= threshold, self._counter.items())
+        selected = np.where(self._counts >= threshold)[0]
         if topk > 0:
-            bigrams = sorted(bigrams, key=lambda x:-x[1])
-        bigrams = {word:NgramScore(freq, freq) for word, freq in bigrams}
-        return bigrams
+            selected = selected[np.argsort(-self._counts[selected], kind='mergesort')]
+        return self._as_ngram_scores(selected, self._counts)
 
     def _extract_by_mikolov(self, topk=-1, threshold=0):
+        scores = (self._counts - self.min_frequency) / self._unigram_base()
+        return self._as_ngram_scores(scores >= threshold, scores)
+
+class Ngram:
+    """
+    N-gram (phrase) extractor
+
+    It counts all n-grams of order 2 to max_n in one pass. Sentences are split
+    into shards of at most chunk_size sents, and each shard is counted to
+    (unique id rows, counts) pairs with its own vocabulary. The partial
+    counters are mapped to global ids and merged in the order of shards, so
+    n_jobs > 1 gives same counts with n_jobs=1. Infrequent n-grams are pruned
+    at every filtering_checkpoint sentences as Bigram does.
+
+    Scores generalize the ones of Bigram. c(w) is number of distinct n-grams
+    containing w and N_n = n * (sum of n-gram frequencies) for each order n.
+
+        pmi     = log(f * N_n^(n-1) / (c(w_1) * ... * c(w_n)))
+        mikolov = (f - min_frequency) / (c(w_1) * ... * c(w_n))
+
+    With max_n=2 the counts and scores are same with Bigram.
+
+    :param sentences: list of str or None
+        If not None, it trains with the sentences
+    :param max_n: int
+        Maximum order of n-gram. Default is 3
+    :param min_frequency: int
+        Minimum frequency of n-gram
+    :param score: str
+        Scoring method. choice in ['frequency', 'pmi', 'mikolov']
+    :param filtering_checkpoint: int
+        Period of pruning infrequent n-grams. If 0, it prunes only at the end
+    :param tokenizer: callable or None
+        Default is str.split. It must be picklable when n_jobs > 1 and
+        the platform does not support fork
+    :param n_jobs: int
+        Number of worker processes
+
+    Usage
+    -----
+        >>> ngram = Ngram(sents, max_n=3, min_frequency=5, score='pmi', n_jobs=4)
+        >>> ngram.extract(threshold=1)
+        $ {('이', '영화'): NgramScore(frequency=24, score=1.87),
+           ('이', '영화', '정말'): NgramScore(frequency=8, score=4.21), ...}
+    """
+
+    def __init__(self, sentences=None, max_n=3, min_frequency=5, verbose=True,
+        score='frequency', filtering_checkpoint=100000, tokenizer=None, n_jobs=1):
+
+        if max_n < 2:
+            raise ValueError('max_n must be larger than 1')
+        if tokenizer is None:
+            tokenizer = _split
+
+        self.max_n = max_n
+        self.min_frequency = min_frequency
+        self.verbose = verbose
+        self.score = score
+        self.filtering_checkpoint = filtering_checkpoint
+        self.tokenizer = tokenizer
+        self.n_jobs = check_n_jobs(n_jobs)
+        self._counter = None
+
+        if sentences is not None:
+            self.train(sentences)
+
+    @property
+    def is_trained(self):
+        return self._counter
+
+    @property
+    def orders(self):
+        return list(range(2, self.max_n + 1))
+
+    def train(self, sentences):
+        vocab2idx = defaultdict(count().__next__)
+        counters = {n:(np.zeros((0, n), dtype=np.int64), np.zeros(0, dtype=np.int64))
+            for n in self.orders}
+        pendings = {n:[] for n in self.orders}
+        n_pendings = 0
+        n_sents = 0
+
+        shards = self._iter_shards(sentences)
+        if self.n_jobs == 1:
+            results = (_count_ngrams(shard, self.tokenizer, self.max_n) for shard in shards)
+        else:
+            results = parallel_imap(_count_ngrams_in_worker, shards, self.n_jobs,
+                _initialize_worker, (self.tokenizer, self.max_n))
+
+        for n_sents_, idx2vocab, partial_counters in results:
+            # ids of shard vocabulary to global ids.
+            # New words get ids in order of first appearance as serial counting
+            mapping = np.fromiter(map(vocab2idx.__getitem__, idx2vocab),
+                dtype=np.int64, count=len(idx2vocab))
+            for n, (rows, counts) in zip(self.orders, partial_counters):
+                pendings[n].append((mapping[rows], counts))
+                n_pendings += len(counts)
+            n_sents += n_sents_
+
+            checkpoint = (self.filtering_checkpoint > 0
+                and n_sents % self.filtering_checkpoint == 0)
+            if checkpoint or n_pendings >= buffer_size:
+                self._merge_pendings(counters, pendings, prune=checkpoint)
+                n_pendings = 0
+
+            if self.verbose:
+                print('\r[Ngram Extractor] scanning {} ngrams from {} sents'.format(
+                    sum(len(c[1]) for c in counters.values()), n_sents), end='', flush=True)
+
+        self._merge_pendings(counters, pendings, prune=True)
+        self._set_counts(counters, list(vocab2idx))
+
+        if self.verbose:
+            print('\r[Ngram Extractor] scanning {} unigrams, {} ngrams from {} sents'.format(
+                len(self._idx2vocab), len(self._counter), n_sents), flush=True)
+
+    def _iter_shards(self, sentences):
+        """Shards end at every filtering_checkpoint sents, so pruning is
+        applied at the same time with serial counting"""
+        shard = []
+        for i_sent, sent in enumerate(sentences, 1):
+            shard.append(sent)
+            if (len(shard) == chunk_size or (self.filtering_checkpoint > 0
+                and i_sent % self.filtering_checkpoint == 0)):
+                yield shard
+                shard = []
+        if shard:
+            yield shard
+
+    def _merge_pendings(self, counters, pendings, prune):
+        for n in self.orders:
+            rows, counts = counters[n]
+            if pendings[n]:
+                rows = np.vstack([rows] + [rows_ for rows_, _ in pendings[n]])
+                counts = np.concatenate([counts] + [counts_ for _, counts_ in pendings[n]])
+                rows, counts = _count_rows(rows, counts)
+                pendings[n] = []
+            if prune:
+                frequents = counts >= self.min_frequency
+                rows, counts = rows[frequents], counts[frequents]
+            counters[n] = (rows, counts)
+
+    def _set_counts(self, counters, idx2vocab):
+        self._idx2vocab = idx2vocab
+        self._counters = counters
+        # c(w) of each order
+        self._unigrams = {n:np.bincount(rows.ravel(), minlength=len(idx2vocab))
+            for n, (rows, _) in counters.items()}
+        self._counter = {}
+        for n, (rows, counts) in counters.items():
+            self._counter.update(zip(self._decode(rows), counts.tolist()))
+
+    def _decode(self, rows):
+        idx2vocab = self._idx2vocab
+        return [tuple(idx2vocab[idx] for idx in row) for row in rows.tolist()]
+
+    def extract(self, topk=-1, threshold=0):
+        """
+        :param topk: int
+            If positive, it returns topk n-grams of highest scores
+        :param threshold: float
+            Minimum score
+
+        Returns
+        -------
+        ngrams : dict
+            {ngram tuple: NgramScore(frequency, score)}
+        """
+        if self.score not in ('frequency', 'pmi', 'mikolov'):
+            raise ValueError("score must be one of ['frequency', 'pmi', 'mikolov']")
+
+        rows, freqs, scores = [], [], []
+        for n, (rows_, counts) in self._counters.items():
+            scores_ = self._score(n, rows_, counts)
+            selected = scores_ >= threshold
+            rows += self._decode(rows_[selected])
+            freqs.append(counts[selected])
+            scores.append(scores_[selected])
+        freqs = np.concatenate(freqs)
+        scores = np.concatenate(scores)
+
+        selected = np.arange(len(scores))
+        if topk > 0:
+            selected = np.argsort(-scores, kind='mergesort')[:topk]
+        return {rows[i]:NgramScore(freq, score) for i, freq, score
+                in zip(selected.tolist(), freqs[selected].tolist(), scores[selected].tolist())}
+
+    def _score(self, n, rows, counts):
+        if self.score == 'frequency':
+            return counts
+        unigram = self._unigrams[n]
+        base = np.ones(len(counts), dtype=np.float64)
+        for k in range(n):
+            base *= unigram[rows[:, k]]
+        if self.score == 'pmi':
+            N = float(n * counts.sum())
+            return np.log(counts * N ** (n - 1) / base)
+        return (counts - self.min_frequency) / base
+
+def _split(sent):
+    return sent.split()
+
+def _as_ngram_rows(ids, sent_idxs, n):
+    """It returns (n_ngrams, n) id matrix of n-grams which do not cross two sents"""
+    n_ngrams = len(ids) - n + 1
+    if n_ngrams <= 0:
+        return np.zeros((0, n), dtype=np.int64)
+    begins = np.where(sent_idxs[:n_ngrams] == sent_idxs[n-1:])[0]
+    return np.stack([ids[begins + k] for k in range(n)], axis=1)
+
+def _count_rows(rows, counts=None):
+    """It returns unique rows of id matrix and their summed counts"""
+    if counts is None:
+        counts = np.ones(len(rows), dtype=np.int64)
+    if len(rows) == 0:
+        return rows, counts
+    n = rows.shape[1]
+    bits = max(1, int(rows.max()).bit_length())
+    if bits * n <= 63:
+        # all ids of a row are packed into one int64 key
+        keys = rows[:, 0].copy()
+        for k in range(1, n):
+            keys <<= bits
+            keys |= rows[:, k]
+        keys, begins, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return rows[begins], np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+    # two 32 bit ids are packed into a int64 column to halve the lexsort passes
+    if n % 2:
+        rows_ = np.hstack([rows, np.zeros((len(rows), 1), dtype=np.int64)])
+    else:
+        rows_ = rows
+    packed = (rows_[:, 0::2] << 32) | rows_[:, 1::2]
+    order = np.lexsort(packed.T[::-1])
+    packed = packed[order]
+    begins = np.concatenate([[0], np.where(
+        (packed[1:] != packed[:-1]).any(axis=1))[0] + 1])
+    return rows[order[begins]], np.add.reduceat(counts[order], begins)
+
+def _count_ngrams(sents, tokenizer, max_n):
+    """It returns (number of sents, shard vocabulary, [(rows, counts) of each order])"""
+    vocab2idx = defaultdict(count().__next__)
+    encode = vocab2idx.__getitem__
+    ids, lengths = [], []
+    for sent in sents:
+        words = tokenizer(sent)
+        if len(words) <= 1:
+            continue
+        ids += map(encode, words)
+        lengths.append(len(words))
+    ids = np.asarray(ids, dtype=np.int64)
+    sent_idxs = np.repeat(np.arange(len(lengths)), lengths)
+    counters = [_count_rows(_as_ngram_rows(ids, sent_idxs, n)) for n in range(2, max_n + 1)]
+    return len(sents), list(vocab2idx), counters
 
-        def score(bigram, freq, N):
-            base = self._unigram[bigram[0]] * self._unigram[bigram[1]]
-            return 0 if base == 0 else (freq - self.min_frequency) / base
+_worker_state = {}
 
-        N = 2 * sum(self._counter.values())
-        scores = {}
-        for bigram, freq in self._counter.items():
-            s = score(bigram, freq, N)
-            if s >= threshold:
-                scores[bigram] = s
+def _initialize_worker(tokenizer, max_n):
+    _worker_state['tokenizer'] = tokenizer
+    _worker_state['max_n'] = max_n
 
-        bigrams = {word:NgramScore(freq, scores[word]) for word, freq
-                   in self._counter.items() if word in scores}
-        return bigrams
\ No newline at end of file
+def _count_ngrams_in_worker(sents):
+    return _count_ngrams(sents, _worker_state['tokenizer'], _worker_state['max_n'])
@@ -1,36 +1,58 @@
+import json
+import os
 import numpy as np
+from numpy.lib.format import open_memmap
 from scipy.sparse import csr_matrix
-from scipy.sparse import diags
-from scipy.sparse import dok_matrix
 from sklearn.metrics import pairwise_distances
 from soynlp.utils import get_process_memory
 from soynlp.vectorizer import sent_to_word_contexts_matrix
 
-def _as_diag(px, alpha):
-    px_diag = diags(px.tolist()[0])
-    px_diag.data[0] = np.asarray([0 if v == 0 else 1 / (v + alpha) for v in px_diag.data[0]])
-    return px_diag
+def _reciprocal(px, alpha):
+    """1 / (px + alpha), and 0 where px is 0"""
+    px = np.asarray(px, dtype=np.float64).reshape(-1)
+    inv = np.zeros(px.shape[0], dtype=np.float64)
+    nonzero = px != 0
+    inv[nonzero] = 1 / (px[nonzero] + alpha)
+    return inv
 
-def _logarithm_and_ppmi(exp_pmi, min_exp_pmi):
-    n, m = exp_pmi.shape
+def _pmi_block(X, total, px_inv, py_inv, min_exp_pmi, strict, dtype):
+    """It transforms (word, contexts) csr matrix (or its row block) to PPMI
+    matrix without matrix product. The rows and columns of X.data are scaled
+    through X.indptr and X.indices, and values are thresholded with mask.
 
-    # because exp_pmi is sparse matrix and type of exp_pmi.data is numpy.ndarray
-    rows, cols = exp_pmi.nonzero()
-    data = exp_pmi.data
+    :param X: scipy.sparse.csr_matrix
+        Row block of (word, contexts) matrix
+    :param total: number
+        Sum of all elements of the whole matrix
+    :param px_inv: numpy.ndarray
+        1 / p(x) of the rows of X
+    :param py_inv: numpy.ndarray
+        1 / (p(y) + alpha) of all columns
+    :param strict: Boolean
+        If True, it remains exp_pmi > min_exp_pmi, else exp_pmi >= min_exp_pmi
+    """
 
-    indices = np.where(data >= min_exp_pmi)[0]
-    rows = rows[indices]
-    cols = cols[indices]
-    data = data[indices]
+    if not X.has_canonical_format:
+        X = X.copy()
+        X.sum_duplicates()
 
-    # apply logarithm
-    data = np.log(data)
+    # exp_pmi = p(x,y) / ( p(x) x (p(y) + alpha) )
+    exp_pmi = X.data * (1. / total)
+    exp_pmi *= np.repeat(px_inv, np.diff(X.indptr))
+    exp_pmi *= py_inv[X.indices]
 
-    # new matrix
-    exp_pmi_ = csr_matrix((data, (rows, cols)), shape=(n, m))
-    return exp_pmi_
+    # PPMI using threshold
+    if strict:
+        remain = exp_pmi > min_exp_pmi
+    else:
+        remain = exp_pmi >= min_exp_pmi
+    indptr = np.concatenate([[0], np.cumsum(remain)])[X.indptr]
+    data = np.log(exp_pmi[remain]).astype(dtype, copy=False)
+    pmi = csr_matrix((data, X.indices[remain], indptr), shape=X.shape)
+    pmi.eliminate_zeros()
+    return pmi
 
-def pmi(X, py=None, min_pmi=0, alpha=0.0, beta=1):
+def pmi(X, py=None, min_pmi=0, alpha=0.0, beta=1, dtype=np.float64):
     """
     :param X: scipy.sparse.csr_matrix
         (word, contexts) sparse matrix
@@ -46,6 +68,8 @@ def pmi(X, py=None, min_pmi=0, alpha=0.0, beta=1):
     :param beta: float
         Smoothing factor. pmi(x,y) = log ( Pxy / (Px x Py^beta) )
         Default is 1.0
+    :param dtype: numpy.dtype
+        Data type of pmi matrix. numpy.float32 halves the memory
 
     Returns
     ----------
@@ -70,22 +94,15 @@ def pmi(X, py=None, min_pmi=0, alpha=0.0, beta=1):
     if beta < 1:
         py = py ** beta
         py /= py.sum()
-    pxy = X / X.sum()
-
-    # transform px and py to diagonal matrix
-    # using scipy.sparse.diags
-    # pmi_alpha (x,y) = p(x,y) / ( p(x) x (p(y) + alpha) )
-    px_diag = _as_diag(px, 0)
-    py_diag = _as_diag(py, alpha)
-    exp_pmi = px_diag.dot(pxy).dot(py_diag)
 
     # PPMI using threshold
     min_exp_pmi = 1 if min_pmi == 0 else np.exp(min_pmi)
-    pmi = _logarithm_and_ppmi(exp_pmi, min_exp_pmi)
+    pmi = _pmi_block(csr_matrix(X), X.sum(), _reciprocal(px, 0),
+        _reciprocal(py, alpha), min_exp_pmi, False, dtype)
 
     return pmi, px, py
 
-def pmi_memory_friendly(X, py=None, min_pmi=0, alpha=0.0, beta=1.0, verbose=False):
+def pmi_memory_friendly(X, py=None, min_pmi=0, alpha=0.0, beta=1.0, verbose=False, dtype=np.float64):
     """
     :param X: scipy.sparse.csr_matrix
         (word, contexts) sparse matrix
@@ -103,11 +120,14 @@ def pmi_memory_friendly(X, py=None, min_pmi=0, alpha=0.0, beta=1.0, verbose=Fals
         Default is 1.0
     :param verbose: Boolean
         If True, verbose mode on
+    :param dtype: numpy.dtype
+        Data type of pmi matrix. numpy.float32 halves the memory
 
     Returns
     ----------
-    pmi : scipy.sparse.dok_matrix
-        (word, contexts) pmi value sparse matrix
+    pmi : scipy.sparse.csr_matrix
+        (word, contexts) pmi value sparse matrix. Only the values larger
+        than min_pmi remain
     px : numpy.ndarray
         Probability of rows (items)
     py : numpy.ndarray
@@ -121,50 +141,135 @@ def pmi_memory_friendly(X, py=None, min_pmi=0, alpha=0.0, beta=1.0, verbose=Fals
     assert 0 < beta <= 1
 
     # convert x to probability matrix & marginal probability 
-    px = (X.sum(axis=1) / X.sum()).reshape(-1)
+    px = np.asarray((X.sum(axis=1) / X.sum()).reshape(-1))
     if py is None:
-        py = (X.sum(axis=0) / X.sum()).reshape(-1)
-    pxy = X / X.sum()
+        py = np.asarray((X.sum(axis=0) / X.sum()).reshape(-1))
 
-    assert py.shape[0] == pxy.shape[1]
+    assert py.shape[-1] == X.shape[1]
 
     if beta < 1:
         py = py ** beta
         py /= py.sum()
 
-    # transform px and py to diagonal matrix
-    # using scipy.sparse.diags
-    px_diag = diags(px.tolist()[0])
-    py_diag = diags((py).tolist()[0])
-    
-    # pmi_alpha (x,y) = p(x,y) / ( p(x) x (p(y) + alpha) )
-    px_diag.data[0] = np.asarray([0 if v == 0 else 1/v for v in px_diag.data[0]])
-    py_diag.data[0] = np.asarray([0 if v == 0 else 1/(v + alpha) for v in py_diag.data[0]])
-    
-    exp_pmi = px_diag.dot(pxy).dot(py_diag)
-    
     # PPMI using threshold
     min_exp_pmi = 1 if min_pmi == 0 else np.exp(min_pmi)
+    pmi = _pmi_block(csr_matrix(X), X.sum(), _reciprocal(px, 0),
+        _reciprocal(py, alpha), min_exp_pmi, True, dtype)
+
+    if verbose:
+        print('\rcomputing pmi was done. nnz = {}, mem={} Gb{}'.format(
+            pmi.nnz, '%.3f' % get_process_memory(), ' '*30), flush=True)
+
+    return pmi, px, py
+
+def _marginals(X, py, beta):
+    """It returns (total, px, py) with one pass of X.data. px and py are 1D arrays"""
+    X = csr_matrix(X)
+    total = X.data.sum()
+    # cumsum padded at indptr, so empty rows (also the last ones) have zero sum
+    cumsum = np.concatenate([[0], np.cumsum(X.data, dtype=np.float64)])
+    px = np.diff(cumsum[X.indptr]) / total
+    if py is None:
+        py = np.bincount(X.indices, weights=X.data, minlength=X.shape[1]) / total
+    else:
+        py = np.asarray(py, dtype=np.float64).reshape(-1)
+    if beta < 1:
+        py = py ** beta
+        py /= py.sum()
+    return total, px, py
+
+def pmi_blocks(X, py=None, min_pmi=0, alpha=0.0, beta=1, block_size=10000, dtype=np.float64):
+    """Generator of row blocks of PPMI matrix. Marginal probabilities are
+    computed once, and each row block is transformed independently, so only
+    one block of pmi values is in memory at a time. Stacked blocks are same
+    with pmi(X, py, min_pmi, alpha, beta)[0].
+
+    :param X: scipy.sparse.csr_matrix
+        (word, contexts) sparse matrix
+    :param block_size: int
+        Number of rows in a block
+    Other arguments are same with pmi
+
+    It yields
+    ---------
+    block : scipy.sparse.csr_matrix
+        Shape = (block_size, X.shape[1]). The last block may be smaller
+
+    Usage
+    -----
+        >>> for block in pmi_blocks(X, alpha=0.0001, block_size=50000):
+        >>>     # do something
+    """
+
+    assert 0 < beta <= 1
+
+    X = csr_matrix(X)
+    total, px, py = _marginals(X, py, beta)
+    px_inv = _reciprocal(px, 0)
+    py_inv = _reciprocal(py, alpha)
+    min_exp_pmi = 1 if min_pmi == 0 else np.exp(min_pmi)
 
-    # because exp_pmi is sparse matrix and type of exp_pmi.data is numpy.ndarray
-    indices = np.where(exp_pmi.data > min_exp_pmi)[0]
+    for begin in range(0, X.shape[0], block_size):
+        end = min(X.shape[0], begin + block_size)
+        yield _pmi_block(X[begin:end], total, px_inv[begin:end], py_inv, min_exp_pmi, False, dtype)
 
-    pmi_dok = dok_matrix(exp_pmi.shape)
+def pmi_to_file(X, directory, py=None, min_pmi=0, alpha=0.0, beta=1,
+    block_size=10000, dtype=np.float32, verbose=False):
+    """It writes PPMI matrix to memory-mapped files block by block.
+    directory has data.npy, indices.npy, indptr.npy and meta.json.
+    The capacity of data and indices is X.nnz, because PPMI is not denser
+    than X. Use load_pmi to read it.
 
-    # prepare data (rows, cols, data)
-    rows, cols = exp_pmi.nonzero()
-    data = exp_pmi.data
+    Returns
+    -------
+    pmi : scipy.sparse.csr_matrix
+        PPMI matrix of which arrays are memory-mapped
+    """
+
+    X = csr_matrix(X)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    capacity = max(1, X.nnz)
+    # scipy converts int64 index arrays to int32 (copy) when int32 is enough
+    index_dtype = np.int32 if max(capacity, X.shape[1]) < 2**31 - 1 else np.int64
+    data = open_memmap(os.path.join(directory, 'data.npy'), mode='w+', dtype=dtype, shape=(capacity,))
+    indices = open_memmap(os.path.join(directory, 'indices.npy'), mode='w+', dtype=index_dtype, shape=(capacity,))
+    indptr = open_memmap(os.path.join(directory, 'indptr.npy'), mode='w+', dtype=index_dtype, shape=(X.shape[0] + 1,))
+
+    indptr[0] = 0
+    nnz = 0
+    row = 0
+    for block in pmi_blocks(X, py, min_pmi, alpha, beta, block_size, dtype):
+        data[nnz:nnz+block.nnz] = block.data
+        indices[nnz:nnz+block.nnz] = block.indices
+        indptr[row+1:row+1+block.shape[0]] = block.indptr[1:] + nnz
+        nnz += block.nnz
+        row += block.shape[0]
+        if verbose:
+            print('\rcomputing pmi {} / {} rows, mem={} Gb'.format(
+                row, X.shape[0], '%.3f' % get_process_memory()), flush=True, end='')
+
+    for array in [data, indices, indptr]:
+        array.flush()
+    del data, indices, indptr
+
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'shape': list(X.shape), 'nnz': int(nnz)}, f)
 
-    # enumerate function for printing status
-    for _n_idx, idx in enumerate(indices):
-        # print current status        
-        if verbose and _n_idx % 10000 == 0:
-            print('\rcomputing pmi {:.3} %  mem={} Gb    '.format(
-                100 * _n_idx / indices.shape[0], '%.3f' % get_process_memory())
-                  , flush=True, end='')
-        # apply logarithm
-        pmi_dok[rows[idx], cols[idx]] = np.log(data[idx])
     if verbose:
-        print('\rcomputing pmi was done{}'.format(' '*30), flush=True)
+        print('\rcomputing pmi was done. nnz = {}{}'.format(nnz, ' '*30), flush=True)
+
+    return load_pmi(directory)
+
+def load_pmi(directory, mmap_mode='r'):
+    """It loads PPMI matrix written by pmi_to_file. The arrays are memory-mapped
+    when mmap_mode is not None"""
 
-    return pmi_dok, px, py
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    nnz = meta['nnz']
+    data = np.load(os.path.join(directory, 'data.npy'), mmap_mode=mmap_mode)[:nnz]
+    indices = np.load(os.path.join(directory, 'indices.npy'), mmap_mode=mmap_mode)[:nnz]
+    indptr = np.load(os.path.join(directory, 'indptr.npy'), mmap_mode=mmap_mode)
+    return csr_matrix((data, indices, indptr), shape=tuple(meta['shape']), copy=False)
@@ -9,12 +9,17 @@ def hangle_test():
     from soynlp.hangle import normalize
     from soynlp.hangle import compose
     from soynlp.hangle import decompose
+    from soynlp.hangle import compose_str
+    from soynlp.hangle import decompose_str
     from soynlp.hangle import character_is_korean
     from soynlp.hangle import character_is_jaum
     from soynlp.hangle import character_is_moum
     from soynlp.hangle import to_base
     from soynlp.hangle import levenshtein
     from soynlp.hangle import jamo_levenshtein
+    from soynlp.hangle import LevenshteinIndex
+    from soynlp.hangle import cosine_distance
+    from soynlp.hangle import StringDistanceIndex
     
     normalized_ = normalize('123이건테스트ab테스트')
     if not (normalized_ == '이건테스트 테스트'):
@@ -32,6 +37,12 @@ def hangle_test():
     if not ('감' == compose('ㄱ', 'ㅏ', 'ㅁ')):
         raise ValueError("compose('ㄱ', 'ㅏ', 'ㅁ') -> {}".format(compose('ㄱ', 'ㅏ', 'ㅁ')))
     
+    if not ([('ㄱ', 'ㅏ', 'ㄴ'), ('ㅋ', ' ', ' '), None] == decompose_str('간ㅋa')):
+        raise ValueError("decompose_str('간ㅋa') -> {}".format(decompose_str('간ㅋa')))
+
+    if not ('간ㅋ' == compose_str(decompose_str('간ㅋ'))):
+        raise ValueError("compose_str(decompose_str('간ㅋ')) -> {}".format(compose_str(decompose_str('간ㅋ'))))
+
     if not character_is_korean('감'):
         raise ValueError('character_is_korean("감") -> {}'.format(character_is_korean('감')))
     
@@ -61,7 +72,57 @@ def hangle_test():
     
     if 1/3 != jamo_levenshtein('가나', '가남'):
         raise ValueError("jamo_levenshtein('가나', '가남') -> {}".format(jamo_levenshtein('가나', '가남')))
+
+    index = LevenshteinIndex(['가나', '가남', '가나다', '파이썬'], jamo=True)
+    if not ([('가나', 1/3), ('가나다', 4/3)] == index.nearest('가남', k=3, max_dist=2)[1:]):
+        raise ValueError("LevenshteinIndex.nearest('가남') -> {}".format(index.nearest('가남', k=3, max_dist=2)))
+
+    index = StringDistanceIndex(['가나다', '가나', '파이썬'], metric='cosine')
+    neighbors = index.query(['가나라'], k=2)[0]
+    if not ([1, 0] == [i for i, _ in neighbors] and abs(neighbors[0][1] - cosine_distance('가나라', '가나')) < 1e-9):
+        raise ValueError("StringDistanceIndex.query(['가나라']) -> {}".format(neighbors))
+
+    strings = ['가나다라', '가나다', '나다라', '파이썬', '파이', '라']
+    neighbors = index.pairwise(strings, k=2)
+    for i, neighbors_i in enumerate(neighbors):
+        expected = sorted((cosine_distance(strings[i], strings[j]), j)
+            for j in range(len(strings)) if j != i and set(strings[i]) & set(strings[j]))[:2]
+        if [j for j, _ in neighbors_i] != [j for _, j in expected] or any(
+            abs(d - e) > 1e-9 for (_, d), (e, _) in zip(neighbors_i, expected)):
+            raise ValueError('StringDistanceIndex.pairwise(strings)[{}] -> {}'.format(i, neighbors_i))
+    if neighbors != StringDistanceIndex(strings, metric='cosine').pairwise(k=2):
+        raise ValueError('pairwise(strings) is different with pairwise of index of the strings')
     
+    # encode_batch is same with per-sentence encode
+    import numpy as np
+    from soynlp.hangle import ConvolutionHangleEncoder
+
+    encoder = ConvolutionHangleEncoder()
+    sents = ['', '이건 테스트 123', 'ㅋㅋ쿠ㅜㅜ ㄳ', '가나다라 abc 漢字 ?!', '  띄어쓰기   많은  문장  ', '값없는 힣']
+    for sent in sents:
+        # reference of encode: one-hot from sent_to_onehot
+        expected = np.zeros((len(encoder._normalize(sent)), encoder.dim))
+        for i, idxs in enumerate(encoder.sent_to_onehot(sent)):
+            expected[i, list(idxs)] = 1
+        if not np.array_equal(encoder.encode(sent), expected):
+            raise ValueError('ConvolutionHangleEncoder.encode({}) is wrong'.format(sent))
+
+    for max_len in [5, 30]:
+        onehot = encoder.encode_batch(sents, max_len, output='onehot', copy=True)
+        index = encoder.encode_batch(sents, max_len, output='index', dtype=np.int16)
+        sparse = encoder.encode_batch(sents, max_len, output='sparse')
+        if not np.array_equal(sparse.toarray().reshape(onehot.shape), onehot):
+            raise ValueError('sparse encode_batch is different with onehot encode_batch')
+        for b, sent in enumerate(sents):
+            expected = np.zeros((max_len, encoder.dim), dtype=np.int8)
+            x = encoder.encode(sent)[:max_len]
+            expected[:x.shape[0]] = x
+            if not np.array_equal(onehot[b], expected):
+                raise ValueError('encode_batch({}, max_len={}) is different with encode'.format(sent, max_len))
+            for i, idxs in enumerate(index[b]):
+                if sorted(np.where(expected[i])[0].tolist()) != sorted(j for j in idxs.tolist() if j >= 0):
+                    raise ValueError('index encode_batch({}) is different with encode'.format(sent))
+
     print('all hangle tests have been successed\n')
 
 def tokenizer_test():
@@ -239,6 +300,417 @@ def pmi_test(corpus_path):
         print('pmi {} = {:.3f}'.format(pair, value))
     print('computed pmi')
 
+def dense_pmi(X, py, min_pmi, alpha, beta, strict):
+    """Dense reference of pmi; log(p(x,y) / (p(x) * (p(y) + alpha)))"""
+    import numpy as np
+    X = X.toarray().astype(np.float64)
+    pxy = X / X.sum()
+    px = pxy.sum(axis=1)
+    if py is None:
+        py = pxy.sum(axis=0)
+    if beta < 1:
+        py = py ** beta
+        py /= py.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exp_pmi = pxy / (px.reshape(-1, 1) * (py.reshape(1, -1) + alpha))
+    exp_pmi[pxy == 0] = 0
+    min_exp_pmi = np.exp(min_pmi)
+    remain = exp_pmi > min_exp_pmi if strict else exp_pmi >= min_exp_pmi
+    pmi_ = np.zeros(X.shape)
+    pmi_[remain] = np.log(exp_pmi[remain])
+    return pmi_
+
+def pmi_matrix_test():
+    print('pmi matrix test\n{}'.format('-'*40))
+
+    import numpy as np
+    from scipy.sparse import random as sparse_random
+    from soynlp.word import pmi
+    from soynlp.word import pmi_memory_friendly
+
+    # small cooccurrence matrix with empty rows (also the last rows) and columns
+    X = sparse_random(300, 200, density=0.05, format='csr', random_state=0)
+    X.data = np.ceil(X.data * 10)
+    X = X.tolil()
+    X[7] = 0
+    X[-3:] = 0
+    X[:, 11] = 0
+    X = X.tocsr()
+    X.eliminate_zeros()
+
+    py_ = np.random.RandomState(1).uniform(size=X.shape[1])
+    py_ /= py_.sum()
+    for py in [None, py_]:
+        for min_pmi, alpha, beta in [(0, 0, 1), (0.5, 0.0001, 1), (0, 0.001, 0.75)]:
+            expected = dense_pmi(X, py, min_pmi, alpha, beta, strict=False)
+            pmi_, _, _ = pmi(X, py=py, min_pmi=min_pmi, alpha=alpha, beta=beta)
+            if not np.allclose(pmi_.toarray(), expected):
+                raise ValueError('pmi(min_pmi={}, alpha={}, beta={}) is different with dense computation'.format(
+                    min_pmi, alpha, beta))
+            expected = dense_pmi(X, py, min_pmi, alpha, beta, strict=True)
+            pmi_, _, _ = pmi_memory_friendly(X, py=py, min_pmi=min_pmi, alpha=alpha, beta=beta)
+            if not np.allclose(pmi_.toarray(), expected):
+                raise ValueError('pmi_memory_friendly(min_pmi={}, alpha={}, beta={}) is different with dense computation'.format(
+                    min_pmi, alpha, beta))
+
+    # row-block streaming and memory-mapped pmi are same with pmi
+    import shutil
+    import tempfile
+    from scipy.sparse import vstack
+    from soynlp.word import load_pmi
+    from soynlp.word import pmi_blocks
+    from soynlp.word import pmi_to_file
+
+    directory = tempfile.mkdtemp()
+    try:
+        for py in [None, py_]:
+            expected, _, _ = pmi(X, py=py, min_pmi=0.5, alpha=0.0001)
+            expected = expected.toarray()
+            for block_size in [1, 64, 1000]:
+                blocks = list(pmi_blocks(X, py=py, min_pmi=0.5, alpha=0.0001, block_size=block_size))
+                if not np.allclose(vstack(blocks).toarray(), expected):
+                    raise ValueError('pmi_blocks(block_size={}) is different with pmi'.format(block_size))
+                pmi_ = pmi_to_file(X, directory, py=py, min_pmi=0.5, alpha=0.0001,
+                    block_size=block_size, dtype=np.float32)
+                if not np.allclose(pmi_.toarray(), expected, atol=1e-6):
+                    raise ValueError('pmi_to_file(block_size={}) is different with pmi'.format(block_size))
+                del pmi_
+            if not np.allclose(load_pmi(directory, mmap_mode=None).toarray(), expected, atol=1e-6):
+                raise ValueError('load_pmi is different with pmi')
+    finally:
+        shutil.rmtree(directory)
+
+    print('all pmi matrix tests have been successed\n\n')
+
+def most_similar_test():
+    print('most similar test\n{}'.format('-'*40))
+
+    import numpy as np
+    from soynlp.utils import most_similar
+    from soynlp.utils import SimilarityIndex
+
+    vector = np.random.RandomState(0).normal(size=(500, 20))
+    idx_to_item = ['item%d' % i for i in range(500)]
+    item_to_idx = {item:idx for idx, item in enumerate(idx_to_item)}
+
+    # brute-force cosine similarity
+    normed = vector / np.linalg.norm(vector, axis=1).reshape(-1, 1)
+    for query in ['item0', 'item123', 'item499']:
+        q = item_to_idx[query]
+        sims = normed @ normed[q]
+        expected = [idx for idx in np.argsort(-sims, kind='mergesort') if idx != q][:10]
+        similars = most_similar(query, vector, item_to_idx, idx_to_item, topk=10)
+        if [item_to_idx[item] for item, _ in similars] != expected:
+            raise ValueError('most_similar({}) is different with brute-force'.format(query))
+        if not np.allclose([sim for _, sim in similars], sims[expected]):
+            raise ValueError('most_similar({}) similarity is wrong'.format(query))
+
+    # prebuilt index gives same results
+    prebuilt = SimilarityIndex(vector, idx_to_item)
+    expected = [item for item, _ in most_similar('item1', vector, item_to_idx, idx_to_item)]
+    if [item for item, _ in prebuilt.most_similar('item1')] != expected:
+        raise ValueError('SimilarityIndex.most_similar is different with most_similar')
+    if [item for item, _ in most_similar('item1', prebuilt, item_to_idx, idx_to_item)] != expected:
+        raise ValueError('most_similar with SimilarityIndex is different with most_similar')
+
+    print('all most similar tests have been successed\n\n')
+
+def reference_word_contexts(sents, windows, vocab2idx, dynamic_weight):
+    """Nested dict counting of (word, context) pairs before sparse chunks"""
+    if dynamic_weight:
+        weight = [(windows-i)/windows for i in range(windows)]
+    else:
+        weight = [1] * windows
+    word2contexts = {}
+    for sent in sents:
+        words = sent.split()
+        for i, word in enumerate(words):
+            if not (word in vocab2idx):
+                continue
+            contexts = word2contexts.setdefault(word, {})
+            for w in range(windows):
+                for j in [i - (w + 1), i + w + 1]:
+                    if 0 <= j < len(words) and words[j] in vocab2idx:
+                        contexts[words[j]] = contexts.get(words[j], 0) + weight[w]
+    return word2contexts
+
+def word_context_test():
+    print('word context test\n{}'.format('-'*40))
+
+    import numpy as np
+    from collections import Counter
+    from soynlp.vectorizer import _word_context as word_context_module
+    from soynlp.vectorizer import sent_to_word_contexts_matrix
+
+    sents = generate_phrase_sentences(n_sents=3000, n_words=300, seed=1) + ['', '혼자']
+    # small buffer to sum several sparse chunks
+    word_context_module.buffer_size = 1000
+    try:
+        for dynamic_weight in [False, True]:
+            x, idx2vocab = sent_to_word_contexts_matrix(sents, windows=3, min_tf=5,
+                dynamic_weight=dynamic_weight, verbose=False)
+            vocab2idx = {vocab:idx for idx, vocab in enumerate(idx2vocab)}
+            word_counter = Counter(word for sent in sents for word in sent.split())
+            if set(idx2vocab) != {word for word, count in word_counter.items() if count >= 5}:
+                raise ValueError('vocabulary of sent_to_word_contexts_matrix is wrong')
+            expected = np.zeros((len(idx2vocab), len(idx2vocab)))
+            for word, contexts in reference_word_contexts(sents, 3, vocab2idx, dynamic_weight).items():
+                for context, value in contexts.items():
+                    expected[vocab2idx[word], vocab2idx[context]] = value
+            if x.shape != expected.shape or not np.allclose(x.toarray(), expected):
+                raise ValueError('sent_to_word_contexts_matrix(dynamic_weight={}) is different with dict counting'.format(
+                    dynamic_weight))
+    finally:
+        word_context_module.buffer_size = 1000000
+
+    # parallel counting is same with serial counting. Small shards for several worker tasks
+    word_context_module.chunk_size = 500
+    try:
+        for dynamic_weight in [False, True]:
+            x, idx2vocab = sent_to_word_contexts_matrix(sents, windows=3, min_tf=5,
+                dynamic_weight=dynamic_weight, verbose=False, n_jobs=1)
+            x_, idx2vocab_ = sent_to_word_contexts_matrix(sents, windows=3, min_tf=5,
+                dynamic_weight=dynamic_weight, verbose=False, n_jobs=2)
+            if idx2vocab != idx2vocab_ or x.shape != x_.shape or abs(x - x_).sum() > 1e-9:
+                raise ValueError('sent_to_word_contexts_matrix(n_jobs=2) is different with n_jobs=1')
+    finally:
+        word_context_module.chunk_size = 10000
+
+    print('all word context tests have been successed\n\n')
+
+def svd_test():
+    print('svd test\n{}'.format('-'*40))
+
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from soynlp.utils.math import svd
+    from soynlp.utils.math import svd_update
+    from soynlp.utils.math import svd_update_rows
+
+    # low rank matrix with noise, of which singular values are separated
+    random_state = np.random.RandomState(0)
+    X = (random_state.normal(size=(400, 10)) * np.arange(20, 0, -2)) @ random_state.normal(size=(10, 150))
+    X += 0.01 * random_state.normal(size=X.shape)
+    X = csr_matrix(X)
+    expected = np.linalg.svd(X.toarray(), compute_uv=False)[:8]
+
+    _, Sigma, _ = svd(X, n_components=8, random_state=0)
+    if not np.allclose(Sigma, expected, rtol=1e-4):
+        raise ValueError('randomized svd singular values are wrong')
+    for X_, block_size, dtype in [(X, 64, None), (X, 1000, np.float32),
+        (lambda: (X[b:b+100] for b in range(0, 400, 100)), None, None)]:
+        U, Sigma_, VT = svd(X_, n_components=8, random_state=0, block_size=block_size, dtype=dtype)
+        if not np.allclose(Sigma_, Sigma, rtol=1e-3):
+            raise ValueError('streaming svd(block_size={}, dtype={}) is different with randomized_svd'.format(
+                block_size, dtype))
+        if U.shape != (400, 8) or VT.shape != (8, 150):
+            raise ValueError('streaming svd returns wrong shape')
+
+    # rank-c update is same with svd of updated matrix
+    X = X.toarray()
+    U, Sigma, VT = np.linalg.svd(X, full_matrices=False)
+    U, Sigma, VT = U[:, :10], Sigma[:10], VT[:10]
+    A = random_state.normal(size=(400, 2))
+    B = random_state.normal(size=(150, 2))
+    X_low = U @ np.diag(Sigma) @ VT
+    U_, Sigma_, VT_ = svd_update(U, Sigma, VT, A, B, n_components=12)
+    expected = np.linalg.svd(X_low + A @ B.T, compute_uv=False)[:12]
+    if not np.allclose(Sigma_, expected) or not np.allclose(U_ @ np.diag(Sigma_) @ VT_, X_low + A @ B.T):
+        raise ValueError('svd_update is different with svd of updated matrix')
+
+    # changed and appended rows
+    delta = random_state.normal(size=(3, 150))
+    U_, Sigma_, VT_ = svd_update_rows(U, Sigma, VT, [0, 5, 401], delta, n_components=13)
+    X_new = np.vstack([X_low, np.zeros((2, 150))])
+    X_new[[0, 5, 401]] += delta
+    if not np.allclose(U_ @ np.diag(Sigma_) @ VT_, X_new):
+        raise ValueError('svd_update_rows is different with svd of updated matrix')
+
+    print('all svd tests have been successed\n\n')
+
+def generate_eojeol_counts(extractor, n_nouns=300, seed=0):
+    """(eojeol, count) of conjugated predicators, noun + josa and noisy eojeols"""
+    import random
+    from soynlp.lemmatizer import conjugate
+
+    random.seed(seed)
+    stems = sorted(extractor._stems)[:200]
+    eomis = sorted(eomi for eomi in extractor._eomis if len(eomi) <= 3)[:100]
+    josas = sorted(extractor._josas)
+    nouns = sorted(extractor._nouns)[:n_nouns]
+    eojeols = {}
+    for stem in stems:
+        for eomi in random.sample(eomis, 5):
+            try:
+                surfaces = conjugate(stem, eomi)
+            except Exception:
+                continue
+            for surface in surfaces:
+                eojeols[surface] = random.randint(1, 10)
+    for noun in nouns:
+        for josa in random.sample(josas, 3):
+            eojeols[noun + josa] = random.randint(1, 10)
+        eojeols[noun + random.choice(stems)] = 1
+    return eojeols
+
+def predicator_test():
+    print('predicator test\n{}'.format('-'*40))
+
+    from soynlp.predicator import PredicatorExtractor
+    from soynlp.predicator._predicator import _has_prefix
+    from soynlp.predicator._predicator import _is_noun_josa
+
+    nouns = {'영화', '영화관', '아이', '아이돌', '사람', '하늘', '바다', '노래', '가수', '배우'}
+    nouns.update(c0 + c1 for c0 in '강남동서산솔한' for c1 in '구누두루무부수')
+    extractor = PredicatorExtractor(nouns, verbose=False)
+    eojeol_counts = generate_eojeol_counts(extractor)
+    eojeols = list(eojeol_counts) + ['영', '영화', '영화는', '아이돌이', '바다가요', '사람들']
+
+    # trie lookups are same with slicing and set lookups
+    nouns, josas = extractor._nouns, extractor._josas
+    for eojeol in eojeols:
+        expected = any(eojeol[:e] in nouns for e in range(2, len(eojeol) + 1))
+        if _has_prefix(extractor._noun_trie, eojeol, 2) != expected:
+            raise ValueError('_has_prefix({}) is different with slicing'.format(eojeol))
+        expected = any(eojeol[:i] in nouns and eojeol[i:] in josas for i in range(1, len(eojeol)))
+        if _is_noun_josa(eojeol, nouns, extractor._josa_trie) != expected:
+            raise ValueError('_is_noun_josa({}) is different with slicing'.format(eojeol))
+
+    # parallel lemma candidating is same with serial one. Small partitions for several worker tasks
+    from soynlp.predicator import _predicator as predicator_module
+
+    predicator_module.chunk_size = 100
+    try:
+        extractor.n_jobs = 1
+        serial = extractor._as_lemma_candidates(eojeol_counts)
+        extractor.n_jobs = 2
+        parallel = extractor._as_lemma_candidates(eojeol_counts)
+    finally:
+        predicator_module.chunk_size = 5000
+    if not serial:
+        raise ValueError('lemma candidates should not be empty')
+    if serial != parallel:
+        raise ValueError('PredicatorExtractor(n_jobs=2) lemmas are different with n_jobs=1')
+
+    print('all predicator tests have been successed\n\n')
+
+def generate_phrase_sentences(n_sents=20000, n_words=2000, seed=0):
+    import random
+    random.seed(seed)
+    words = ['w%d' % i for i in range(n_words)]
+    weights = [1 / (i + 1) for i in range(n_words)]
+    return [' '.join(random.choices(words, weights, k=random.randint(0, 12)))
+            for _ in range(n_sents)]
+
+def reference_bigram_scores(sents, min_frequency, checkpoint, score):
+    """Dict-based Bigram counting and scoring before id-encoded counting"""
+    from math import log
+    counter = {}
+    for i_sent, sent in enumerate(sents):
+        if checkpoint > 0 and i_sent % checkpoint == 0:
+            counter = {pair:freq for pair, freq in counter.items() if freq >= min_frequency}
+        words = sent.split()
+        for pair in zip(words, words[1:]):
+            counter[pair] = counter.get(pair, 0) + 1
+    counter = {pair:freq for pair, freq in counter.items() if freq >= min_frequency}
+    unigram = {}
+    for pair in counter:
+        for word in pair:
+            unigram[word] = unigram.get(word, 0) + 1
+    N = 2 * sum(counter.values())
+    scores = {}
+    for pair, freq in counter.items():
+        base = unigram[pair[0]] * unigram[pair[1]]
+        if score == 'pmi':
+            scores[pair] = log(N * freq / base)
+        elif score == 'mikolov':
+            scores[pair] = (freq - min_frequency) / base
+        else:
+            scores[pair] = freq
+    return counter, scores
+
+def phrase_test():
+    print('phrase test\n{}'.format('-'*40))
+
+    from collections import Counter
+    from soynlp.word import Bigram
+
+    sents = generate_phrase_sentences()
+    true_counts = Counter()
+    for sent in sents:
+        words = sent.split()
+        true_counts.update(zip(words, words[1:]))
+
+    # id-encoded counting returns same counts and scores with dict counting
+    for checkpoint in [0, 3000]:
+        for score in ['frequency', 'pmi', 'mikolov']:
+            bigram = Bigram(min_frequency=3, score=score,
+                filtering_checkpoint=checkpoint, verbose=False)
+            bigram.train(sents)
+            counter, scores = reference_bigram_scores(sents, 3, checkpoint, score)
+            if bigram._counter != counter:
+                raise ValueError('Bigram counts are different with dict counting '
+                    '(checkpoint={})'.format(checkpoint))
+            extracteds = bigram.extract(threshold=0)
+            expecteds = {pair:s for pair, s in scores.items() if s >= 0}
+            if extracteds.keys() != expecteds.keys():
+                raise ValueError('Bigram({}) extracts different bigrams'.format(score))
+            for pair, expected in expecteds.items():
+                if abs(extracteds[pair].score - expected) > 1e-9 * max(1, abs(expected)):
+                    raise ValueError('Bigram({}) score of {} = {}, expected {}'.format(
+                        score, pair, extracteds[pair].score, expected))
+
+    # Space-Saving keeps every bigram of frequency > N / max_counters,
+    # and true frequency is in [frequency - error, frequency]
+    max_counters = 3000
+    bigram = Bigram(min_frequency=1, max_counters=max_counters, verbose=False)
+    bigram.train(sents)
+    estimateds = bigram.estimated_frequencies()
+    n_bigrams = sum(true_counts.values())
+    if bigram.guaranteed_frequency != n_bigrams / max_counters:
+        raise ValueError('guaranteed_frequency = {}, expected {}'.format(
+            bigram.guaranteed_frequency, n_bigrams / max_counters))
+    for pair, count in true_counts.items():
+        if count > n_bigrams / max_counters and not (pair in estimateds):
+            raise ValueError('Space-Saving dropped frequent bigram {} ({})'.format(pair, count))
+    for pair, estimated in estimateds.items():
+        if not (estimated.frequency - estimated.error <= true_counts[pair] <= estimated.frequency):
+            raise ValueError('Space-Saving estimation of {} = {}, true count = {}'.format(
+                pair, estimated, true_counts[pair]))
+
+    # Ngram counts all n-grams and is same with Bigram when max_n=2
+    from soynlp.word import Ngram
+
+    true_counts = Counter()
+    for sent in sents:
+        words = sent.split()
+        for n in [2, 3]:
+            true_counts.update(zip(*[words[k:] for k in range(n)]))
+    true_counts = {ngram:freq for ngram, freq in true_counts.items() if freq >= 3}
+    ngram = Ngram(sents, max_n=3, min_frequency=3, filtering_checkpoint=0, verbose=False)
+    if ngram._counter != true_counts:
+        raise ValueError('Ngram counts are different with brute-force counting')
+
+    bigram = Bigram(sents, min_frequency=3, score='pmi', filtering_checkpoint=3000, verbose=False)
+    ngram = Ngram(sents, max_n=2, min_frequency=3, score='pmi', filtering_checkpoint=3000, verbose=False)
+    bigram_scores = bigram.extract(threshold=0)
+    ngram_scores = ngram.extract(threshold=0)
+    if bigram_scores.keys() != ngram_scores.keys() or any(
+        abs(bigram_scores[pair].score - score.score) > 1e-9 for pair, score in ngram_scores.items()):
+        raise ValueError('Ngram(max_n=2) is different with Bigram')
+
+    # parallel counting is same with serial counting
+    for score in ['frequency', 'pmi']:
+        serial = Ngram(sents, max_n=3, min_frequency=3, score=score,
+            filtering_checkpoint=3000, verbose=False, n_jobs=1)
+        parallel = Ngram(sents, max_n=3, min_frequency=3, score=score,
+            filtering_checkpoint=3000, verbose=False, n_jobs=2)
+        if serial._counter != parallel._counter or serial._idx2vocab != parallel._idx2vocab:
+            raise ValueError('Ngram(n_jobs=2) counts are different with n_jobs=1')
+        if serial.extract(topk=100) != parallel.extract(topk=100):
+            raise ValueError('Ngram(n_jobs=2) scores are different with n_jobs=1')
+
+    print('all phrase tests have been successed\n\n')
 
 def main():
     parser = argparse.ArgumentParser()
@@ -251,6 +723,12 @@ def main():
     parser.add_argument('--pass_noun', dest='pass_noun', action='store_true')
     parser.add_argument('--pass_pos', dest='pass_pos', action='store_true')
     parser.add_argument('--pass_pmi', dest='pass_pmi', action='store_true')
+    parser.add_argument('--pass_word_context', dest='pass_word_context', action='store_true')
+    parser.add_argument('--pass_pmi_matrix', dest='pass_pmi_matrix', action='store_true')
+    parser.add_argument('--pass_similar', dest='pass_similar', action='store_true')
+    parser.add_argument('--pass_svd', dest='pass_svd', action='store_true')
+    parser.add_argument('--pass_predicator', dest='pass_predicator', action='store_true')
+    parser.add_argument('--pass_phrase', dest='pass_phrase', action='store_true')
     
     args = parser.parse_args()
     corpus_path = args.corpus_path
@@ -277,5 +755,23 @@ def main():
     if not args.pass_pmi:
         pmi_test(corpus_path)
 
+    if not args.pass_word_context:
+        word_context_test()
+
+    if not args.pass_pmi_matrix:
+        pmi_matrix_test()
+
+    if not args.pass_similar:
+        most_similar_test()
+
+    if not args.pass_svd:
+        svd_test()
+
+    if not args.pass_predicator:
+        predicator_test()
+
+    if not args.pass_phrase:
+        phrase_test()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
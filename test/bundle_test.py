@@ -0,0 +1,91 @@
+# -*- encoding:utf8 -*-
+
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, '../')
+
+import soynlp.utils.bundle as bundle_module
+from soynlp.pos._adverb import load_default_adverbs
+from soynlp.predicator import PredicatorExtractor
+from soynlp.utils.bundle import build_dictionary_bundle
+from soynlp.utils.bundle import load_dictionary_bundle
+
+
+def load_defaults(bundle):
+    # replace the default bundle of process
+    bundle_module._default_bundle = bundle
+    bundle_module._default_bundle_loaded = True
+    extractor = PredicatorExtractor(nouns={'영화'}, verbose=False)
+    return {
+        'josas': extractor._josas,
+        'adjectives': extractor._adjective_stems,
+        'verbs': extractor._verb_stems,
+        'eomis': extractor._eomis,
+        'stem_surfaces': extractor._stem_surfaces,
+        'adverbs': load_default_adverbs()
+    }
+
+def bundle_equals_text_test(directory):
+    path = build_dictionary_bundle('%s/dictionary.bundle' % directory, verbose=False)
+    bundle = load_dictionary_bundle(path)
+    if bundle is None:
+        raise ValueError('failed to load the bundle just built')
+
+    from_text = load_defaults(None)
+    from_bundle = load_defaults(bundle)
+    for name, words in from_text.items():
+        if words != from_bundle[name]:
+            raise ValueError('{} of bundle is different with text dictionary: {} vs {}'.format(
+                name, len(from_bundle[name]), len(words)))
+
+    print('all bundle dictionaries are same with text dictionaries\n')
+
+def stale_bundle_test(directory):
+    sources = {}
+    for name, source in bundle_module._default_sources().items():
+        sources[name] = '%s/%s.txt' % (directory, name)
+        shutil.copyfile(source, sources[name])
+    path = build_dictionary_bundle('%s/stale.bundle' % directory, verbose=False, sources=sources)
+    if load_dictionary_bundle(path) is None:
+        raise ValueError('fresh bundle should be loaded')
+
+    # loading does not read source files
+    file_hash = bundle_module._file_hash
+    def read_source(path):
+        raise ValueError('loading bundle should not read {}'.format(path))
+    bundle_module._file_hash = read_source
+    try:
+        load_dictionary_bundle(path)
+    finally:
+        bundle_module._file_hash = file_hash
+
+    # same size and mtime edit is detected only with check_sources=True
+    source = sources['verb_stems']
+    stat = os.stat(source)
+    with open(source, 'r+b') as f:
+        f.write(b'#')
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    if load_dictionary_bundle(path) is None:
+        raise ValueError('bundle of which sources keep size and mtime should be loaded')
+    if load_dictionary_bundle(path, check_sources=True) is not None:
+        raise ValueError('check_sources=True should detect edited source')
+
+    with open(sources['josa_chat'], 'a', encoding='utf-8') as f:
+        f.write('\n새로운조사\n')
+    if load_dictionary_bundle(path) is not None:
+        raise ValueError('stale bundle should not be loaded')
+
+    print('stale bundle falls back to text dictionaries\n')
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        bundle_equals_text_test(directory)
+        stale_bundle_test(directory)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
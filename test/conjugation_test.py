@@ -39,5 +39,19 @@ def main():
     for stem, eomi in testset:
         print('{} + {} -> {}'.format(stem, eomi, conjugate(stem, eomi)))
 
+    # memoization size is configurable and does not change results
+    from soynlp.lemmatizer import set_conjugation_cache_size
+    from soynlp.lemmatizer import _conjugation
+
+    cached = [conjugate(stem, eomi) for stem, eomi in testset]
+    set_conjugation_cache_size(0)
+    try:
+        if [conjugate(stem, eomi) for stem, eomi in testset] != cached:
+            raise ValueError('conjugate without memoization is different with memoized one')
+        if _conjugation._conjugate_cache.cache_info().currsize != 0:
+            raise ValueError('conjugate should not memoize when cache size is 0')
+    finally:
+        set_conjugation_cache_size(_conjugation.conjugation_cache_size)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -88,5 +88,52 @@ def main():
         print('({}, {}) -> {}'.format(l,r,lemmatizer.lemmatize(l+r)))
         # print(_lemma_candidate(l, r), end='\n\n')
 
+    # indexed lemmatizers should return same candidates
+    words = [l+r for l,r in testset]
+    expected = [lemmatizer.lemmatize(word) for word in words]
+    indexed = Lemmatizer(stems=test_stems, endings=test_eomis, index_splits=True)
+    if not (indexed.lemmatize_batch(words) == expected):
+        raise ValueError('Lemmatizer(index_splits=True) returns different candidates')
+    indexed = Lemmatizer(stems=test_stems, endings=test_eomis, surface_index=True)
+    if not ([indexed.lemmatize(word) for word in words] == expected):
+        raise ValueError('Lemmatizer(surface_index=True) returns different candidates')
+
+    surface_index_default_dictionary_test()
+
+def load_default_dictionary(path, min_frequency):
+    words = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            word, frequency = line.split()
+            if int(frequency) >= min_frequency:
+                words.add(word)
+    return words
+
+def surface_index_default_dictionary_test(n_stems=20):
+    from soynlp.lemmatizer import build_surface_index
+    from soynlp.utils.utils import installpath
+
+    # same thresholds with PredicatorExtractor default dictionaries
+    dirs = '%s/lemmatizer/dictionary/default' % installpath
+    stems = load_default_dictionary('%s/Stem/Adjective.txt' % dirs, 2)
+    stems.update(load_default_dictionary('%s/Stem/Verb.txt' % dirs, 2))
+    eomis = load_default_dictionary('%s/Eomi/Eomi.txt' % dirs, 20)
+    if not ('ㅑ' in eomis or 'ㅔ요' in eomis):
+        raise ValueError('default eomis should contain bare vowel endings')
+
+    # the full stems x eomis pass takes minutes, so stems are sampled
+    stems = sorted(stems)
+    stems = set(stems[::len(stems) // n_stems])
+    index = build_surface_index(stems, eomis)
+    if not index:
+        raise ValueError('build_surface_index returns empty index from default dictionaries')
+
+    lemmatizer = Lemmatizer(stems=stems, endings=eomis, surface_index=index)
+    reference = Lemmatizer(stems=stems, endings=eomis)
+    for surface in sorted(index)[::max(1, len(index) // 300)]:
+        if lemmatizer.lemmatize(surface) != reference.lemmatize(surface):
+            raise ValueError('surface index of {} is different with lemmatize'.format(surface))
+    print('surface index from default dictionaries has {} surfaces'.format(len(index)))
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
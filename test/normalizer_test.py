@@ -0,0 +1,250 @@
+# -*- encoding:utf8 -*-
+
+import argparse
+import random
+import re
+import sys
+import time
+sys.path.append('../')
+
+from soynlp.hangle import compose, decompose
+from soynlp.normalizer import repeat_normalize
+
+
+def reference_emoticon_normalize(sent, num_repeats=2):
+    """Character-by-character implementation before the table-driven rewrite"""
+    if not sent:
+        return sent
+
+    def pattern(idx):
+        if 12593 <= idx <= 12622:
+            return 0
+        elif 12623 <= idx <= 12643:
+            return 1
+        elif 44032 <= idx <= 55203:
+            return 2
+        else:
+            return -1
+
+    idxs = [pattern(ord(c)) for c in sent]
+    sent_ = []
+    last_idx = len(idxs) - 1
+    for i, (idx, c) in enumerate(zip(idxs, sent)):
+        if (i > 0 and i < last_idx) and (idxs[i-1] == 0 and idx == 2 and idxs[i+1] == 1):
+            cho, jung, jong = decompose(c)
+            if (cho == sent[i-1]) and (jung == sent[i+1]) and (jong == ' '):
+                sent_.append(cho)
+                sent_.append(jung)
+            else:
+                sent_.append(c)
+        elif (i < last_idx) and (idx == 2) and (idxs[i+1] == 0):
+            cho, jung, jong = decompose(c)
+            if (jong == sent[i+1]):
+                sent_.append(compose(cho, jung, ' '))
+                sent_.append(jong)
+        elif (i > 0) and (idx == 2 and idxs[i-1] == 0):
+            cho, jung, jong = decompose(c)
+            if (cho == sent[i-1]):
+                sent_.append(cho)
+                sent_.append(jung)
+        else:
+            sent_.append(c)
+    return repeat_normalize(''.join(sent_), num_repeats)
+
+def reference_normalize_emoji(token):
+    """Character-by-character implementation before the table-driven rewrite"""
+    if len(token) <= 1:
+        return token
+    token_ = []
+    decomposeds = [decompose(c) for c in token]
+    for char, cd, nd in zip(token, decomposeds, decomposeds[1:]):
+        if cd == None or nd == None:
+            token_.append(char)
+            continue
+        if (nd[1] == ' ') and (cd[2] == nd[0]):
+            token_.append(compose(cd[0], cd[1], ' ') + nd[0])
+        elif (cd[2] == ' ') and (nd[0] == ' ') and (cd[1] == nd[1]):
+            token_.append((cd[0] + cd[1]) if cd [0] != ' ' else cd[1])
+        else:
+            token_.append(char)
+    return ''.join(token_) + token[-1]
+
+reference_repeatchars_patterns = [
+    re.compile('(\w\w\w\w)\\1{3,}'),
+    re.compile('(\w\w\w)\\1{3,}'),
+    re.compile('(\w\w)\\1{3,}'),
+    re.compile('(\w)\\1{3,}')
+]
+
+def reference_tokenizer_normalize(sentence, num_repeat=2):
+    """Token-by-token implementation before the sentence-level rewrite"""
+    def normalize_token(token):
+        token = reference_normalize_emoji(token)
+        if num_repeat > 0:
+            for pattern in reference_repeatchars_patterns:
+                token = pattern.sub('\\1' * num_repeat, token)
+        return token
+    return ' '.join(normalize_token(token) for token in sentence.split())
+
+def reference_normalize(doc, alphabet=False, number=False,
+    punctuation=False, symbol=False, remove_repeat=0):
+    """Regex pass by pass implementation before the compiled Normalizer"""
+    from soynlp.normalizer._normalizer import text_filter, alphabet_pattern, number_pattern
+    from soynlp.normalizer._normalizer import punctuation_pattern, symbol_pattern
+    from soynlp.normalizer._normalizer import repeatchars_pattern, doublespace_pattern
+
+    doc = text_filter.sub(' ', doc)
+    if not alphabet:
+        doc = alphabet_pattern.sub(' ', doc)
+    if not number:
+        doc = number_pattern.sub(' ', doc)
+    if not punctuation:
+        doc = punctuation_pattern.sub(' ', doc)
+    if not symbol:
+        doc = symbol_pattern.sub(' ', doc)
+    if remove_repeat > 0:
+        doc = repeatchars_pattern.sub('\\1' * remove_repeat, doc)
+    return doublespace_pattern.sub(' ', doc).strip()
+
+def reference_normalize_sent_for_lrgraph(sent):
+    """Regex pass by pass implementation before the translate table"""
+    from soynlp.normalizer import remain_hangle_on_last
+    from soynlp.normalizer._normalizer import text_filter, symbol_pattern
+
+    sent = text_filter.sub(' ', sent)
+    sent = symbol_pattern.sub(' ', sent)
+    sent_ = [remain_hangle_on_last(eojeol) for eojeol in sent.split()]
+    return ' '.join(eojeol for eojeol in sent_ if eojeol)
+
+def generate_chat_sentences(n_sents=20000, seed=0):
+    random.seed(seed)
+    pieces = ['ㅋ', 'ㅋㅋㅋ', 'ㅎㅎ', 'ㅠㅠ', 'ㅜㅜㅜ', 'ㅡ', '쿠', '큐', '킄', '앜', '아', '하', '핳', '흐',
+        '헐', '앙', '읭', '안녕', '하세요', '존잼', '영화', '우왕', '굳', 'ㄱㄱ', 'ㅇㅇ', 'ㄴㄴ', 'ㄳ',
+        'a', 'ok', '123', '!', '?', '.', '~', '^^', ' ', ' ', '  ', '\t', '😀', '漢']
+    sents = []
+    for _ in range(n_sents):
+        sent = ''.join(random.choice(pieces) for _ in range(random.randint(0, 12)))
+        sents.append(sent)
+    return sents
+
+def emoticon_normalize_test():
+    from soynlp.normalizer import emoticon_normalize
+    from soynlp.normalizer import emoticon_normalize_batch
+
+    sents = generate_chat_sentences()
+    for num_repeats in [0, 2, 3]:
+        normalizeds = emoticon_normalize_batch(sents, num_repeats)
+        for sent, normalized in zip(sents, normalizeds):
+            expected = reference_emoticon_normalize(sent, num_repeats)
+            if normalized != expected:
+                raise ValueError('emoticon_normalize({}, {}) -> {}, expected {}'.format(
+                    sent, num_repeats, normalized, expected))
+
+    if not ('ㅋㅋㅋ' == emoticon_normalize('ㅋㅋ쿠ㅜㅜ', num_repeats=3)[:3]):
+        raise ValueError("emoticon_normalize('ㅋㅋ쿠ㅜㅜ') -> {}".format(emoticon_normalize('ㅋㅋ쿠ㅜㅜ')))
+
+    print('all emoticon_normalize tests have been successed\n')
+
+def tokenizer_normalize_emoji_test():
+    from soynlp.tokenizer._normalizer import _normalize_emoji
+
+    sents = generate_chat_sentences(seed=1)
+    for sent in sents:
+        for token in sent.split():
+            normalized = _normalize_emoji(token)
+            expected = reference_normalize_emoji(token)
+            if normalized != expected:
+                raise ValueError('_normalize_emoji({}) -> {}, expected {}'.format(
+                    token, normalized, expected))
+
+    print('all tokenizer _normalize_emoji tests have been successed\n')
+
+def tokenizer_normalize_test():
+    from soynlp.tokenizer import normalize
+    from soynlp.tokenizer import normalize_batch
+
+    sents = generate_chat_sentences(seed=2)
+    sents += ['ㅋㅋㅋㅋ하하하하하 abababab 가나다라가나다라가나다라가나다라 ㅠㅠ', '1111 abcabcabcabc']
+    for num_repeat in [0, 1, 2]:
+        normalizeds = normalize_batch(sents, num_repeat)
+        for sent, normalized in zip(sents, normalizeds):
+            expected = reference_tokenizer_normalize(sent, num_repeat)
+            if normalized != expected:
+                raise ValueError('normalize({}, {}) -> {}, expected {}'.format(
+                    sent, num_repeat, normalized, expected))
+
+    if not ('ㅋㅋ하하 abab' == normalize('ㅋㅋㅋㅋ하하하하하 abababab')):
+        raise ValueError("normalize('ㅋㅋㅋㅋ하하하하하 abababab') -> {}".format(
+            normalize('ㅋㅋㅋㅋ하하하하하 abababab')))
+
+    print('all tokenizer normalize tests have been successed\n')
+
+def normalizer_test():
+    from itertools import product
+    from soynlp.normalizer import Normalizer
+    from soynlp.normalizer import normalize
+    from soynlp.normalizer import normalize_sent_for_lrgraph
+    from soynlp.normalizer import only_hangle
+    from soynlp.normalizer import only_hangle_number
+    from soynlp.normalizer import only_text
+    from soynlp.normalizer._normalizer import doublespace_pattern
+    from soynlp.normalizer._normalizer import hangle_filter
+    from soynlp.normalizer._normalizer import hangle_number_filter
+    from soynlp.normalizer._normalizer import text_filter
+
+    sents = generate_chat_sentences(n_sents=3000, seed=4)
+    sents += ['abc(def)[1,2]{3}`x` 가.나?다!라 "인용" \'작은\' a-b', '\x1c\u3000\xa0가\u2028나\n\r다']
+    for options in product([False, True], [False, True], [False, True], [False, True], [0, 2]):
+        normalizer = Normalizer(*options)
+        normalizeds = normalizer.normalize_batch(sents)
+        for sent, normalized in zip(sents, normalizeds):
+            expected = reference_normalize(sent, *options)
+            if normalized != expected or normalize(sent, *options) != expected:
+                raise ValueError('Normalizer{}({}) -> {}, expected {}'.format(
+                    options, sent, normalized, expected))
+
+    def reference_filter(pattern):
+        return lambda sent: doublespace_pattern.sub(' ', pattern.sub(' ', sent)).strip()
+
+    for func, reference in [(only_hangle, reference_filter(hangle_filter)),
+        (only_hangle_number, reference_filter(hangle_number_filter)),
+        (only_text, reference_filter(text_filter)),
+        (normalize_sent_for_lrgraph, reference_normalize_sent_for_lrgraph)]:
+        for sent in sents:
+            if func(sent) != reference(sent):
+                raise ValueError('{}({}) -> {}, expected {}'.format(
+                    func.__name__, sent, func(sent), reference(sent)))
+
+    print('all Normalizer tests have been successed\n')
+
+def tokenizer_normalize_benchmark(n_sents=100000):
+    from soynlp.tokenizer import normalize_batch
+
+    sents = generate_chat_sentences(n_sents, seed=3)
+
+    begin = time.time()
+    for sent in sents:
+        reference_tokenizer_normalize(sent)
+    reference_time = time.time() - begin
+
+    begin = time.time()
+    normalize_batch(sents)
+    batch_time = time.time() - begin
+
+    print('tokenizer normalize throughput: {:.0f} sents/sec (token-by-token {:.0f} sents/sec)\n'.format(
+        n_sents / batch_time, n_sents / reference_time))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--benchmark', dest='benchmark', action='store_true')
+    args = parser.parse_args()
+
+    emoticon_normalize_test()
+    tokenizer_normalize_emoji_test()
+    tokenizer_normalize_test()
+    normalizer_test()
+    if args.benchmark:
+        tokenizer_normalize_benchmark()
+
+if __name__ == '__main__':
+    main()
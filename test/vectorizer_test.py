@@ -0,0 +1,170 @@
+# -*- encoding:utf8 -*-
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, '../')
+
+from collections import Counter
+from zlib import crc32
+import numpy as np
+from scipy.io import mmread
+from scipy.sparse import load_npz
+from scipy.sparse import vstack
+
+from soynlp.vectorizer import BaseVectorizer
+from soynlp.vectorizer import Vocabulary
+
+
+def generate_docs(n_docs=3000, n_words=500, seed=0):
+    random.seed(seed)
+    words = ['단어%d' % i for i in range(n_words)]
+    return [' '.join(random.choice(words[:random.randint(10, n_words)])
+        for _ in range(random.randint(0, 20))) for _ in range(n_docs)]
+
+def reference_matrix(docs, term_to_col, n_cols):
+    """Dict-based term frequency matrix"""
+    x = np.zeros((len(docs), n_cols), dtype=np.int64)
+    for i, doc in enumerate(docs):
+        for term, freq in Counter(doc.split()).items():
+            col = term_to_col(term)
+            if col >= 0:
+                x[i, col] += freq
+    return x
+
+def check_same(x, expected, message):
+    if x.shape != expected.shape or (abs(x - expected)).sum() != 0:
+        raise ValueError(message)
+
+def transform_blocks_test(docs):
+    vectorizer = BaseVectorizer(min_tf=3, verbose=False)
+    x = vectorizer.fit_transform(docs)
+    expected = reference_matrix(docs, lambda term: vectorizer.vocabulary_.get(term, -1),
+        vectorizer.n_vocabs)
+    check_same(x.toarray(), expected, 'fit_transform is different with dict counting')
+    check_same(vectorizer.transform(docs), x, 'transform is different with fit_transform')
+
+    for block_size in [1, 7, 1000, 10000]:
+        blocks = list(vectorizer.transform_blocks(docs, block_size=block_size))
+        if any(block.shape[0] > block_size for block in blocks):
+            raise ValueError('block is larger than block_size')
+        check_same(vstack(blocks).tocsr(), x,
+            'transform_blocks(block_size={}) is different with transform'.format(block_size))
+
+    # feature hashing mode
+    hashing = BaseVectorizer(n_features=64, verbose=False)
+    expected = reference_matrix(docs, lambda term: crc32(term.encode('utf-8')) % 64, 64)
+    check_same(hashing.fit_transform(docs).toarray(), expected,
+        'feature hashing is different with crc32 dict counting')
+    blocks = list(hashing.transform_blocks(docs, block_size=100))
+    check_same(vstack(blocks).toarray(), expected,
+        'hashed transform_blocks is different with transform')
+
+    print('transform_blocks test has been successed\n')
+
+def parallel_test(docs):
+    serial = BaseVectorizer(min_tf=3, n_jobs=1, verbose=False)
+    parallel = BaseVectorizer(min_tf=3, n_jobs=2, verbose=False)
+    # small chunks to scan docs in several worker tasks
+    parallel._chunk_size = 500
+
+    x = serial.fit_transform(docs)
+    if parallel.fit(docs).idx2vocab != serial.idx2vocab:
+        raise ValueError('fit(n_jobs=2) vocabulary is different with n_jobs=1')
+    check_same(parallel.transform(docs), x, 'transform(n_jobs=2) is different with n_jobs=1')
+    blocks = list(parallel.transform_blocks(docs, block_size=300))
+    check_same(vstack(blocks).tocsr(), x, 'transform_blocks(n_jobs=2) is different with n_jobs=1')
+
+    parallel = BaseVectorizer(min_tf=3, n_jobs=2, verbose=False)
+    parallel._chunk_size = 500
+    check_same(parallel.fit_transform(docs), x, 'fit_transform(n_jobs=2) is different with n_jobs=1')
+    if parallel.idx2vocab != serial.idx2vocab:
+        raise ValueError('fit_transform(n_jobs=2) vocabulary is different with n_jobs=1')
+
+    print('parallel vectorizer test has been successed\n')
+
+def to_file_test(docs, directory):
+    for n_jobs in [1, 2]:
+        vectorizer = BaseVectorizer(min_tf=3, n_jobs=n_jobs, verbose=False)
+        x = vectorizer.fit_transform(docs)
+
+        path = '%s/x%d.mtx' % (directory, n_jobs)
+        vectorizer.to_file(docs, path)
+        check_same(mmread(path).tocsr(), x, 'to_file(mtx) is different with transform')
+
+        path = '%s/x%d.npz' % (directory, n_jobs)
+        vectorizer.to_file(docs, path)
+        check_same(load_npz(path), x, 'to_file(npz) is different with transform')
+
+    # empty docs
+    vectorizer.to_file([], '%s/empty.mtx' % directory)
+    if mmread('%s/empty.mtx' % directory).shape != (0, vectorizer.n_vocabs):
+        raise ValueError('to_file of empty docs should write (0, n_vocabs) matrix')
+
+    # temporal body file is removed when transform fails
+    def broken_docs():
+        yield from docs[:100]
+        raise RuntimeError('broken docs')
+
+    vectorizer = BaseVectorizer(min_tf=3, verbose=False)
+    vectorizer.fit(docs)
+    try:
+        vectorizer.to_file(broken_docs(), '%s/broken.mtx' % directory)
+        raise ValueError('to_file should raise error of docs')
+    except RuntimeError:
+        pass
+    if [fname for fname in os.listdir(directory) if fname.endswith('.body')]:
+        raise ValueError('to_file leaks temporal body file')
+
+    print('to_file test has been successed\n')
+
+def vocabulary_test(docs):
+    vocabulary = Vocabulary(['이', '영화', '재밌다'])
+    encodeds = vocabulary.encode_batch([['영화', '이', '영화'], [], ['재밌다', 'unk']])
+    if [ids.tolist() for ids in encodeds] != [[1, 0, 1], [], [2]]:
+        raise ValueError('Vocabulary.encode_batch is wrong: {}'.format(encodeds))
+    if vocabulary.decode([1, 0, 1, -1, 3]) != ['영화', '이', '영화']:
+        raise ValueError('Vocabulary.decode should remove out of range indices')
+
+    vectorizer = BaseVectorizer(min_tf=3, verbose=False)
+    vectorizer.fit(docs)
+    vocabulary = vectorizer.vocabulary
+    # list based reference of terms sorted by index
+    idx2vocab = [term for term, _ in sorted(vectorizer.vocabulary_.items(), key=lambda x:x[1])]
+    if vectorizer.vocabs() != idx2vocab or vectorizer.idx2vocab != idx2vocab:
+        raise ValueError('vocabs() is different with terms sorted by index')
+
+    token_lists = [doc.split() for doc in docs]
+    encodeds = vectorizer.encode_batch(docs)
+    for doc, tokens, ids in zip(docs, token_lists, encodeds):
+        expected = [vectorizer.vocabulary_[t] for t in tokens if t in vectorizer.vocabulary_]
+        if ids.dtype != np.int32 or ids.tolist() != expected:
+            raise ValueError('encode_batch is different with dict lookup')
+        if vectorizer.encode_a_doc_to_list(doc) != expected:
+            raise ValueError('encode_a_doc_to_list is different with dict lookup')
+        if vectorizer.decode_from_list(ids) != [t for t in tokens if t in vectorizer.vocabulary_]:
+            raise ValueError('decode_from_list(encode(doc)) is different with known tokens')
+        bow = vectorizer.encode_a_doc_to_bow(doc)
+        if vectorizer.decode_from_bow(bow) != dict(Counter(t for t in tokens if t in vocabulary)):
+            raise ValueError('decode_from_bow(encode_a_doc_to_bow(doc)) is different with Counter')
+    if vocabulary.decode_batch(encodeds) != [vectorizer.decode_from_list(ids) for ids in encodeds]:
+        raise ValueError('decode_batch is different with decode')
+
+    print('vocabulary test has been successed\n')
+
+def main():
+    docs = generate_docs()
+    transform_blocks_test(docs)
+    parallel_test(docs)
+    vocabulary_test(docs)
+
+    directory = tempfile.mkdtemp()
+    try:
+        to_file_test(docs, directory)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()